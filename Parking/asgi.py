@@ -3,6 +3,10 @@ ASGI config for Parking project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve with an ASGI server (for example ``uvicorn Parking.asgi:application``)
+to get the event stream at parking-slots/stream/; under WSGI every open
+stream holds a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,16 +54,26 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.JSONParser',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'ParkingApp.authentication.StatelessJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'ParkingApp.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Identity comes from the token claims, see ParkingApp/authentication.py
+    'TOKEN_USER_CLASS': 'ParkingApp.authentication.ClaimsUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'ParkingApp.authentication.AccountTokenObtainSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'ParkingApp.authentication.RevocableTokenRefreshSerializer',
 }
 
 
 MIDDLEWARE = [
+    # First, so its timings include the rest of the stack
+    'ParkingApp.metrics.MetricsMiddleware',
+    # Before anything that reads the database
+    'ParkingApp.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,12 +108,53 @@ WSGI_APPLICATION = 'Parking.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+DATABASE_PROFILES = {
+    # A connection per request and SQLite's defaults
+    'development': {
+        # Stock SQLite backend plus transaction_mode and pragmas options, see
+        # ParkingApp/backends/sqlite3/base.py
+        'ENGINE': 'ParkingApp.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            # Booking writes check for conflicts and then insert; taking the
+            # write lock up front keeps that atomic across processes
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Connections kept open between requests, and SQLite set up for readers
+    # running alongside a writer
+    'production': {
+        'ENGINE': 'ParkingApp.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            # Busy timeout: seconds a connection waits for the write lock
+            # before "database is locked"
+            'timeout': 20,
+            'pragmas': {
+                # Readers no longer block on the writer, nor it on them
+                'journal_mode': 'WAL',
+                # Durable at checkpoints rather than at every commit, safe in WAL
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+                # Negative means KiB: 64 MiB of page cache per connection
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
 }
+# Picked with the PARKING_DB_PROFILE environment variable
+DATABASE_PROFILE = os.environ.get('PARKING_DB_PROFILE', 'development')
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+# A read replica: PARKING_DB_REPLICA names a SQLite file that the sync_replicas
+# command keeps as a copy of the database
+if os.environ.get('PARKING_DB_REPLICA'):
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': os.environ['PARKING_DB_REPLICA']}
 
 
 # Password validation
@@ -123,6 +175,13 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher makes new hashes, the others only verify old ones
+PASSWORD_HASHERS = [
+    'ParkingApp.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -145,3 +204,99 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Parking app
+
+# Seconds before a slot's in-memory booking intervals are re-read from the
+# database, so bookings written by other worker processes are picked up.
+# None keeps them until a local signal changes them. Conflicts they report are
+# confirmed in the database before a booking is refused.
+BOOKING_INDEX_TTL = 30
+
+# Width of the time buckets used by the slot search occupancy bitmaps, and how
+# many days ahead they cover; searches further out read the booking intervals
+OCCUPANCY_BUCKET_MINUTES = 15
+OCCUPANCY_BITMAP_HORIZON_DAYS = 180
+
+# Seconds before a slot's compiled pricing timeline is rebuilt from the rules
+PRICE_TIMELINE_TTL = 30
+
+# PBKDF2 iterations for new password hashes. Existing hashes are re-hashed at
+# this cost on their next successful login.
+PASSWORD_HASH_ITERATIONS = 600000
+
+# Seconds a verified login is remembered so repeated logins skip the hasher,
+# and how many accounts are remembered at most. 0 disables the cache.
+LOGIN_CACHE_TTL = 300
+LOGIN_CACHE_SIZE = 10000
+
+# How many revoked, not yet expired tokens each process remembers
+REVOKED_TOKENS_SIZE = 1024
+
+# Seconds the stored occupancy counters may lag behind bookings that start or
+# end on their own before a read adds those bookings in (without writing);
+# `reconcile_occupancy --advance --every <seconds>` moves the stored ones forward
+OCCUPANCY_MAX_LAG = 5
+
+# Availability and price event stream (parking-slots/stream/). EVENT_BUS is the
+# pub/sub class; the default only reaches subscribers in the same process.
+EVENT_BUS = 'ParkingApp.events.InProcessEventBus'
+# Events buffered per subscriber before the oldest are dropped
+EVENT_QUEUE_SIZE = 100
+# Seconds between keepalive comments, and before a stream is closed so the
+# client reconnects
+EVENT_STREAM_HEARTBEAT = 15
+EVENT_STREAM_MAX_SECONDS = 600
+
+# Rows fetched from the database per round trip by the bookings export, and
+# encoded per chunk of the streamed response
+EXPORT_CHUNK_SIZE = 2000
+
+# Read-through cache of parks, park details, slots and slot rules (see
+# ParkingApp/caching.py). Point ENTITY_CACHE_ALIAS at a shared backend (Redis,
+# Memcached) so workers share entries; the default cache is per process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+ENTITY_CACHE_ALIAS = 'default'
+# Seconds a cached row is kept; changes invalidate it before that
+ENTITY_CACHE_TTL = 300
+
+# Request metrics served at /metrics (see ParkingApp/metrics.py). With
+# METRICS_DIR set every worker writes its totals there at most every
+# METRICS_FLUSH_INTERVAL seconds and /metrics adds up all of them; empty the
+# directory when the service is redeployed. None keeps them per process.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+# Bookings that ended more than this many days ago are moved from Booking to
+# BookingArchive by the archive_bookings command; run it periodically (cron, or
+# with --every). New bookings are only checked for conflicts against Booking,
+# so keep this longer than bookings may be made in the past.
+BOOKING_ARCHIVE_AFTER_DAYS = 90
+# Bookings moved per transaction
+BOOKING_ARCHIVE_BATCH_SIZE = 1000
+
+# Booking writes that fail with "database is locked" are retried this many
+# times, after a random delay that starts around DB_LOCK_RETRY_DELAY seconds
+# and doubles per attempt up to DB_LOCK_RETRY_MAX_DELAY (see ParkingApp/locking.py)
+DB_LOCK_RETRIES = 4
+DB_LOCK_RETRY_DELAY = 0.05
+DB_LOCK_RETRY_MAX_DELAY = 1.0
+
+# Read replicas (see ParkingApp/routers.py): aliases in DATABASES holding a copy
+# of 'default'. GET requests read from one that is at most REPLICA_MAX_LAG
+# seconds behind and has the client's own writes, else from the primary. Each
+# process checks a replica's lag at most every REPLICA_CHECK_INTERVAL seconds.
+DATABASE_ROUTERS = ['ParkingApp.routers.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 1
+# Writes of clients authenticated with a token are also remembered per account
+# in this cache for REPLICA_MAX_LAG seconds, for clients that keep no cookies.
+# Point it at a shared backend (Redis, Memcached) when running several workers.
+REPLICA_STICKY_CACHE_ALIAS = 'default'
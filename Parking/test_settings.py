@@ -0,0 +1,15 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=Parking.test_settings
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Every Credentials/ParkOwner fixture is hashed, keep the suite fast
+PASSWORD_HASH_ITERATIONS = 1000
+
+# A replica database for the router tests, which turn DATABASE_REPLICAS on
+# themselves; everything else reads from the primary
+DATABASES = {**DATABASES, 'replica': {**DATABASES['default'], 'NAME': BASE_DIR / 'replica.sqlite3'}}
+DATABASE_REPLICAS = []
@@ -16,7 +16,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from ParkingApp.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('ParkingApp/', include('ParkingApp.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ParkingappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ParkingApp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .intervals import booking_index
+from .locking import retry_on_lock
+from .models import Booking, BookingArchive
+
+# Booking columns copied to BookingArchive, booking_id first
+FIELDS = ('booking_id', 'parking_slot_id', 'user_id', 'booking_start_date', 'booking_end_date', 'price')
+
+
+def archive_cutoff(now=None, days=None):
+    # Bookings that ended before this are archived
+    if days is None:
+        days = getattr(settings, 'BOOKING_ARCHIVE_AFTER_DAYS', 90)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+@retry_on_lock
+def archive_batch(cutoff, after=0, batch_size=None, now=None, using=DEFAULT_DB_ALIAS):
+    """Move the first batch_size bookings with an id above after that ended
+    before cutoff to BookingArchive, in one transaction. Returns their ids."""
+    batch_size = batch_size or getattr(settings, 'BOOKING_ARCHIVE_BATCH_SIZE', 1000)
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        rows = list(
+            Booking.objects.using(using)
+            .filter(pk__gt=after, booking_end_date__lt=cutoff)
+            .order_by('pk')
+            .values_list(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return []
+        BookingArchive.objects.using(using).bulk_create(
+            BookingArchive(**dict(zip(FIELDS, row)), archived_at=now) for row in rows
+        )
+        booking_ids = [row[0] for row in rows]
+        # No post_delete: the bookings are over, so there are no occupancy
+        # counters or availability events to update
+        Booking.objects.using(using).filter(pk__in=booking_ids)._raw_delete(using)
+        slot_ids = {row[1] for row in rows}
+        transaction.on_commit(lambda: booking_index.invalidate(slot_ids), using=using)
+    return booking_ids
+
+
+def archive_bookings(days=None, batch_size=None, max_batches=None, pause=0, now=None, using=DEFAULT_DB_ALIAS):
+    """Move every booking that ended more than days days ago (default
+    BOOKING_ARCHIVE_AFTER_DAYS) from Booking to BookingArchive, batch_size
+    rows per transaction so writers are only held up briefly, sleeping pause
+    seconds between batches. Each batch commits on its own, so an interrupted
+    run loses nothing and the next run picks up the rest. Returns the number
+    of bookings moved."""
+    now = now or timezone.now()
+    cutoff = archive_cutoff(now, days)
+    moved = batches = 0
+    after = 0
+    while max_batches is None or batches < max_batches:
+        booking_ids = archive_batch(cutoff, after, batch_size, now, using)
+        if not booking_ids:
+            break
+        moved += len(booking_ids)
+        batches += 1
+        after = booking_ids[-1]
+        if pause:
+            time.sleep(pause)
+    return moved
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import login
+from .models import Credentials, Park, Users
+
+STAFF = 'staff'
+
+
+class RevokedTokens:
+    """Small LRU of revoked token ids (jti) with their expiry.
+
+    Tokens expire on their own, so only the ones revoked before their expiry
+    need remembering, and at most ``REVOKED_TOKENS_SIZE`` of them are kept.
+    The list is per process; pair a short ACCESS_TOKEN_LIFETIME with it.
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def size(self):
+        if self._size is not None:
+            return self._size
+        return getattr(settings, 'REVOKED_TOKENS_SIZE', 1024)
+
+    def revoke(self, token):
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is None:
+            return
+        with self._lock:
+            self._entries[jti] = token.get('exp', float('inf'))
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires = self._entries.get(jti)
+            if expires is None:
+                return False
+            if expires <= time.time():
+                # Expired tokens are rejected anyway
+                del self._entries[jti]
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+revoked_tokens = RevokedTokens()
+
+
+class ClaimsUser(TokenUser):
+    """The request user, read from the token claims alone.
+
+    ``id`` is the Users or ParkOwner primary key depending on ``role``, and
+    ``park_id`` is the owner's park. A token without a role claim (one issued
+    before roles were) has no role and no privileges.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def park_id(self):
+        return self.token.get('park_id')
+
+    @cached_property
+    def credentials_id(self):
+        return self.token.get('credentials_id')
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that trusts the signed claims and never queries the
+    database for identity. Revoked tokens are checked against
+    ``revoked_tokens``."""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if validated_token.get(api_settings.JTI_CLAIM) in revoked_tokens:
+            raise InvalidToken({'detail': 'Token has been revoked.', 'code': 'token_revoked'})
+        return validated_token
+
+
+def account_claims(account):
+    # Claims for a Credentials or ParkOwner returned by login.authenticate
+    if isinstance(account, Credentials):
+        user_id = Users.objects.filter(credentials=account.pk).values_list('pk', flat=True).first()
+        if user_id is None:
+            raise exceptions.AuthenticationFailed('No user profile for these credentials.', 'no_active_account')
+        return {'user_id': user_id, 'role': login.USER, 'park_id': None, 'credentials_id': account.pk}
+    park_id = Park.objects.filter(park_owner=account.pk).values_list('pk', flat=True).first()
+    return {'user_id': account.pk, 'role': login.OWNER, 'park_id': park_id}
+
+
+class AccountTokenObtainSerializer(TokenObtainPairSerializer):
+    """api/token/: email and password of a user or park owner, or username
+    and password of a Django staff account. The tokens carry user_id, role
+    and park_id so requests can be authenticated without a query."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields[self.username_field].required = False
+        self.fields['email'] = serializers.EmailField(write_only=True, required=False)
+
+    def validate(self, attrs):
+        if attrs.get('email'):
+            account = login.authenticate(attrs['email'], attrs['password'])
+            if account is None:
+                raise exceptions.AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+            refresh = RefreshToken()
+            for claim, value in account_claims(account).items():
+                refresh[claim] = value
+            return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+        if not attrs.get(self.username_field):
+            raise serializers.ValidationError({'email': 'This field is required.'})
+        return super().validate(attrs)
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = STAFF
+        token['park_id'] = None
+        return token
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if refresh.get(api_settings.JTI_CLAIM) in revoked_tokens:
+            raise InvalidToken({'detail': 'Token has been revoked.', 'code': 'token_revoked'})
+        return super().validate(attrs)
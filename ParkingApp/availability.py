@@ -0,0 +1,32 @@
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Booking, ParkingSlot
+
+
+def overlapping_bookings_q(start, end, prefix=''):
+    # Bookings are half-open [start, end) intervals. A zero-length window
+    # becomes a point query, which matches bookings active at that instant.
+    if start == end:
+        return Q(**{
+            f'{prefix}booking_start_date__lte': start,
+            f'{prefix}booking_end_date__gt': start,
+        })
+    return Q(**{
+        f'{prefix}booking_start_date__lt': end,
+        f'{prefix}booking_end_date__gt': start,
+    })
+
+
+def available_slots(start=None, end=None, queryset=None):
+    # Slots with no booking that overlaps [start, end). This is one NOT EXISTS
+    # anti-join and never writes, so concurrent readers don't block each other.
+    if start is None:
+        start = timezone.now()
+    if end is None:
+        end = start
+    if queryset is None:
+        queryset = ParkingSlot.objects.all()
+
+    busy = Booking.objects.filter(overlapping_bookings_q(start, end), parking_slot=OuterRef('pk'))
+    return queryset.filter(~Exists(busy))
@@ -0,0 +1,53 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+# Pragma names and values end up in SQL, only plain words and numbers pass
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend with a configurable transaction mode and connection
+    pragmas.
+
+    ``OPTIONS['transaction_mode'] = 'IMMEDIATE'`` makes every atomic block take
+    the database write lock when it begins. A transaction that reads and then
+    writes (check-then-insert) can then neither be interleaved with another
+    writer nor fail with "database is locked" when upgrading its lock; it
+    waits its turn for up to the busy timeout instead.
+
+    ``OPTIONS['pragmas']`` is a dict of PRAGMA settings run on every new
+    connection, for example ``{'journal_mode': 'WAL', 'synchronous':
+    'NORMAL'}``, in the order given.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        mode = kwargs.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES transaction_mode must be one of {', '.join(TRANSACTION_MODES)}."
+            )
+        self.transaction_mode = mode.upper() if mode else None
+
+        pragmas = kwargs.pop('pragmas', None) or {}
+        for name, value in pragmas.items():
+            if not PRAGMA_NAME.match(str(name)) or not PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f'settings.DATABASES pragma {name!r} = {value!r} is not valid.')
+        self.pragmas = dict(pragmas)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,115 @@
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from .intervals import booking_index, to_timestamp
+
+MICROSECONDS_PER_MINUTE = 60 * 1000 * 1000
+
+
+class OccupancyBitmaps:
+    """Per-slot occupancy bitmaps in fixed time buckets.
+
+    Bit ``i`` of a slot's bitmap is set when any of its bookings touches bucket
+    ``origin + i``. A window check is then a single AND of the bitmap with the
+    window mask, however many buckets the window spans. Buckets only partly
+    covered by the window are confirmed against the exact intervals, so the
+    answer matches the booking conflict check.
+
+    Bitmaps cover a day back and ``OCCUPANCY_BITMAP_HORIZON_DAYS`` ahead, so
+    their size is bounded whatever the bookings; windows reaching outside that
+    are answered from the intervals directly. The range moves forward daily.
+    Bitmaps are derived from the interval index and rebuilt for a slot only
+    when its intervals change.
+    """
+
+    def __init__(self, index=booking_index, bucket_minutes=None, horizon_days=None):
+        self._index = index
+        self._bucket_minutes = bucket_minutes
+        self._horizon_days = horizon_days
+        self._bucket = None
+        self._origin = None
+        self._end = None
+        self._bitmaps = {}
+        self._lock = threading.Lock()
+
+    def _setup(self):
+        # (bucket, origin, end): bitmaps cover buckets origin to end - 1
+        now = to_timestamp(timezone.now())
+        with self._lock:
+            if self._bucket is None:
+                minutes = self._bucket_minutes or getattr(settings, 'OCCUPANCY_BUCKET_MINUTES', 15)
+                self._bucket = minutes * MICROSECONDS_PER_MINUTE
+            bucket = self._bucket
+            day = 24 * 60 * MICROSECONDS_PER_MINUTE // bucket
+            if self._origin is None or now // bucket - self._origin > 2 * day:
+                # History older than a day is answered from the intervals
+                # directly instead of growing every bitmap. Moved a day at a
+                # time, so the end stays at least the horizon ahead.
+                horizon = self._horizon_days or getattr(settings, 'OCCUPANCY_BITMAP_HORIZON_DAYS', 180)
+                self._origin = now // bucket - day
+                self._end = self._origin + (2 + horizon) * day
+                self._bitmaps.clear()
+            return bucket, self._origin, self._end
+
+    def _build(self, entry, bucket, origin, end):
+        bits = 0
+        for start, stop, _ in entry:
+            first = max(start // bucket, origin)
+            last = min((max(stop, start + 1) - 1) // bucket, end - 1)
+            if last < first:
+                continue
+            bits |= ((1 << (last - first + 1)) - 1) << (first - origin)
+        return bits
+
+    def _bitmap(self, slot_id, entry, bucket, origin, end):
+        cached = self._bitmaps.get(slot_id)
+        if cached is not None and cached[0] is entry and cached[1] == entry.revision and cached[2] == origin:
+            return cached[3]
+        bits = self._build(entry, bucket, origin, end)
+        self._bitmaps[slot_id] = (entry, entry.revision, origin, bits)
+        return bits
+
+    def free_slot_ids(self, slot_ids, start, end):
+        bucket, origin, horizon_end = self._setup()
+        start_ts, end_ts = to_timestamp(start), to_timestamp(end)
+        entries = self._index.load(slot_ids)
+
+        with self._index.lock:
+            first = start_ts // bucket
+            last = (max(end_ts, start_ts + 1) - 1) // bucket
+            if first < origin or last >= horizon_end:
+                return {
+                    slot_id for slot_id in slot_ids
+                    if not entries[slot_id].overlaps(start_ts, end_ts)
+                }
+
+            window = ((1 << (last - first + 1)) - 1) << (first - origin)
+            edges = 0
+            if start_ts % bucket or start_ts == end_ts:
+                edges |= 1 << (first - origin)
+            if end_ts % bucket:
+                edges |= 1 << (last - origin)
+            interior = window & ~edges
+
+            free = set()
+            for slot_id in slot_ids:
+                entry = entries[slot_id]
+                bits = self._bitmap(slot_id, entry, bucket, origin, horizon_end)
+                if bits & interior:
+                    continue
+                if bits & edges and entry.overlaps(start_ts, end_ts):
+                    continue
+                free.add(slot_id)
+            return free
+
+    def clear(self):
+        with self._lock:
+            self._bucket = None
+            self._origin = None
+            self._end = None
+            self._bitmaps.clear()
+
+
+occupancy_bitmaps = OccupancyBitmaps()
@@ -0,0 +1,107 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .intervals import SlotIntervals, to_timestamp
+from .locking import retry_on_lock, slot_write_lock
+from .models import Booking, Users
+from .pricing import pricing_engine
+from .serializers import BookingSerializer
+from .signals import bookings_bulk_created
+from .utils import ISO_DATE_ERROR, parse_iso_datetime
+
+BOOKING_FIELDS = ('user', 'parking_slot', 'booking_start_date', 'booking_end_date')
+
+
+def _parse_item(item):
+    if not isinstance(item, dict) or any(not item.get(field) for field in BOOKING_FIELDS):
+        return None, 'Incomplete data provided.'
+    try:
+        user_id = int(item['user'])
+        slot_id = int(item['parking_slot'])
+    except (TypeError, ValueError):
+        return None, 'user and parking_slot must be ids.'
+    try:
+        start = parse_iso_datetime(item['booking_start_date'])
+        end = parse_iso_datetime(item['booking_end_date'])
+    except (TypeError, ValueError):
+        return None, ISO_DATE_ERROR
+    if end <= start:
+        return None, 'booking_end_date must be after booking_start_date.'
+    return (user_id, slot_id, start, end), None
+
+
+@retry_on_lock
+def create_bookings(items):
+    """Validate and insert a batch of bookings in one transaction.
+
+    Returns one result per item, in order. Items are checked against existing
+    bookings with a single query covering every slot in the batch, and against
+    earlier items of the same batch; the first item to claim a period wins.
+    """
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        values, error = _parse_item(item)
+        if error:
+            results[index] = {'index': index, 'status': 400, 'error': error}
+        else:
+            parsed[index] = values
+
+    user_ids = {values[0] for values in parsed.values()}
+    slot_ids = {values[1] for values in parsed.values()}
+    existing_users = set(Users.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    timelines = pricing_engine.timelines(slot_ids)
+
+    for index, (user_id, slot_id, _, _) in list(parsed.items()):
+        if user_id not in existing_users:
+            error = f'User {user_id} does not exist.'
+        elif slot_id not in timelines:
+            error = f'ParkingSlot {slot_id} does not exist.'
+        else:
+            continue
+        results[index] = {'index': index, 'status': 400, 'error': error}
+        del parsed[index]
+
+    with slot_write_lock({values[1] for values in parsed.values()}):
+        # One query for every booking that could collide with the batch:
+        # per slot, anything overlapping the span of the batch's windows
+        spans = {}
+        for _, slot_id, start, end in parsed.values():
+            low, high = spans.get(slot_id, (start, end))
+            spans[slot_id] = (min(low, start), max(high, end))
+
+        taken = {slot_id: SlotIntervals() for slot_id in spans}
+        if spans:
+            overlapping = Booking.objects.filter(reduce(or_, (
+                Q(parking_slot=slot_id, booking_start_date__lt=high, booking_end_date__gt=low)
+                for slot_id, (low, high) in spans.items()
+            ))).values_list('parking_slot_id', 'booking_start_date', 'booking_end_date', 'booking_id')
+            for slot_id, start, end, booking_id in overlapping:
+                taken[slot_id].add(to_timestamp(start), to_timestamp(end), booking_id)
+
+        accepted = []
+        for index, (user_id, slot_id, start, end) in parsed.items():
+            start_ts, end_ts = to_timestamp(start), to_timestamp(end)
+            if taken[slot_id].overlaps(start_ts, end_ts):
+                results[index] = {'index': index, 'status': 400, 'error': 'Conflicts with existing bookings for the specified period.'}
+                continue
+            # Batch items get negative ids so they never clash with real ones
+            taken[slot_id].add(start_ts, end_ts, -(index + 1))
+            booking = Booking(
+                user_id=user_id,
+                parking_slot_id=slot_id,
+                booking_start_date=start,
+                booking_end_date=end,
+                price=timelines[slot_id].price(start_ts, end_ts),
+            )
+            accepted.append((index, booking))
+
+        created = Booking.objects.bulk_create([booking for _, booking in accepted])
+        bookings_bulk_created(created)
+
+    for (index, _), booking in zip(accepted, created):
+        results[index] = {'index': index, 'status': 201, 'booking': BookingSerializer(booking).data}
+
+    return results
@@ -0,0 +1,246 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import Http404
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from . import routers
+from .models import Park, ParkDetails, ParkingSlot, ParkingSlotRules, TableVersion
+
+
+def _versions(cache, keys):
+    # Current version of each key. A missing one restarts from the clock, not
+    # from zero, so anything stored under an evicted version stays unreachable.
+    found = cache.get_many(keys)
+    versions = {}
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            # Someone else may have started it first, theirs wins
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, default=version)
+        versions[key] = version
+    return versions
+
+
+def _bump(cache, keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No version yet, so nothing depends on it
+            pass
+
+
+class EntityCache:
+    """Read-through cache of rarely changing rows, by primary key.
+
+    Rows live in the Django cache named by ``ENTITY_CACHE_ALIAS``, so workers
+    share them when that cache is shared (Redis, Memcached). Every row has a
+    version key next to it and the row is stored under its current version;
+    invalidating bumps the version, which makes every copy stored under the old
+    one unreachable, including one a concurrent reader writes back late.
+
+    Rows read inside a transaction may not be committed yet, so they are only
+    cached when read outside one.
+
+    Readers that hold a TableVersion of the model (see TableVersions) pass it
+    as ``table_version``, which becomes part of the key: writes that skip the
+    signals (queryset.update, other workers with a local cache, raw SQL) still
+    bump it, so they miss the rows cached before them.
+    """
+
+    models = (Park, ParkDetails, ParkingSlot, ParkingSlotRules)
+
+    def __init__(self, alias=None, ttl=None):
+        self._alias = alias
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._misses = Counter()
+
+    @property
+    def cache(self):
+        return caches[self._alias or getattr(settings, 'ENTITY_CACHE_ALIAS', 'default')]
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'ENTITY_CACHE_TTL', 300)
+
+    def _key(self, model, pk):
+        return f'entity:{model._meta.label_lower}:{pk}'
+
+    def _versions(self, model, pks):
+        keys = {pk: self._key(model, pk) + ':v' for pk in pks}
+        versions = _versions(self.cache, keys.values())
+        return {pk: versions[key] for pk, key in keys.items()}
+
+    def get_many(self, model, pks, using=DEFAULT_DB_ALIAS, table_version=None):
+        """The existing rows among pks, as {pk: instance}. Raises
+        ValidationError for pks that aren't valid primary keys."""
+        pks = {model._meta.pk.to_python(pk) for pk in pks}
+        if not pks:
+            return {}
+        cache = self.cache
+        suffix = '' if table_version is None else f':t{table_version}'
+        keys = {pk: f'{self._key(model, pk)}:{version}{suffix}' for pk, version in self._versions(model, pks).items()}
+        found = cache.get_many(keys.values())
+        result = {pk: found[key] for pk, key in keys.items() if key in found}
+
+        missing = pks - set(result)
+        label = model._meta.label_lower
+        with self._lock:
+            self._hits[label] += len(result)
+            self._misses[label] += len(missing)
+        if missing:
+            loaded = model._default_manager.using(using).in_bulk(missing)
+            if not connections[using].in_atomic_block:
+                cache.set_many({keys[pk]: instance for pk, instance in loaded.items()}, self.ttl)
+            result.update(loaded)
+        return result
+
+    def get(self, model, pk, using=DEFAULT_DB_ALIAS, table_version=None):
+        instance = self.get_many(model, [pk], using, table_version).get(model._meta.pk.to_python(pk))
+        if instance is None:
+            raise model.DoesNotExist(f'No {model.__name__} matches the given query.')
+        return instance
+
+    def invalidate(self, model, pks):
+        _bump(self.cache, [self._key(model, pk) + ':v' for pk in pks])
+
+    def stats(self):
+        with self._lock:
+            labels = sorted({*self._hits, *self._misses})
+            stats = {label: {'hits': self._hits[label], 'misses': self._misses[label]} for label in labels}
+        hits = sum(entry['hits'] for entry in stats.values())
+        misses = sum(entry['misses'] for entry in stats.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'models': stats,
+        }
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+
+entity_cache = EntityCache()
+
+
+class TableVersions:
+    """Change counter of each table in the TableVersion table. Triggers bump it
+    in the transaction of every insert, update and delete, queryset.update,
+    bulk_create and raw SQL included, so every worker reading the database
+    agrees on it."""
+
+    def get(self, models):
+        # One query for all the tables
+        tables = [model._meta.db_table for model in models]
+        versions = dict(TableVersion.objects.filter(table_name__in=tables).values_list('table_name', 'version'))
+        missing = [table for table in tables if table not in versions]
+        if missing:
+            # Started from the clock, so a row that was deleted (a test flush,
+            # say) never comes back at a version it had before
+            TableVersion.objects.bulk_create(
+                [TableVersion(table_name=table, version=time.time_ns()) for table in missing], ignore_conflicts=True,
+            )
+            versions.update(
+                TableVersion.objects.using(DEFAULT_DB_ALIAS).filter(table_name__in=missing).values_list('table_name', 'version')
+            )
+        return [versions[table] for table in tables]
+
+
+table_versions = TableVersions()
+
+
+def _etag(versions, request):
+    versions = ':'.join(map(str, versions))
+    digest = hashlib.md5(f'{versions}:{request.get_full_path()}'.encode(), usedforsecurity=False)
+    return f'"{digest.hexdigest()}"'
+
+
+def table_etag(models, request):
+    # ETag from the versions of the tables and the request path
+    return _etag(table_versions.get(models), request)
+
+
+def if_none_match(request):
+    # The ETags of If-None-Match without their W/ prefix: GETs compare weakly
+    value = request.headers.get('If-None-Match')
+    if not value:
+        return set()
+    return {candidate.removeprefix('W/') for candidate in parse_etags(value)}
+
+
+class ConditionalGetMixin:
+    """ETag for GETs, from the versions of the tables the response is built
+    from and the request path, so list pages and detail URLs each get their
+    own. A matching If-None-Match is answered 304 before the serializer runs,
+    after a single query for the versions. ``*`` matches any object that
+    exists, and every list.
+
+    The versions are bumped on the primary, so the whole request reads from
+    it: a replica's body could be older than the ETag sent with it. For the
+    same reason CachedObjectMixin reads the object under the version the ETag
+    was built from."""
+
+    etag_models = None
+    # {model: version} behind the ETag of this request
+    table_versions = {}
+
+    def get_etag(self, request):
+        models = self.etag_models or (self.get_queryset().model,)
+        versions = table_versions.get(models)
+        self.table_versions = dict(zip(models, versions))
+        return _etag(versions, request)
+
+    def exists(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg not in self.kwargs:
+            return True
+        return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).exists()
+
+    def get(self, request, *args, **kwargs):
+        routers.use_primary()
+        etag = self.get_etag(request)
+        candidates = if_none_match(request)
+        if etag in candidates or ('*' in candidates and self.exists()):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+
+class CachedObjectMixin:
+    # Single-object GETs read the object through entity_cache, under the table
+    # version of the ETag when there is one; writes load it from the database
+    # as usual
+    def get_object(self):
+        model = self.get_queryset().model
+        if self.request.method not in SAFE_METHODS or model not in entity_cache.models:
+            return super().get_object()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            table_version = getattr(self, 'table_versions', {}).get(model)
+            obj = entity_cache.get(model, self.kwargs[lookup_url_kwarg], table_version=table_version)
+        except (ObjectDoesNotExist, ValidationError):
+            raise Http404(f'No {model._meta.object_name} matches the given query.')
+        self.check_object_permissions(self.request, obj)
+        return obj
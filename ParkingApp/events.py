@@ -0,0 +1,156 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .intervals import to_timestamp
+from .models import ParkingSlot
+from .pricing import pricing_engine
+
+
+def park_topic(park_id):
+    return ('park', int(park_id))
+
+
+def floor_topic(floor_id):
+    return ('floor', int(floor_id))
+
+
+class Subscription:
+    """One subscriber's queue of events, read on the event loop that created it.
+
+    The queue is bounded by ``EVENT_QUEUE_SIZE``. A subscriber that falls
+    behind loses its oldest events and ``dropped`` counts them, so a stalled
+    client can't grow memory without bound.
+    """
+
+    def __init__(self, bus, topics, maxsize=None):
+        self.bus = bus
+        self.topics = frozenset(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize or getattr(settings, 'EVENT_QUEUE_SIZE', 100))
+        self.dropped = 0
+
+    def deliver(self, event):
+        # Runs on self.loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        # The next event, or None if none arrives within timeout seconds
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InProcessEventBus:
+    """Publish/subscribe between the threads and event loops of one process.
+
+    ``publish`` may be called from any thread (signal handlers run in sync
+    code); events are handed to each subscriber's loop with
+    ``call_soon_threadsafe``. A broker-backed bus only needs the same four
+    methods, and ``EVENT_BUS`` selects the class.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, topics, maxsize=None):
+        # Must be called from a running event loop
+        subscription = Subscription(self, topics, maxsize)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def has_subscribers(self):
+        # Lets publishers skip building events nobody would receive
+        return bool(self._subscribers)
+
+    def publish(self, topics, event):
+        with self._lock:
+            # A subscriber to both the park and the floor gets the event once
+            targets = set().union(*(self._subscribers.get(topic, ()) for topic in topics))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Its loop is closed, the stream is gone
+                self.unsubscribe(subscription)
+
+
+event_bus = import_string(getattr(settings, 'EVENT_BUS', 'ParkingApp.events.InProcessEventBus'))()
+
+
+def _slot_topics(slot_ids):
+    rows = ParkingSlot.objects.filter(pk__in=slot_ids).values_list('pk', 'floor_id', 'floor__park_id')
+    return {slot_id: (floor_id, park_id) for slot_id, floor_id, park_id in rows}
+
+
+def _isoformat(value):
+    if isinstance(value, str):
+        return value
+    return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+
+
+def booking_changed(booking_id, slot_id, start, end, booked):
+    """Publish that slot_id is taken (booked=True) or free again (False) for
+    [start, end). Called once the write is committed."""
+    if not event_bus.has_subscribers():
+        return
+    floor_id, park_id = _slot_topics([slot_id]).get(slot_id, (None, None))
+    if floor_id is None:
+        return
+    event_bus.publish([park_topic(park_id), floor_topic(floor_id)], {
+        'type': 'availability',
+        'park': park_id,
+        'floor': floor_id,
+        'parking_slot': slot_id,
+        'booking': booking_id,
+        'start': _isoformat(start),
+        'end': _isoformat(end),
+        'booked': booked,
+    })
+
+
+def price_changed(slot_id, rule_id):
+    """Publish the slot's current price after one of its rules changed."""
+    if not event_bus.has_subscribers():
+        return
+    floor_id, park_id = _slot_topics([slot_id]).get(slot_id, (None, None))
+    timeline = pricing_engine.timelines([slot_id]).get(slot_id)
+    if floor_id is None or timeline is None:
+        return
+    event_bus.publish([park_topic(park_id), floor_topic(floor_id)], {
+        'type': 'price',
+        'park': park_id,
+        'floor': floor_id,
+        'parking_slot': slot_id,
+        'rule': rule_id,
+        'current_price': timeline.rate_at(to_timestamp(timezone.now())),
+    })
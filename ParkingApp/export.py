@@ -0,0 +1,78 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Booking, BookingHistory
+
+# Column name, Booking lookup
+COLUMNS = (
+    ('booking_id', 'booking_id'),
+    ('park', 'parking_slot__floor__park_id'),
+    ('floor', 'parking_slot__floor_id'),
+    ('parking_slot', 'parking_slot_id'),
+    ('user', 'user_id'),
+    ('booking_start_date', 'booking_start_date'),
+    ('booking_end_date', 'booking_end_date'),
+    ('price', 'price'),
+)
+HEADER = tuple(name for name, _ in COLUMNS)
+FORMATS = ('ndjson', 'csv')
+
+
+def booking_rows(park=None, parking_slot=None, start=None, end=None, include_archived=False):
+    """Bookings as value tuples in HEADER order, filtered to a park and/or
+    slot and to the ones overlapping [start, end). include_archived adds the
+    ones in BookingArchive."""
+    queryset = (BookingHistory if include_archived else Booking).objects.all()
+    if park is not None:
+        queryset = queryset.filter(parking_slot__floor__park=park)
+    if parking_slot is not None:
+        queryset = queryset.filter(parking_slot=parking_slot)
+    if start is not None:
+        queryset = queryset.filter(booking_end_date__gt=start)
+    if end is not None:
+        queryset = queryset.filter(booking_start_date__lt=end)
+    return queryset.order_by('pk').values_list(*(lookup for _, lookup in COLUMNS))
+
+
+def _isoformat(value):
+    # What BookingSerializer writes for the same datetime
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class _Echo:
+    # csv.writer target that hands back the line instead of buffering it
+    def write(self, value):
+        return value
+
+
+_csv = csv.writer(_Echo())
+
+
+def _encode(values, format):
+    values = [_isoformat(value) if hasattr(value, 'tzinfo') else value for value in values]
+    if format == 'csv':
+        return _csv.writerow(values)
+    return json.dumps(dict(zip(HEADER, values))) + '\n'
+
+
+def stream(rows, format='ndjson', chunk_size=None):
+    """Encode rows lazily, one string per chunk of rows.
+
+    rows is read with QuerySet.iterator(), so the database cursor is consumed
+    chunk_size rows at a time and neither model instances nor the result set
+    are held in memory.
+    """
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    if format == 'csv':
+        yield _csv.writerow(HEADER)
+    rows = rows.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = ''.join(_encode(values, format) for values in islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
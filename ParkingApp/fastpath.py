@@ -0,0 +1,199 @@
+import threading
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+# DRF fields whose representation of a database value is the value itself
+_PLAIN_FIELDS = (
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class Rows(list):
+    """Serialized rows from FastSerializer.
+
+    ``json_safe`` is False when a float would be written differently by orjson
+    than by the stdlib encoder (exponent notation, nan, infinity), in which
+    case FastJSONRenderer keeps to the stdlib encoder.
+    """
+
+    json_safe = True
+
+
+def _json_safe_float(value):
+    # Python writes floats outside [1e-4, 1e16) as 1e-05 / 1e+16, orjson as
+    # 0.00001 / 1e16
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+class _IsoDateTime:
+    # DateTimeField.to_representation for ISO 8601 output, minus the per-call
+    # settings lookups
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        tz = self.field.default_timezone()
+        if tz is None:
+            return self.field.to_representation
+
+        def to_representation(value):
+            if timezone.is_aware(value):
+                value = value.astimezone(tz)
+            else:
+                value = timezone.make_aware(value, tz)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return to_representation
+
+
+class FastSerializer:
+    """Serializes a ModelSerializer's rows straight from values_list tuples.
+
+    The serializer's fields are inspected once: every field becomes a column
+    read with values_list, plus a converter for the few types whose JSON form
+    is not the database value (datetimes, decimals). The output is what the
+    ModelSerializer produces for the same rows. Only flat serializers of model
+    fields are supported; anything else raises ImproperlyConfigured. A
+    serializer whose to_representation sets fixed values lists them in
+    ``constant_fields``.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.model = model
+        self.constants = dict(getattr(serializer_class, 'constant_fields', {}))
+        self.keys = []
+        self.lookups = []
+        self.converters = []
+        self.float_keys = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} is not a model field.')
+            self.keys.append(name)
+            self.lookups.append(model_field.attname)
+            self.converters.append(self._converter(serializer_class, name, field))
+            if isinstance(field, serializers.FloatField):
+                self.float_keys.append(name)
+
+    def _converter(self, serializer_class, name, field):
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if isinstance(output_format, str) and output_format.lower() == ISO_8601 and not hasattr(field, 'timezone'):
+                # Bound to the request's time zone in many()
+                return _IsoDateTime(field)
+            return field.to_representation
+        if isinstance(field, serializers.DecimalField):
+            return field.to_representation
+        if not isinstance(field, _PLAIN_FIELDS) or getattr(field, 'pk_field', None) is not None:
+            raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} ({type(field).__name__}) has no fast path.')
+        return None
+
+    def rows(self, queryset, *extra):
+        """queryset as named tuples of the serializer's columns, plus extra
+        lookups (a paginator's ordering fields, for example)."""
+        extra = [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.values_list(*self.lookups, *extra, named=True)
+
+    def many(self, rows):
+        columns = []
+        for index, (key, converter) in enumerate(zip(self.keys, self.converters)):
+            if isinstance(converter, _IsoDateTime):
+                converter = converter.bind()
+            columns.append((key, index, converter))
+
+        result = Rows()
+        append = result.append
+        constants = self.constants
+        for row in rows:
+            item = {
+                key: row[index] if converter is None or row[index] is None else converter(row[index])
+                for key, index, converter in columns
+            }
+            if constants:
+                item.update(constants)
+            append(item)
+
+        for key in self.float_keys:
+            if not all(item[key] is None or _json_safe_float(item[key]) for item in result):
+                result.json_safe = False
+                break
+        return result
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def fast_serializer(serializer_class):
+    serializer = _compiled.get(serializer_class)
+    if serializer is None:
+        with _compiled_lock:
+            serializer = _compiled.setdefault(serializer_class, FastSerializer(serializer_class))
+    return serializer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that writes FastSerializer rows (bare or in a paginated
+    response) with orjson when it is installed. The bytes are the same as
+    JSONRenderer's; anything else goes through JSONRenderer unchanged."""
+
+    def _orjson_compatible(self, data, accepted_media_type, renderer_context):
+        # orjson only writes compact, non-ASCII-escaped JSON
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return False
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return False
+        rows = data.get('results') if isinstance(data, dict) else data
+        return isinstance(rows, Rows) and rows.json_safe
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self._orjson_compatible(data, accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escapes JSONRenderer applies for JavaScript embedding
+        return rendered.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastListMixin:
+    """Opt-in fast path for a read-only list endpoint: the page is read with
+    values_list and serialized by FastSerializer, then rendered by
+    FastJSONRenderer. The view's own renderers stay behind it for content
+    negotiation, so other media types and the other methods are unchanged."""
+
+    def get_renderers(self):
+        return [FastJSONRenderer(), *super().get_renderers()]
+
+    def fast_list_response(self, queryset):
+        serializer = fast_serializer(self.get_serializer_class())
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        rows = serializer.rows(queryset, *(field.lstrip('-') for field in ordering))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serializer.many(rows))
+        return self.get_paginated_response(serializer.many(page))
+
+    def list(self, request, *args, **kwargs):
+        return self.fast_list_response(self.filter_queryset(self.get_queryset()))
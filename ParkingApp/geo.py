@@ -0,0 +1,103 @@
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# Upper bound on the number of geohash cells used to cover a search box. The
+# finest precision that stays under it is picked, so small radii scan few rows.
+MAX_COVERING_CELLS = 32
+
+
+def _bits(precision):
+    # Geohash interleaves longitude first, so longitude gets the extra bit
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def cell_size(precision):
+    lon_bits, lat_bits = _bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    value = 0
+    bit = 0
+    even = True
+    while len(chars) < precision:
+        target, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if target >= middle:
+            value = (value << 1) | 1
+            bounds[0] = middle
+        else:
+            value <<= 1
+            bounds[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value = 0
+            bit = 0
+    return ''.join(chars)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    # (min_lat, max_lat, min_lon, max_lon); longitudes may fall outside
+    # [-180, 180] when the box crosses the antimeridian.
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    lon_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return min_lat, max_lat, longitude - lon_delta, longitude + lon_delta
+
+
+def _lon_ranges(min_lon, max_lon):
+    if min_lon < -180.0:
+        return [(min_lon + 360.0, 180.0), (-180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360.0)]
+    return [(min_lon, max_lon)]
+
+
+def _cell_range(low, high, size, origin):
+    first = math.floor((low - origin) / size)
+    last = min(math.floor((high - origin) / size), round((-2 * origin) / size) - 1)
+    return range(first, last + 1)
+
+
+def covering_prefixes(min_lat, max_lat, min_lon, max_lon):
+    # Geohash prefixes whose cells together cover the box
+    lon_ranges = _lon_ranges(min_lon, max_lon)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lon_size = cell_size(precision)
+        lat_cells = _cell_range(min_lat, max_lat, lat_size, -90.0)
+        lon_cells = [cell for low, high in lon_ranges for cell in _cell_range(low, high, lon_size, -180.0)]
+        if len(lat_cells) * len(lon_cells) <= MAX_COVERING_CELLS or precision == 1:
+            return sorted({
+                encode(-90.0 + (i + 0.5) * lat_size, -180.0 + (j + 0.5) * lon_size, precision)
+                for i in lat_cells
+                for j in lon_cells
+            })
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def in_box(latitude, longitude, box):
+    min_lat, max_lat, min_lon, max_lon = box
+    if not min_lat <= latitude <= max_lat:
+        return False
+    return any(low <= longitude <= high for low, high in _lon_ranges(min_lon, max_lon))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class TunablePBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor taken from settings.
+
+    ``PASSWORD_HASH_ITERATIONS`` sets the cost of new hashes. Hashes made with
+    another count still verify and are re-hashed on the next good login, so the
+    cost can be raised or lowered without a migration.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+def is_password_hash(value):
+    try:
+        hashers.identify_hasher(value)
+    except ValueError:
+        return False
+    return True
+
+
+def hash_password(value, stored=None):
+    # Hash value to be stored in place of stored, the hash the row already
+    # has. Only stored itself is kept as it is: anything else, even a string
+    # that looks like a hash, is a password given by a client.
+    if not value or value == stored:
+        return value
+    return hashers.make_password(value)
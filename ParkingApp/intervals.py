@@ -0,0 +1,250 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Booking
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_timestamp(value):
+    # Exact integer microseconds since the epoch. Naive datetimes are read in
+    # the default time zone, the same way Django stores them, so the index and
+    # the database agree on every boundary.
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return (value - EPOCH) // MICROSECOND
+
+
+class SlotIntervals:
+    """Booking intervals of one parking slot, kept sorted by start.
+
+    ``max_ends[i]`` is the largest end among the first ``i + 1`` intervals, so
+    an overlap check is a binary search plus a short backwards walk that stops
+    as soon as nothing earlier can reach the query window.
+    """
+
+    __slots__ = ('starts', 'ends', 'ids', 'max_ends', 'loaded_at', 'revision')
+
+    def __init__(self, rows=(), loaded_at=None):
+        rows = sorted(rows)
+        self.starts = [row[0] for row in rows]
+        self.ends = [row[1] for row in rows]
+        self.ids = [row[2] for row in rows]
+        self.max_ends = []
+        self._recompute_max_ends(0)
+        self.loaded_at = loaded_at
+        self.revision = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.ids)
+
+    def _recompute_max_ends(self, position):
+        del self.max_ends[position:]
+        current = self.max_ends[-1] if self.max_ends else float('-inf')
+        for end in self.ends[position:]:
+            current = max(current, end)
+            self.max_ends.append(current)
+
+    def add(self, start, end, booking_id):
+        self.remove(booking_id)
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.ids.insert(position, booking_id)
+        self._recompute_max_ends(position)
+        self.revision += 1
+
+    def remove(self, booking_id):
+        try:
+            position = self.ids.index(booking_id)
+        except ValueError:
+            return False
+        del self.starts[position]
+        del self.ends[position]
+        del self.ids[position]
+        self._recompute_max_ends(position)
+        self.revision += 1
+        return True
+
+    def overlapping(self, start, end, exclude=None):
+        # Same semantics as availability.overlapping_bookings_q: half-open
+        # intervals, and a zero-length window is a point query.
+        if start == end:
+            position = bisect_right(self.starts, start)
+        else:
+            position = bisect_left(self.starts, end)
+
+        for i in range(position - 1, -1, -1):
+            if self.max_ends[i] <= start:
+                break
+            if self.ends[i] > start and self.ids[i] != exclude:
+                yield self.ids[i]
+
+    def overlaps(self, start, end, exclude=None):
+        return next(self.overlapping(start, end, exclude), None) is not None
+
+
+class BookingIntervalIndex:
+    """Per-process index of booking intervals keyed by parking slot.
+
+    Slots are loaded lazily (in bulk when asked for several at once) and kept
+    current by the Booking signal handlers in ``signals.py``. Entries older than
+    ``BOOKING_INDEX_TTL`` seconds are reloaded so writes made by other worker
+    processes are picked up.
+    """
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self._slots = {}
+        self._slot_of_booking = {}
+        self._versions = {}
+
+    @property
+    def lock(self):
+        # Held while reading entries that other threads may be updating
+        return self._lock
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'BOOKING_INDEX_TTL', 30)
+
+    def _is_fresh(self, entry, now):
+        ttl = self.ttl
+        return entry is not None and (ttl is None or now - entry.loaded_at < ttl)
+
+    def version(self, slot_id):
+        return self._versions.get(slot_id, 0)
+
+    def _bump(self, slot_id):
+        self._versions[slot_id] = self._versions.get(slot_id, 0) + 1
+
+    def load(self, slot_ids):
+        # Returns the entry of every requested slot, reading the stale or
+        # missing ones from the database in a single query.
+        now = time.monotonic()
+        entries = {}
+        with self._lock:
+            for slot_id in slot_ids:
+                entry = self._slots.get(slot_id)
+                if self._is_fresh(entry, now):
+                    entries[slot_id] = entry
+            missing = set(slot_ids) - set(entries)
+            versions = {slot_id: self.version(slot_id) for slot_id in missing}
+        if not missing:
+            return entries
+
+        rows = {slot_id: [] for slot_id in missing}
+        # Always the primary: a replica's lag would outlive the request here
+        bookings = Booking.objects.using(DEFAULT_DB_ALIAS).filter(parking_slot__in=missing).values_list(
+            'parking_slot_id', 'booking_start_date', 'booking_end_date', 'booking_id'
+        )
+        for slot_id, start, end, booking_id in bookings.iterator(chunk_size=2000):
+            rows[slot_id].append((to_timestamp(start), to_timestamp(end), booking_id))
+
+        with self._lock:
+            for slot_id, slot_rows in rows.items():
+                entry = SlotIntervals(slot_rows, now)
+                entries[slot_id] = entry
+                # A write landed while we were reading, so don't cache this
+                # snapshot over the newer state
+                if self.version(slot_id) == versions[slot_id]:
+                    self._store(slot_id, entry)
+        return entries
+
+    def _store(self, slot_id, entry):
+        previous = self._slots.get(slot_id)
+        if previous is not None:
+            for booking_id in previous.ids:
+                self._slot_of_booking.pop(booking_id, None)
+        self._slots[slot_id] = entry
+        for booking_id in entry.ids:
+            self._slot_of_booking[booking_id] = slot_id
+        self._bump(slot_id)
+
+    def rebuild(self):
+        # Reload every slot that has bookings from one pass over the table
+        now = time.monotonic()
+        with self._lock:
+            versions = dict(self._versions)
+
+        rows = {}
+        bookings = Booking.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'parking_slot_id', 'booking_start_date', 'booking_end_date', 'booking_id'
+        )
+        for slot_id, start, end, booking_id in bookings.iterator(chunk_size=2000):
+            rows.setdefault(slot_id, []).append((to_timestamp(start), to_timestamp(end), booking_id))
+
+        with self._lock:
+            for slot_id in list(self._slots):
+                if slot_id not in rows and self.version(slot_id) == versions.get(slot_id, 0):
+                    self._store(slot_id, SlotIntervals((), now))
+            for slot_id, slot_rows in rows.items():
+                if self.version(slot_id) == versions.get(slot_id, 0):
+                    self._store(slot_id, SlotIntervals(slot_rows, now))
+
+    def get(self, slot_id):
+        return self.load([slot_id])[slot_id]
+
+    def overlapping(self, slot_id, start, end, exclude=None):
+        entry = self.get(slot_id)
+        with self._lock:
+            return list(entry.overlapping(to_timestamp(start), to_timestamp(end), exclude))
+
+    def overlaps(self, slot_id, start, end, exclude=None):
+        entry = self.get(slot_id)
+        with self._lock:
+            return entry.overlaps(to_timestamp(start), to_timestamp(end), exclude)
+
+    def add(self, booking):
+        slot_id = booking.parking_slot_id
+        start = to_timestamp(booking.booking_start_date)
+        end = to_timestamp(booking.booking_end_date)
+        with self._lock:
+            self.discard(booking.pk)
+            entry = self._slots.get(slot_id)
+            if entry is not None:
+                entry.add(start, end, booking.pk)
+                self._slot_of_booking[booking.pk] = slot_id
+            self._bump(slot_id)
+
+    def discard(self, booking_id):
+        with self._lock:
+            slot_id = self._slot_of_booking.pop(booking_id, None)
+            if slot_id is not None:
+                self._slots[slot_id].remove(booking_id)
+                self._bump(slot_id)
+
+    def invalidate(self, slot_ids):
+        with self._lock:
+            for slot_id in slot_ids:
+                entry = self._slots.pop(slot_id, None)
+                if entry is not None:
+                    for booking_id in entry.ids:
+                        self._slot_of_booking.pop(booking_id, None)
+                self._bump(slot_id)
+
+    def clear(self):
+        with self._lock:
+            for slot_id in list(self._slots):
+                self._bump(slot_id)
+            self._slots.clear()
+            self._slot_of_booking.clear()
+
+
+booking_index = BookingIntervalIndex()
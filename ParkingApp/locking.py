@@ -0,0 +1,63 @@
+import functools
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from .models import ParkingSlot
+
+
+@contextmanager
+def slot_write_lock(slot_ids, using=DEFAULT_DB_ALIAS):
+    """Open a transaction that holds the write lock of every given slot.
+
+    On backends with row locks the slot rows are locked with SELECT ... FOR
+    UPDATE, in id order so two batches can't deadlock; bookings on other slots
+    proceed in parallel. SQLite has no row locks, there the IMMEDIATE
+    transaction mode of ParkingApp.backends.sqlite3 serializes writers when
+    the transaction begins.
+
+    Conflict checks made inside the block see every committed booking and
+    stay valid until it commits.
+    """
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update:
+            locked = ParkingSlot.objects.using(using).select_for_update().filter(pk__in=set(slot_ids))
+            list(locked.order_by('pk').values_list('pk', flat=True))
+        yield
+
+
+def is_lock_error(error):
+    # SQLite's busy timeout ran out (or it gave up on a lock upgrade)
+    message = str(error).lower()
+    return isinstance(error, OperationalError) and ('database is locked' in message or 'database table is locked' in message)
+
+
+def retry_on_lock(func=None, *, using=DEFAULT_DB_ALIAS, retries=None):
+    """Run func again when it fails with "database is locked", up to
+    ``DB_LOCK_RETRIES`` times, sleeping a random delay (full jitter) that
+    doubles per attempt from ``DB_LOCK_RETRY_DELAY`` up to
+    ``DB_LOCK_RETRY_MAX_DELAY`` seconds.
+
+    The failed transaction has rolled back by then, so func starts over. Inside
+    an outer atomic block nothing is retried: that transaction is broken and
+    only its owner can roll it back.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, using=using, retries=retries)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = retries if retries is not None else getattr(settings, 'DB_LOCK_RETRIES', 4)
+        delay = getattr(settings, 'DB_LOCK_RETRY_DELAY', 0.05)
+        max_delay = getattr(settings, 'DB_LOCK_RETRY_MAX_DELAY', 1.0)
+        for attempt in range(attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if attempt == attempts or not is_lock_error(error) or connections[using].in_atomic_block:
+                    raise
+            time.sleep(random.uniform(0, min(max_delay, delay * 2 ** attempt)))
+    return wrapper
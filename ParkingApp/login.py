@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db.models import CharField, F, Value
+from django.utils.crypto import constant_time_compare
+
+from .hashers import is_password_hash
+from .models import Credentials, ParkOwner
+
+USER = 'user'
+OWNER = 'owner'
+
+
+class LoginCache:
+    """Recently verified logins, so repeated logins skip the password hasher.
+
+    Entries are keyed by account and hold the stored hash they were verified
+    against plus an HMAC of the password, never the password itself. A
+    password change alters the stored hash, which invalidates the entry.
+    Entries live ``LOGIN_CACHE_TTL`` seconds and at most ``LOGIN_CACHE_SIZE``
+    are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl=None, size=None):
+        self._ttl = ttl
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'LOGIN_CACHE_TTL', 300)
+
+    @property
+    def size(self):
+        if self._size is not None:
+            return self._size
+        return getattr(settings, 'LOGIN_CACHE_SIZE', 10000)
+
+    def _digest(self, account, encoded, password):
+        message = f'{account[0]}:{account[1]}:{encoded}:{password}'.encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
+    def verified(self, account, encoded, password):
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                return False
+            cached_encoded, digest, expires = entry
+            if cached_encoded != encoded or expires <= time.monotonic():
+                del self._entries[account]
+                return False
+            self._entries.move_to_end(account)
+        return hmac.compare_digest(digest, self._digest(account, encoded, password))
+
+    def store(self, account, encoded, password):
+        if not self.ttl or not self.size:
+            return
+        digest = self._digest(account, encoded, password)
+        with self._lock:
+            self._entries[account] = (encoded, digest, time.monotonic() + self.ttl)
+            self._entries.move_to_end(account)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+login_cache = LoginCache()
+
+
+def _candidates(email):
+    # Both account types in one statement, each side an index seek on email.
+    # The columns that differ are all annotations so they line up in the UNION.
+    columns = ('kind', 'pk', 'email', 'password', 'given_name', 'family_name')
+    users = Credentials.objects.filter(email=email).annotate(
+        kind=Value(USER, output_field=CharField()),
+        given_name=Value('', output_field=CharField()),
+        family_name=Value('', output_field=CharField()),
+    ).values_list(*columns)
+    owners = ParkOwner.objects.filter(email=email).annotate(
+        kind=Value(OWNER, output_field=CharField()),
+        given_name=F('first_name'),
+        family_name=F('last_name'),
+    ).values_list(*columns)
+    return users.union(owners, all=True)
+
+
+def _check(account, encoded, password):
+    if login_cache.verified(account, encoded, password):
+        return True
+
+    model = Credentials if account[0] == USER else ParkOwner
+
+    def upgrade(raw):
+        # The stored hash used an old work factor (or was plain text); swap
+        # in a hash at the current cost
+        model.objects.filter(pk=account[1]).update(password=make_password(raw))
+
+    if is_password_hash(encoded):
+        valid = check_password(password, encoded, setter=upgrade)
+    else:
+        # Plain text rows written before passwords were hashed
+        valid = constant_time_compare(password, encoded)
+        if valid:
+            upgrade(password)
+    if valid:
+        login_cache.store(account, encoded, password)
+    return valid
+
+
+def authenticate(email, password):
+    """Return the Credentials or ParkOwner that ``email`` and ``password``
+    log in as, or None. User credentials win when both match, as before."""
+    for kind, pk, email, encoded, first_name, last_name in sorted(_candidates(email), key=lambda row: (row[0] != USER, row[1])):
+        if not _check((kind, pk), encoded, password):
+            continue
+        if kind == USER:
+            return Credentials(credentials_id=pk, email=email, password=encoded)
+        return ParkOwner(park_owner_id=pk, email=email, password=encoded, first_name=first_name, last_name=last_name)
+    return None
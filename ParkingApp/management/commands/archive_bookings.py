@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ParkingApp import archival
+
+
+class Command(BaseCommand):
+    help = 'Move finished bookings older than BOOKING_ARCHIVE_AFTER_DAYS to BookingArchive (see ParkingApp/archival.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='archive bookings that ended more than this many days ago')
+        parser.add_argument('--batch-size', type=int, help='bookings moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='stop after this many batches, the next run continues')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between batches')
+        parser.add_argument('--every', type=float, help='keep running, archiving every this many seconds')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('days must not be negative.')
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('batch-size must be at least 1.')
+
+        while True:
+            moved = archival.archive_bookings(
+                days=options['days'], batch_size=options['batch_size'],
+                max_batches=options['max_batches'], pause=options['pause'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} bookings.'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,32 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ParkingApp import provisioning
+
+
+class Command(BaseCommand):
+    help = 'Create a park with its details, floors and slots from a JSON layout (see ParkingApp/provisioning.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layout', help='path of the layout JSON file, or - for stdin')
+        parser.add_argument('--owner', type=int, help='park owner id, overrides park_owner in the layout')
+
+    def handle(self, *args, **options):
+        try:
+            if options['layout'] == '-':
+                layout = json.load(sys.stdin)
+            else:
+                with open(options['layout']) as layout_file:
+                    layout = json.load(layout_file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read layout: {error}')
+        if options['owner'] is not None and isinstance(layout, dict):
+            layout['park_owner'] = options['owner']
+
+        try:
+            park, floors, slots = provisioning.provision_layout(layout)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Created park {park.pk} with {len(floors)} floors and {len(slots)} slots.'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ParkingApp import occupancy
+
+
+class Command(BaseCommand):
+    help = 'Recompute the park and floor occupancy counters from ParkingSlot and Booking, or bring them forward with --advance.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--park', type=int, action='append', dest='parks', help='park id, repeatable (default: every park)')
+        parser.add_argument('--advance', action='store_true', help='fold in the bookings that started or ended since the last run instead of recounting')
+        parser.add_argument('--every', type=float, help='keep running, every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            if options['advance']:
+                self.advance(options['parks'])
+            else:
+                self.reconcile(options['parks'])
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def reconcile(self, parks):
+        rows = occupancy.reconcile(parks)
+        for row in rows:
+            if row.floor_id is None:
+                self.stdout.write(f'park {row.park_id}: {row.free}/{row.total} free, {row.free_with_charger}/{row.with_charger} with charger')
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {len(rows)} occupancy rows.'))
+
+    def advance(self, parks):
+        if parks is None:
+            count = occupancy.advance_all()
+        else:
+            for park_id in parks:
+                occupancy.advance(park_id)
+            count = len(parks)
+        self.stdout.write(self.style.SUCCESS(f'Advanced the occupancy counters of {count} parks.'))
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ParkingApp import seeding
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with generated owners, parks, slots, users, rules and bookings (see ParkingApp/seeding.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=10, help='owners, one park each')
+        parser.add_argument('--floors', type=int, default=3, help='floors per park')
+        parser.add_argument('--slots', type=int, default=50, help='slots per floor')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--rules', type=int, default=4, help='pricing rules per slot')
+        parser.add_argument('--bookings', type=int, default=20, help='bookings per slot, at most')
+        parser.add_argument('--days', type=int, default=30, help='days the bookings and rules are spread over')
+        parser.add_argument('--start', help='first day, YYYY-MM-DD (default: days/2 days ago)')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--prefix', default='', help='prepended to the account emails, to seed a database that already has seed accounts')
+
+    def handle(self, *args, **options):
+        counts = [options[name] for name in ('owners', 'floors', 'slots', 'users', 'rules', 'bookings', 'days')]
+        if any(count < 0 for count in counts):
+            raise CommandError('Counts must not be negative.')
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+        except ValueError:
+            raise CommandError('start must be a date as YYYY-MM-DD.')
+
+        try:
+            created = seeding.generate(
+                owners=options['owners'], floors=options['floors'], slots=options['slots'], users=options['users'],
+                rules=options['rules'], bookings=options['bookings'], days=options['days'], start=start, seed=options['seed'],
+                prefix=options['prefix'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        summary = ', '.join(f'{count} {model}' for model, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}.'))
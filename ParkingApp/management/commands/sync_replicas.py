@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ParkingApp import routers
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite database over every replica in DATABASE_REPLICAS, standing in for replication '
+        'when developing locally (see ParkingApp/routers.py). With --heartbeat-only just stamp the primary, '
+        'for replicas that are replicated by other means.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases', help='replica alias, repeatable (default: every replica)')
+        parser.add_argument('--heartbeat-only', action='store_true', help='only stamp the primary')
+        parser.add_argument('--every', type=float, help='keep running, syncing every this many seconds')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or routers.replica_aliases()
+        unknown = set(aliases) - set(routers.replica_aliases())
+        if unknown:
+            raise CommandError(f"Not in DATABASE_REPLICAS: {', '.join(sorted(unknown))}.")
+        if not aliases and not options['heartbeat_only']:
+            raise CommandError('No replicas configured, set DATABASE_REPLICAS.')
+
+        while True:
+            if options['heartbeat_only']:
+                routers.beat()
+                self.stdout.write(self.style.SUCCESS('Stamped the primary.'))
+            else:
+                for alias in aliases:
+                    try:
+                        routers.sync_sqlite_replica(alias)
+                    except ValueError as error:
+                        raise CommandError(error)
+                    self.stdout.write(self.style.SUCCESS(f'Synced {alias}.'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,356 @@
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Anything else is counted as OTHER, so clients can't invent label values
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+UNMATCHED = '<unmatched>'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        # Buckets are upper bounds inclusive, as Prometheus' le
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def merge(self, counts, total):
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += total
+
+
+class Series:
+    """Everything recorded for one (route, method)."""
+
+    __slots__ = ('statuses', 'latency', 'db_latency', 'queries', 'size')
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_latency = Histogram(DB_LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+    def to_dict(self):
+        return {
+            'statuses': dict(self.statuses),
+            **{
+                name: [list(histogram.counts), histogram.sum]
+                for name, histogram in self.histograms()
+            },
+        }
+
+    def merge(self, data):
+        for code, count in data['statuses'].items():
+            self.statuses[code] = self.statuses.get(code, 0) + count
+        for name, histogram in self.histograms():
+            histogram.merge(*data[name])
+
+    def histograms(self):
+        return (
+            ('latency', self.latency),
+            ('db_latency', self.db_latency),
+            ('queries', self.queries),
+            ('size', self.size),
+        )
+
+
+class _ShardOwner:
+    # Lives in the thread-local next to the thread's shard; it is collected
+    # when the thread ends, which retires the shard
+    __slots__ = ('__weakref__',)
+
+
+class MetricsRegistry:
+    """Request metrics of this process, optionally shared through a directory.
+
+    Every thread records into its own shard, so the request path takes no
+    lock; reading adds the shards up. When a thread ends its shard is merged
+    into the retired totals, so thread-per-request servers don't pile them
+    up. With ``METRICS_DIR`` set the process writes its totals to
+    ``<dir>/<pid>-<random>.json`` at most every ``METRICS_FLUSH_INTERVAL``
+    seconds, and ``collect`` adds up every file in the directory, giving
+    totals across all workers sharing it.
+    """
+
+    def __init__(self, directory=None, flush_interval=None, name=None):
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._name = name
+        self._reset()
+        # A forked worker starts from nothing rather than its parent's counts
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # The random part keeps a later process with the same pid from
+        # overwriting this one's file
+        self.name = self._name or f'{os.getpid()}-{secrets.token_hex(4)}'
+        self._flush_lock = threading.Lock()
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._next_flush = 0.0
+
+    @property
+    def directory(self):
+        directory = self._directory or getattr(settings, 'METRICS_DIR', None)
+        return Path(directory) if directory else None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # Once per thread
+            shard = self._local.shard = {}
+            self._local.owner = owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(owner, self._retire, self._shards, shard)
+        return shard
+
+    def _retire(self, shards, shard):
+        # Its thread is gone, nothing writes to it any more
+        with self._shards_lock:
+            if shards is not self._shards or shards.pop(id(shard), None) is None:
+                # Registered before a reset
+                return
+            for key, series in shard.items():
+                self._retired.setdefault(key, Series()).merge(series.to_dict())
+
+    def record(self, route, method, status, seconds, queries, db_seconds, size=None):
+        key = (route, method if method in METHODS else 'OTHER')
+        shard = self._shard()
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = Series()
+        status = str(status)
+        series.statuses[status] = series.statuses.get(status, 0) + 1
+        series.latency.observe(seconds)
+        series.db_latency.observe(db_seconds)
+        series.queries.observe(queries)
+        if size is not None:
+            series.size.observe(size)
+
+    def snapshot(self):
+        """This process' series, as {(route, method): Series}."""
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            retired = [(key, series.to_dict()) for key, series in self._retired.items()]
+        totals = {}
+        for key, data in retired:
+            totals.setdefault(key, Series()).merge(data)
+        for shard in shards:
+            for key, series in shard.copy().items():
+                totals.setdefault(key, Series()).merge(series.to_dict())
+        return totals
+
+    def flush(self):
+        directory = self.directory
+        if directory is None:
+            return
+        data = [[route, method, series.to_dict()] for (route, method), series in self.snapshot().items()]
+        directory.mkdir(parents=True, exist_ok=True)
+        # Readers only ever see a complete file
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=f'.{self.name}-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp, directory / f'{self.name}.json')
+
+    def maybe_flush(self):
+        if self.directory is None or time.monotonic() < self._next_flush:
+            return
+        # One thread flushes, the others carry on
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_flush = time.monotonic() + self.flush_interval
+            self.flush()
+        except OSError:
+            logger.exception('Could not write request metrics to %s', self.directory)
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Totals of every worker writing to the directory, or of this process
+        when there is none, as {(route, method): Series}."""
+        directory = self.directory
+        if directory is None:
+            return self.snapshot()
+        self.flush()
+        totals = {}
+        for path in directory.glob('*.json'):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Removed or replaced under us
+                continue
+            for route, method, series in data:
+                totals.setdefault((route, method), Series()).merge(series)
+        return totals
+
+    def clear(self):
+        self._reset()
+        directory = self.directory
+        if directory is not None:
+            (directory / f'{self.name}.json').unlink(missing_ok=True)
+
+
+metrics = MetricsRegistry()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# (name, Series attribute, help)
+HISTOGRAMS = (
+    ('parking_http_request_duration_seconds', 'latency', 'Time to produce the response, in seconds.'),
+    ('parking_http_db_duration_seconds', 'db_latency', 'Time spent in database queries per request, in seconds.'),
+    ('parking_http_db_queries', 'queries', 'Database queries per request.'),
+    ('parking_http_response_size_bytes', 'size', 'Response body size, in bytes. Streamed responses are not counted.'),
+)
+
+
+def render_prometheus(series):
+    """series ({(route, method): Series}) in the Prometheus text format."""
+    keys = sorted(series)
+    lines = [
+        '# HELP parking_http_requests_total Requests by route, method and status code.',
+        '# TYPE parking_http_requests_total counter',
+    ]
+    for route, method in keys:
+        labels = f'route="{_escape(route)}",method="{method}"'
+        for code, count in sorted(series[route, method].statuses.items()):
+            lines.append(f'parking_http_requests_total{{{labels},status="{code}"}} {count}')
+
+    for name, attribute, help_text in HISTOGRAMS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for route, method in keys:
+            histogram = getattr(series[route, method], attribute)
+            labels = f'route="{_escape(route)}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip((*histogram.bounds, '+Inf'), histogram.counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {_number(histogram.sum)}')
+            lines.append(f'{name}_count{{{labels}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    # Counts the queries of one request and their time
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Timer of the request being handled. A context variable rather than a wrapper
+# on the request thread's connections: the async ORM queries on other threads,
+# and sync_to_async carries the context over to them.
+_timer = ContextVar('metrics_query_timer', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.seconds += time.perf_counter() - start
+        timer.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # connection_created receiver: every connection reports to _timer
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class MetricsMiddleware:
+    """Records latency, status code, database queries and time, and response
+    size of every request into ``metrics``, labelled by URL pattern (not the
+    path, so /bookings/1/ and /bookings/2/ are one series)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        token = _timer.set(timer)
+        try:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            elapsed = time.perf_counter() - start
+        finally:
+            _timer.reset(token)
+        self._record(request, response, elapsed, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        token = _timer.set(timer)
+        try:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            elapsed = time.perf_counter() - start
+        finally:
+            _timer.reset(token)
+        self._record(request, response, elapsed, timer)
+        return response
+
+    @staticmethod
+    def _record(request, response, elapsed, timer):
+        match = request.resolver_match
+        route = '/' + match.route if match is not None else UNMATCHED
+        # Streamed responses are timed up to their first byte and not sized
+        size = None if response.streaming else len(response.content)
+        metrics.record(route, request.method, response.status_code, elapsed, timer.queries, timer.seconds, size)
+        metrics.maybe_flush()
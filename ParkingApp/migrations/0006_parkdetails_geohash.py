@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+from ParkingApp import geo
+
+
+def fill_geohash(apps, schema_editor):
+    ParkDetails = apps.get_model("ParkingApp", "ParkDetails")
+    details = list(ParkDetails.objects.all())
+    for item in details:
+        item.geohash = geo.encode(float(item.latitude), float(item.longitude))
+    ParkDetails.objects.bulk_update(details, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ParkingApp", "0005_remove_booking_modified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="parkdetails",
+            name="geohash",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=9
+            ),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0006_parkdetails_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['parking_slot', 'booking_start_date', 'booking_end_date'], name='booking_slot_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['parking_slot', 'booking_end_date', 'booking_start_date'], name='booking_slot_end_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingslotrules',
+            index=models.Index(fields=['parking_slot', 'date_start_rule', 'date_end_rule'], name='rules_slot_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingslotrules',
+            index=models.Index(fields=['parking_slot', 'date_end_rule', 'date_start_rule'], name='rules_slot_end_start_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+from ParkingApp.hashers import hash_password, is_password_hash
+
+
+def hash_passwords(apps, schema_editor):
+    for model_name in ('Credentials', 'ParkOwner'):
+        model = apps.get_model('ParkingApp', model_name)
+        rows = list(model.objects.all())
+        for row in rows:
+            if not is_password_hash(row.password):
+                row.password = hash_password(row.password)
+        model.objects.bulk_update(rows, ['password'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0007_overlap_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='credentials',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='parkowner',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.RunPython(hash_passwords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0008_login_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Occupancy',
+            fields=[
+                ('occupancy_id', models.AutoField(primary_key=True, serialize=False)),
+                ('total', models.IntegerField(default=0)),
+                ('with_charger', models.IntegerField(default=0)),
+                ('booked', models.IntegerField(default=0)),
+                ('booked_with_charger', models.IntegerField(default=0)),
+                ('as_of', models.DateTimeField()),
+                ('floor', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ParkingApp.floor')),
+                ('park', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ParkingApp.park')),
+            ],
+            options={
+                'db_table': 'Occupancy',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='occupancy',
+            constraint=models.UniqueConstraint(condition=models.Q(('floor__isnull', True)), fields=('park',), name='occupancy_one_park_row'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Every booking, hot or archived, for the reads that opt into the archive.
+# UNION ALL keeps filters on the view pushed down into both tables' indexes.
+CREATE_VIEW = '''
+    CREATE VIEW "BookingHistory" AS
+    SELECT booking_id, parking_slot_id, user_id, booking_start_date, booking_end_date, price, 0 AS archived
+      FROM "Booking"
+    UNION ALL
+    SELECT booking_id, parking_slot_id, user_id, booking_start_date, booking_end_date, price, 1 AS archived
+      FROM "BookingArchive"
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0009_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingHistory',
+            fields=[
+                ('booking_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('booking_start_date', models.DateTimeField()),
+                ('booking_end_date', models.DateTimeField()),
+                ('price', models.FloatField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'BookingHistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingArchive',
+            fields=[
+                ('booking_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('booking_start_date', models.DateTimeField()),
+                ('booking_end_date', models.DateTimeField()),
+                ('price', models.FloatField()),
+                ('archived_at', models.DateTimeField()),
+                ('parking_slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ParkingApp.parkingslot')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ParkingApp.users')),
+            ],
+            options={
+                'db_table': 'BookingArchive',
+                'indexes': [models.Index(fields=['parking_slot', 'booking_start_date', 'booking_end_date'], name='archive_slot_start_end_idx'), models.Index(fields=['booking_start_date', 'booking_id'], name='archive_start_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEW, 'DROP VIEW "BookingHistory"'),
+    ]
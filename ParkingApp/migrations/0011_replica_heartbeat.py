@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0010_booking_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaHeartbeat',
+            fields=[
+                ('heartbeat_id', models.AutoField(primary_key=True, serialize=False)),
+                ('beat_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'ReplicaHeartbeat',
+            },
+        ),
+    ]
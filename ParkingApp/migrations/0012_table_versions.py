@@ -0,0 +1,90 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:05
+
+from django.db import NotSupportedError, migrations, models
+
+# Tables whose list and detail endpoints send an ETag (caching.py); their
+# TableVersion rows are created on first read
+TABLES = ['Park', 'ParkingDetails', 'Floor', 'ParkingApp_parkingslot', 'ParkingSlotRules']
+EVENTS = ['INSERT', 'UPDATE', 'DELETE']
+
+# The counter is bumped inside the writing statement's own transaction, so it
+# is committed, rolled back and replicated together with the change. Trigger
+# syntax differs per database, hence one set of statements per vendor.
+BUMP = 'UPDATE "TableVersion" SET version = version + 1 WHERE table_name = \'{table}\''
+
+CREATE_TRIGGERS = {
+    'sqlite': [
+        f'''
+        CREATE TRIGGER "{table}_version_{event.lower()}" AFTER {event} ON "{table}"
+        BEGIN
+            {BUMP.format(table=table)};
+        END
+        '''
+        for table in TABLES for event in EVENTS
+    ],
+    'postgresql': [
+        '''
+        CREATE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE "TableVersion" SET version = version + 1 WHERE table_name = TG_ARGV[0];
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        *(
+            f'''
+            CREATE TRIGGER "{table}_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}"
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version('{table}')
+            '''
+            for table in TABLES
+        ),
+    ],
+    'mysql': [
+        f'''
+        CREATE TRIGGER `{table}_version_{event.lower()}` AFTER {event} ON `{table}`
+        FOR EACH ROW {BUMP.format(table=table).replace('"', '`')}
+        '''
+        for table in TABLES for event in EVENTS
+    ],
+}
+DROP_TRIGGERS = {
+    'sqlite': [f'DROP TRIGGER "{table}_version_{event.lower()}"' for table in TABLES for event in EVENTS],
+    'postgresql': [
+        *(f'DROP TRIGGER "{table}_version" ON "{table}"' for table in TABLES),
+        'DROP FUNCTION bump_table_version()',
+    ],
+    'mysql': [f'DROP TRIGGER `{table}_version_{event.lower()}`' for table in TABLES for event in EVENTS],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in statements:
+            raise NotSupportedError(
+                f'No TableVersion triggers for {vendor}; the ETags of caching.py need them (see migration 0012).'
+            )
+        for sql in statements[vendor]:
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0011_replica_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table_name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'TableVersion',
+            },
+        ),
+        migrations.RunPython(_run(CREATE_TRIGGERS), _run(DROP_TRIGGERS)),
+    ]
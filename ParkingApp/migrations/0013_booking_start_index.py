@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ParkingApp', '0012_table_versions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_start_date', 'booking_id'], name='booking_start_idx'),
+        ),
+    ]
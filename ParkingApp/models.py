@@ -1,14 +1,29 @@
 from django.db import models
 
+from . import geo
+from .hashers import hash_password
+
 class ParkOwner(models.Model):
     park_owner_id = models.AutoField(primary_key=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
-    email = models.EmailField(unique=False)
+    email = models.EmailField(unique=False, db_index=True)
     password = models.CharField(max_length=100)  
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored hash, which save keeps as it is
+        instance._loaded_password = instance.__dict__.get('password')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.password = hash_password(self.password, getattr(self, '_loaded_password', None))
+        super().save(*args, **kwargs)
+        self._loaded_password = self.password
     
     class Meta:
         db_table = 'ParkOwner'
@@ -33,20 +48,41 @@ class ParkDetails(models.Model):
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     height_limit = models.IntegerField(default=2)
     weigh_limit = models.IntegerField(default=3500)
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION, db_index=True, editable=False, default='')
 
     def __str__(self):
         return f"Details for Park with address: {self.address}"
+
+    def save(self, *args, **kwargs):
+        # Keep the spatial index column in step with the coordinates
+        self.geohash = geo.encode(float(self.latitude), float(self.longitude))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
     
     class Meta:
         db_table = 'ParkingDetails'
 
 class Credentials(models.Model):
     credentials_id = models.AutoField(primary_key=True)
-    email = models.EmailField(unique=False)
-    password = models.CharField(max_length=100)  # Use Django's authentication system for passwords
+    email = models.EmailField(unique=False, db_index=True)
+    password = models.CharField(max_length=100)  # Stored hashed, see hashers.py
 
     def __str__(self):
         return f"Credentials {self.credentials_id} - {self.email}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored hash, which save keeps as it is
+        instance._loaded_password = instance.__dict__.get('password')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.password = hash_password(self.password, getattr(self, '_loaded_password', None))
+        super().save(*args, **kwargs)
+        self._loaded_password = self.password
     
     class Meta:
         db_table = 'Credentials'
@@ -87,6 +123,13 @@ class ParkingSlot(models.Model):
     
     def __str__(self):
         return f"ParkingSlot {self.slot_number} with id: {self.parking_slot_id} on floor: {self.floor.floor_number}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The occupancy signal handlers need the floor the slot was loaded on
+        instance._loaded_floor_id = instance.__dict__.get('floor_id')
+        return instance
     
 class ParkingSlotRules(models.Model):
     parking_slot_rules_id = models.AutoField(primary_key=True)
@@ -100,6 +143,11 @@ class ParkingSlotRules(models.Model):
 
     class Meta:
         db_table = 'ParkingSlotRules'
+        # Same overlap predicate as Booking, see Booking.Meta
+        indexes = [
+            models.Index(fields=['parking_slot', 'date_start_rule', 'date_end_rule'], name='rules_slot_start_end_idx'),
+            models.Index(fields=['parking_slot', 'date_end_rule', 'date_start_rule'], name='rules_slot_end_start_idx'),
+        ]
 
 class Booking(models.Model):
     booking_id = models.AutoField(primary_key=True)
@@ -113,12 +161,114 @@ class Booking(models.Model):
     # def __str__(self):
     #     return f"Booking starting at {self.date_start_rule} and ending at {self.date_end_rule} with price {self.price} in slot: {self.parking_slot}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The occupancy signal handlers need the period the booking had before
+        # an update; deferred fields are left out
+        fields = instance.__dict__
+        if all(name in fields for name in ('parking_slot_id', 'booking_start_date', 'booking_end_date')):
+            instance._loaded_period = (fields['parking_slot_id'], fields['booking_start_date'], fields['booking_end_date'])
+        return instance
+
     class Meta:
         db_table = 'Booking'
         unique_together = []
-    
+        # Overlap checks are parking_slot = ? AND start < ? AND end > ?, and
+        # both indexes answer them without reading the table. Leading with the
+        # end date skips a slot's past bookings, so the planner prefers it for
+        # windows near the present on slots with a long booking history.
+        # Listings page on (start, pk), see BookingKeysetPagination.
+        indexes = [
+            models.Index(fields=['parking_slot', 'booking_start_date', 'booking_end_date'], name='booking_slot_start_end_idx'),
+            models.Index(fields=['parking_slot', 'booking_end_date', 'booking_start_date'], name='booking_slot_end_start_idx'),
+            models.Index(fields=['booking_start_date', 'booking_id'], name='booking_start_idx'),
+        ]
 
-    
-    
-    
-    
\ No newline at end of file
+
+class BookingArchive(models.Model):
+    # Finished bookings moved out of Booking by archival.py, so the overlap
+    # checks and listings on Booking only see recent and upcoming ones. Rows
+    # keep their booking_id.
+    booking_id = models.IntegerField(primary_key=True)
+    parking_slot = models.ForeignKey('ParkingSlot', on_delete=models.CASCADE)
+    user = models.ForeignKey('Users', on_delete=models.CASCADE)
+    booking_start_date = models.DateTimeField()
+    booking_end_date = models.DateTimeField()
+    price = models.FloatField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'BookingArchive'
+        indexes = [
+            models.Index(fields=['parking_slot', 'booking_start_date', 'booking_end_date'], name='archive_slot_start_end_idx'),
+            models.Index(fields=['booking_start_date', 'booking_id'], name='archive_start_idx'),
+        ]
+
+
+class BookingHistory(models.Model):
+    # Read-only database view over Booking and BookingArchive together, for
+    # the reads that opt into archived bookings (?include_archived=true)
+    booking_id = models.IntegerField(primary_key=True)
+    parking_slot = models.ForeignKey('ParkingSlot', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    user = models.ForeignKey('Users', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    booking_start_date = models.DateTimeField()
+    booking_end_date = models.DateTimeField()
+    price = models.FloatField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'BookingHistory'
+
+
+class Occupancy(models.Model):
+    # Materialized slot counters of one floor, or of the whole park when
+    # floor is null, as of the as_of instant. Kept current by occupancy.py.
+    occupancy_id = models.AutoField(primary_key=True)
+    park = models.ForeignKey('Park', on_delete=models.CASCADE)
+    floor = models.OneToOneField('Floor', on_delete=models.CASCADE, null=True, blank=True)
+    total = models.IntegerField(default=0)
+    with_charger = models.IntegerField(default=0)
+    booked = models.IntegerField(default=0)
+    booked_with_charger = models.IntegerField(default=0)
+    as_of = models.DateTimeField()
+
+    @property
+    def free(self):
+        return self.total - self.booked
+
+    @property
+    def free_with_charger(self):
+        return self.with_charger - self.booked_with_charger
+
+    def __str__(self):
+        scope = f"floor {self.floor_id}" if self.floor_id else "park"
+        return f"Occupancy of park {self.park_id} ({scope}): {self.free}/{self.total} free"
+
+    class Meta:
+        db_table = 'Occupancy'
+        constraints = [
+            models.UniqueConstraint(fields=['park'], condition=models.Q(floor__isnull=True), name='occupancy_one_park_row'),
+        ]
+
+
+class ReplicaHeartbeat(models.Model):
+    # A single row stamped on the primary before each replication pass; its
+    # age on a replica is how far that replica lags (see routers.py)
+    heartbeat_id = models.AutoField(primary_key=True)
+    beat_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'ReplicaHeartbeat'
+
+
+class TableVersion(models.Model):
+    # Change counter of one table, bumped by database triggers on every
+    # insert, update and delete of its rows (see migration 0012), so writes
+    # made any way at all move the ETags of caching.py
+    table_name = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'TableVersion'
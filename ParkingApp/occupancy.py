@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .availability import overlapping_bookings_q
+from .caching import entity_cache
+from .models import Booking, Floor, Occupancy, Park, ParkingSlot
+
+# Occupancy rows hold slot counters per floor plus one row per park (floor is
+# null), all describing the instant in the park's as_of column.
+#
+# Writes change the counters in the same transaction as the booking or slot,
+# with a single conditional UPDATE: a booking counts only if it is active at
+# the row's as_of, which the database reads when it applies the UPDATE.
+# Bookings that start or end as time passes are folded in by advance(), which
+# locks the park's rows, counts the bookings that started or ended between
+# as_of and now, and moves as_of forward. Both sides agree on as_of because
+# each one reads it under the row lock. advance() runs from the
+# reconcile_occupancy command; reads (current()) add the same transitions to
+# what they read without writing anything.
+
+
+def _aware(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def _rows(floor_id, using=DEFAULT_DB_ALIAS):
+    # The floor's row and its park's row, the park found by the UPDATE itself
+    park = Floor.objects.using(using).filter(pk=floor_id).values('park_id')
+    return Occupancy.objects.using(using).filter(Q(floor=floor_id) | Q(park__in=park, floor__isnull=True))
+
+
+def booking_changed(slot_id, start, end, delta, using=DEFAULT_DB_ALIAS):
+    """Count (delta=1) or uncount (delta=-1) a booking of slot_id for
+    [start, end) in the rows whose as_of falls inside that period."""
+    start, end = _aware(start), _aware(end)
+    # as_of never runs ahead of now, so future bookings can't be active at it
+    if end <= start or start > timezone.now():
+        return
+    try:
+        slot = entity_cache.get(ParkingSlot, slot_id, using)
+    except ParkingSlot.DoesNotExist:
+        return
+    _rows(slot.floor_id, using).filter(as_of__gte=start, as_of__lt=end).update(
+        booked=F('booked') + delta,
+        booked_with_charger=F('booked_with_charger') + (delta if slot.has_charger else 0),
+    )
+
+
+def slot_changed(floor_id, has_charger, delta, using=DEFAULT_DB_ALIAS):
+    _rows(floor_id, using).update(
+        total=F('total') + delta,
+        with_charger=F('with_charger') + (delta if has_charger else 0),
+    )
+
+
+def floor_added(floor_id, park_id, using=DEFAULT_DB_ALIAS):
+    # A new floor starts empty, at the same as_of as the rest of its park
+    with transaction.atomic(using=using):
+        park_row = Occupancy.objects.using(using).select_for_update().filter(park=park_id, floor__isnull=True).first()
+        if park_row is not None:
+            Occupancy.objects.using(using).get_or_create(
+                floor_id=floor_id, defaults={'park_id': park_id, 'as_of': park_row.as_of}
+            )
+
+
+def _count(park_ids, now, using):
+    # Fresh rows of park_ids counted from ParkingSlot and Booking, not saved
+    rows = {}
+    for floor_id, park_id in Floor.objects.using(using).filter(park__in=park_ids).values_list('pk', 'park_id'):
+        rows[floor_id] = Occupancy(park_id=park_id, floor_id=floor_id, as_of=now)
+    for park_id in park_ids:
+        rows[(park_id,)] = Occupancy(park_id=park_id, floor_id=None, as_of=now)
+
+    slots = ParkingSlot.objects.using(using).filter(floor__park__in=park_ids).values('floor_id', 'floor__park_id').annotate(
+        total=Count('pk'),
+        with_charger=Count('pk', filter=Q(has_charger=True)),
+    )
+    for group in slots:
+        for row in (rows[group['floor_id']], rows[(group['floor__park_id'],)]):
+            row.total += group['total']
+            row.with_charger += group['with_charger']
+
+    active = Booking.objects.using(using).filter(
+        overlapping_bookings_q(now, now), parking_slot__floor__park__in=park_ids
+    ).values('parking_slot__floor_id', 'parking_slot__floor__park_id').annotate(
+        booked=Count('parking_slot', distinct=True),
+        booked_with_charger=Count('parking_slot', distinct=True, filter=Q(parking_slot__has_charger=True)),
+    )
+    for group in active:
+        for row in (rows[group['parking_slot__floor_id']], rows[(group['parking_slot__floor__park_id'],)]):
+            row.booked += group['booked']
+            row.booked_with_charger += group['booked_with_charger']
+    return list(rows.values())
+
+
+def reconcile(park_ids=None, now=None, using=DEFAULT_DB_ALIAS):
+    """Recompute the rows of park_ids (every park by default) from ParkingSlot
+    and Booking. Returns the new rows."""
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        parks = Park.objects.using(using)
+        if park_ids is not None:
+            parks = parks.filter(pk__in=park_ids)
+        park_ids = list(parks.values_list('pk', flat=True))
+        rows = _count(park_ids, now, using)
+        Occupancy.objects.using(using).filter(park__in=park_ids).delete()
+        return Occupancy.objects.using(using).bulk_create(rows)
+
+
+def _transitions(park_id, since, now, using):
+    # Bookings of the park that started in (since, now] and are still going,
+    # minus the ones that were going at since and ended in (since, now]
+    bookings = Booking.objects.using(using).filter(parking_slot__floor__park=park_id)
+    started = bookings.filter(booking_start_date__gt=since, booking_start_date__lte=now, booking_end_date__gt=now)
+    ended = bookings.filter(booking_end_date__gt=since, booking_end_date__lte=now, booking_start_date__lte=since)
+    for queryset, sign in ((started, 1), (ended, -1)):
+        groups = queryset.values('parking_slot__floor_id', 'parking_slot__has_charger').annotate(count=Count('pk'))
+        for group in groups:
+            yield group['parking_slot__floor_id'], group['parking_slot__has_charger'], sign * group['count']
+
+
+def _sorted(rows):
+    # The park row first, then the floors
+    return sorted(rows, key=lambda row: (row.floor_id is not None, row.floor_id or 0))
+
+
+def _bring_forward(rows, park_id, now, using):
+    # Add the park's booking transitions since the rows' as_of to them
+    since = rows[0].as_of
+    by_floor = {row.floor_id: row for row in rows}
+    for floor_id, has_charger, delta in _transitions(park_id, since, now, using):
+        for row in (by_floor.get(floor_id), by_floor[None]):
+            if row is not None:
+                row.booked += delta
+                row.booked_with_charger += delta if has_charger else 0
+    for row in rows:
+        row.as_of = now
+
+
+def advance(park_id, now=None, using=DEFAULT_DB_ALIAS):
+    """Bring the park's rows forward to now and return them, the park row
+    first. Parks without rows are reconciled."""
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        rows = list(Occupancy.objects.using(using).select_for_update().filter(park=park_id))
+        if not rows:
+            rows = reconcile([park_id], now, using)
+        elif rows[0].as_of < now:
+            _bring_forward(rows, park_id, now, using)
+            Occupancy.objects.using(using).bulk_update(rows, ['booked', 'booked_with_charger', 'as_of'])
+    return _sorted(rows)
+
+
+def advance_all(now=None, using=DEFAULT_DB_ALIAS):
+    """advance() every park with rows, one transaction each. Returns how many
+    parks were brought forward."""
+    park_ids = list(Occupancy.objects.using(using).filter(floor__isnull=True).values_list('park_id', flat=True))
+    for park_id in park_ids:
+        advance(park_id, now, using)
+    return len(park_ids)
+
+
+def current(park_id, now=None, using=DEFAULT_DB_ALIAS):
+    """The park's counters at now, the park row first, or [] for a park that
+    doesn't exist. Read only, so polling never takes the write lock: rows more
+    than OCCUPANCY_MAX_LAG seconds old are brought forward in memory, and a
+    park without rows is counted from scratch."""
+    now = now or timezone.now()
+    rows = _sorted(Occupancy.objects.using(using).filter(park=park_id))
+    if not rows:
+        if not Park.objects.using(using).filter(pk=park_id).exists():
+            return []
+        return _sorted(_count([park_id], now, using))
+    max_lag = getattr(settings, 'OCCUPANCY_MAX_LAG', 5)
+    if (now - rows[0].as_of).total_seconds() > max_lag:
+        _bring_forward(rows, park_id, now, using)
+    return rows
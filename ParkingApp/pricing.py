@@ -0,0 +1,182 @@
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import entity_cache
+from .intervals import to_timestamp
+from .models import ParkingSlot, ParkingSlotRules
+
+
+class PriceTimeline:
+    """A slot's rules compiled into sorted, non-overlapping price segments.
+
+    ``boundaries`` holds every segment edge and ``rates[i]`` applies on
+    ``[boundaries[i], boundaries[i + 1])``; gaps between rules carry the slot's
+    standard price. ``cumulative[i]`` is the integral of the rate up to
+    ``boundaries[i]``, so the cost of any window is two binary searches and a
+    subtraction.
+
+    A window's price is the time-weighted average of the rates it covers. A
+    booking inside a single rule pays exactly that rule's price, as before, and
+    one spanning several rules pays each in proportion to its share.
+    """
+
+    __slots__ = ('standard_price', 'boundaries', 'rates', 'cumulative', 'rule_ids', 'loaded_at')
+
+    def __init__(self, standard_price, rules=(), loaded_at=None):
+        self.standard_price = float(standard_price)
+        self.rule_ids = set()
+        self.loaded_at = loaded_at
+
+        # Earlier rules win where rules overlap, like the old .first() lookup
+        segments = []
+        for start, end, price, rule_id in sorted(rules, key=lambda rule: rule[3], reverse=True):
+            self.rule_ids.add(rule_id)
+            if end <= start:
+                continue
+            kept = []
+            for segment in segments:
+                if segment[1] <= start or segment[0] >= end:
+                    kept.append(segment)
+                    continue
+                if segment[0] < start:
+                    kept.append((segment[0], start, segment[2]))
+                if segment[1] > end:
+                    kept.append((end, segment[1], segment[2]))
+            kept.append((start, end, float(price)))
+            segments = sorted(kept)
+
+        self.boundaries = []
+        self.rates = []
+        for start, end, price in segments:
+            if not self.boundaries:
+                self.boundaries.append(start)
+            elif self.boundaries[-1] < start:
+                # Gap between two rules
+                self.rates.append(self.standard_price)
+                self.boundaries.append(start)
+            self.rates.append(price)
+            self.boundaries.append(end)
+
+        self.cumulative = [0.0]
+        for i, rate in enumerate(self.rates):
+            self.cumulative.append(self.cumulative[-1] + rate * (self.boundaries[i + 1] - self.boundaries[i]))
+
+    def rate_at(self, moment):
+        i = bisect_right(self.boundaries, moment) - 1
+        if 0 <= i < len(self.rates):
+            return self.rates[i]
+        return self.standard_price
+
+    def _integral(self, moment):
+        boundaries = self.boundaries
+        if not boundaries or moment <= boundaries[0]:
+            origin = boundaries[0] if boundaries else 0
+            return self.standard_price * (moment - origin)
+        i = bisect_right(boundaries, moment) - 1
+        if i >= len(self.rates):
+            return self.cumulative[-1] + self.standard_price * (moment - boundaries[-1])
+        return self.cumulative[i] + self.rates[i] * (moment - boundaries[i])
+
+    def price(self, start, end):
+        # start and end are microsecond timestamps, see intervals.to_timestamp
+        if end <= start:
+            return round(self.rate_at(start), 2)
+        return round((self._integral(end) - self._integral(start)) / (end - start), 2)
+
+
+class PricingEngine:
+    """Memoized price timelines per parking slot.
+
+    Timelines are compiled on first use (several slots in two queries) and
+    dropped by the signal handlers when a slot or one of its rules changes.
+    They are also recompiled after ``PRICE_TIMELINE_TTL`` seconds so changes
+    made by other worker processes are picked up.
+    """
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._lock = threading.RLock()
+        self._timelines = {}
+        self._slot_of_rule = {}
+        self._versions = {}
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'PRICE_TIMELINE_TTL', 30)
+
+    def _is_fresh(self, timeline, now):
+        ttl = self.ttl
+        return timeline is not None and (ttl is None or now - timeline.loaded_at < ttl)
+
+    def timelines(self, slot_ids):
+        # Returns the timeline of every existing slot among slot_ids
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for slot_id in slot_ids:
+                timeline = self._timelines.get(slot_id)
+                if self._is_fresh(timeline, now):
+                    result[slot_id] = timeline
+            missing = set(slot_ids) - set(result)
+            versions = {slot_id: self._versions.get(slot_id, 0) for slot_id in missing}
+        if not missing:
+            return result
+
+        prices = {slot_id: slot.standard_price for slot_id, slot in entity_cache.get_many(ParkingSlot, missing).items()}
+        rules = {slot_id: [] for slot_id in prices}
+        # Always the primary: a replica's lag would outlive the request here
+        rows = ParkingSlotRules.objects.using(DEFAULT_DB_ALIAS).filter(parking_slot__in=prices).values_list(
+            'parking_slot_id', 'date_start_rule', 'date_end_rule', 'price', 'pk'
+        )
+        for slot_id, start, end, price, rule_id in rows:
+            rules[slot_id].append((to_timestamp(start), to_timestamp(end), price, rule_id))
+
+        with self._lock:
+            for slot_id, standard_price in prices.items():
+                timeline = PriceTimeline(standard_price, rules[slot_id], now)
+                result[slot_id] = timeline
+                if self._versions.get(slot_id, 0) == versions[slot_id]:
+                    self._store(slot_id, timeline)
+        return result
+
+    def _store(self, slot_id, timeline):
+        self._drop(slot_id)
+        self._timelines[slot_id] = timeline
+        for rule_id in timeline.rule_ids:
+            self._slot_of_rule[rule_id] = slot_id
+
+    def _drop(self, slot_id):
+        timeline = self._timelines.pop(slot_id, None)
+        if timeline is not None:
+            for rule_id in timeline.rule_ids:
+                self._slot_of_rule.pop(rule_id, None)
+        self._versions[slot_id] = self._versions.get(slot_id, 0) + 1
+
+    def quote(self, slot_id, start, end):
+        timeline = self.timelines([slot_id]).get(slot_id)
+        if timeline is None:
+            raise ParkingSlot.DoesNotExist(f'ParkingSlot {slot_id} does not exist.')
+        return timeline.price(to_timestamp(start), to_timestamp(end))
+
+    def invalidate(self, slot_ids=(), rule_ids=()):
+        with self._lock:
+            slot_ids = set(slot_ids)
+            slot_ids.update(
+                self._slot_of_rule[rule_id] for rule_id in rule_ids if rule_id in self._slot_of_rule
+            )
+            for slot_id in slot_ids:
+                self._drop(slot_id)
+
+    def clear(self):
+        with self._lock:
+            for slot_id in list(self._timelines):
+                self._drop(slot_id)
+
+
+pricing_engine = PricingEngine()
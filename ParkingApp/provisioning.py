@@ -0,0 +1,146 @@
+from django.db import IntegrityError, transaction
+
+from .models import Floor, Park, ParkingSlot, ParkOwner
+from .serializers import ParkDetailsSerializer
+from .signals import slots_bulk_created
+
+# A layout describes a whole park:
+#
+#     {
+#         "park_owner": 1,
+#         "details": {"address": "...", "latitude": 44.43, "longitude": 26.10},
+#         "standard_price": 10,
+#         "floors": [
+#             {"floor_number": 0, "slots": 120, "chargers": ["1-10", 55]},
+#             {"floor_number": 1, "slots": ["1-80", "101-140"], "standard_price": 8}
+#         ]
+#     }
+#
+# slots is a count (numbered from 1) or a list of numbers and "first-last"
+# ranges; chargers lists the slot numbers that have one. standard_price is the
+# park default and may be overridden per floor.
+
+
+class _TooMany(ValueError):
+    pass
+
+
+def _numbers(spec, name, limit=None):
+    # limit is checked against counts and range spans before they are
+    # expanded, so a huge spec costs nothing
+    if isinstance(spec, int) and not isinstance(spec, bool):
+        if spec < 0:
+            raise ValueError(f'{name} must not be negative.')
+        if limit is not None and spec > limit:
+            raise _TooMany(name)
+        return list(range(1, spec + 1))
+    if not isinstance(spec, list):
+        raise ValueError(f'{name} must be a count or a list of numbers and ranges.')
+    numbers = []
+    for item in spec:
+        try:
+            if isinstance(item, str) and '-' in item.strip('-'):
+                first, last = (int(part) for part in item.split('-', 1))
+                span = range(first, last + 1)
+            else:
+                span = [int(item)]
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid {name} entry: {item!r}.')
+        if limit is not None and len(numbers) + len(span) > limit:
+            raise _TooMany(name)
+        numbers.extend(span)
+    if len(set(numbers)) != len(numbers):
+        raise ValueError(f'{name} has duplicate numbers.')
+    return numbers
+
+
+def _price(value, default):
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('standard_price must be an integer.')
+
+
+def parse_layout(layout, max_slots=None):
+    """Validate a layout of at most max_slots slots (None for no limit).
+    Returns (owner id, details serializer, floors), floors being
+    (floor_number, [(slot_number, has_charger, standard_price)]).
+    Raises ValueError with a message for the client."""
+    if not isinstance(layout, dict):
+        raise ValueError('Expected a layout object.')
+    try:
+        owner_id = int(layout.get('park_owner'))
+    except (TypeError, ValueError):
+        raise ValueError('park_owner must be an id.')
+    owner = ParkOwner.objects.filter(pk=owner_id).values_list('pk', 'park').first()
+    if owner is None:
+        raise ValueError(f'ParkOwner {owner_id} does not exist.')
+    if owner[1] is not None:
+        raise ValueError(f'ParkOwner {owner_id} already has a park.')
+
+    details = ParkDetailsSerializer(data=layout.get('details', None))
+    if not details.is_valid():
+        raise ValueError(f'Invalid details: {details.errors}')
+
+    park_price = _price(layout.get('standard_price'), ParkingSlot._meta.get_field('standard_price').default)
+    floor_specs = layout.get('floors', None)
+    if not isinstance(floor_specs, list) or not floor_specs:
+        raise ValueError('floors must be a non-empty list.')
+
+    floors = []
+    total = 0
+    for spec in floor_specs:
+        if not isinstance(spec, dict):
+            raise ValueError('Every floor must be an object.')
+        try:
+            floor_number = int(spec.get('floor_number'))
+        except (TypeError, ValueError):
+            raise ValueError('floor_number must be an integer.')
+        try:
+            slots = _numbers(spec.get('slots', 0), 'slots', None if max_slots is None else max_slots - total)
+        except _TooMany:
+            raise ValueError(f'At most {max_slots} slots per park.')
+        total += len(slots)
+        try:
+            chargers = set(_numbers(spec.get('chargers', []), 'chargers', len(slots)))
+        except _TooMany:
+            chargers = None
+        if chargers is None or not chargers <= set(slots):
+            raise ValueError(f'Floor {floor_number} has chargers on slots it does not have.')
+        price = _price(spec.get('standard_price'), park_price)
+        floors.append((floor_number, [(number, number in chargers, price) for number in slots]))
+    numbers = [floor_number for floor_number, _ in floors]
+    if len(set(numbers)) != len(numbers):
+        raise ValueError('floor_number must be unique.')
+    return owner_id, details, floors
+
+
+@transaction.atomic
+def provision(owner_id, details, floors):
+    """Create the park described by parse_layout's result: one INSERT each for
+    the details and the park, then one bulk INSERT for the floors and one
+    (batched) for the slots. Returns the park, its floors and its slots."""
+    park_details = details.save()
+    try:
+        with transaction.atomic():
+            park = Park.objects.create(
+                park_owner_id=owner_id, park_details=park_details,
+                total_spots=sum(len(slots) for _, slots in floors), no_floors=len(floors),
+            )
+    except IntegrityError:
+        # Another request gave the owner a park since parse_layout checked
+        raise ValueError(f'ParkOwner {owner_id} already has a park.')
+    floor_objs = Floor.objects.bulk_create(Floor(park=park, floor_number=number) for number, _ in floors)
+    slot_objs = ParkingSlot.objects.bulk_create(
+        ParkingSlot(floor=floor, slot_number=number, has_charger=has_charger, standard_price=price)
+        for floor, (_, slots) in zip(floor_objs, floors)
+        for number, has_charger, price in slots
+    )
+    slots_bulk_created(slot_objs)
+    return park, floor_objs, slot_objs
+
+
+def provision_layout(layout, max_slots=None):
+    return provision(*parse_layout(layout, max_slots))
@@ -0,0 +1,260 @@
+import logging
+import math
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Time of the client's last write, set on the responses to writes
+STICKY_COOKIE = 'parking_primary'
+# Replica the current request reads from, see ReplicaMiddleware
+_request = ContextVar('replica_request', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG', 5)
+
+
+def sticky_cache():
+    return caches[getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'default')]
+
+
+class ReplicaLag:
+    """Per-process view of how far behind each replica is.
+
+    The primary's ReplicaHeartbeat row is rewritten right before each
+    replication pass (``beat``), so the row a replica holds is the time it
+    was last brought up to date. It is read again at most every
+    ``REPLICA_CHECK_INTERVAL`` seconds; an older reading only overestimates
+    the lag. A replica that can't be read has no heartbeat (None).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._beats = {}
+
+    def beat_at(self, alias):
+        # Epoch seconds the replica was last synced at, or None
+        now = time.monotonic()
+        interval = getattr(settings, 'REPLICA_CHECK_INTERVAL', 1)
+        with self._lock:
+            checked = self._beats.get(alias)
+        if checked is not None and now - checked[0] < interval:
+            return checked[1]
+
+        from .models import ReplicaHeartbeat
+
+        try:
+            beat_at = ReplicaHeartbeat.objects.using(alias).values_list('beat_at', flat=True).first()
+        except DatabaseError:
+            logger.warning('Replica %s is unavailable, reading from the primary', alias, exc_info=True)
+            beat_at = None
+        beat_at = beat_at.timestamp() if beat_at is not None else None
+        with self._lock:
+            self._beats[alias] = (now, beat_at)
+        return beat_at
+
+    def clear(self):
+        with self._lock:
+            self._beats.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+class _ReplicaRequest:
+    # Read state of one safe request; the replica is picked at its first read
+    # so every query of the request sees the same snapshot
+    __slots__ = ('written_at', 'alias', 'chosen')
+
+    def __init__(self, written_at):
+        self.written_at = written_at
+        self.alias = None
+        self.chosen = False
+
+    def choose(self):
+        if not self.chosen:
+            self.alias = choose_replica(self.written_at)
+            self.chosen = True
+        return self.alias
+
+
+def use_primary():
+    """Send the remaining reads of the current request to the primary, for
+    responses that must agree with something only the primary has."""
+    state = _request.get()
+    if state is not None:
+        state.alias = None
+        state.chosen = True
+
+
+def choose_replica(written_at=0, now=None):
+    """A replica within REPLICA_MAX_LAG seconds of the primary that already
+    has the client's last write (made at written_at, epoch seconds), or None
+    for the primary."""
+    now = time.time() if now is None else now
+    fresh = []
+    for alias in replica_aliases():
+        beat_at = replica_lag.beat_at(alias)
+        if beat_at is not None and now - beat_at <= max_lag() and beat_at >= written_at:
+            fresh.append(alias)
+    return random.choice(fresh) if fresh else None
+
+
+class ReplicaRouter:
+    """Sends the reads of GET, HEAD and OPTIONS requests to the replicas in
+    ``DATABASE_REPLICAS``; writes, and everything outside a request, use the
+    primary (default).
+
+    Reads go to the primary instead when no replica is within
+    ``REPLICA_MAX_LAG`` seconds of it, or when the client wrote something
+    (see ``STICKY_COOKIE``, and ``sticky_cache`` for token clients) the
+    replicas haven't caught up with yet, so users see their own bookings at
+    once. Replicas are compared against the clock of
+    this process, so keep the hosts' clocks in sync.
+
+    Replicas are copies of the primary and are not migrated on their own.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if state is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return state.choose()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Lets the reads of safe requests go to a replica, and marks clients that
+    write so their next reads wait for the replicas to catch up: with a cookie,
+    and for clients sending a token, under their account in sticky_cache."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+        key = self.account_key(request)
+        safe = request.method in SAFE_METHODS
+        self.start(request, sticky_cache().get(key) if key and safe else None)
+        response = self.get_response(request)
+        written_at = self.finish(request, response)
+        if key and written_at is not None:
+            sticky_cache().set(key, written_at, self.sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+        key = self.account_key(request)
+        safe = request.method in SAFE_METHODS
+        self.start(request, await sticky_cache().aget(key) if key and safe else None)
+        response = await self.get_response(request)
+        written_at = self.finish(request, response)
+        if key and written_at is not None:
+            await sticky_cache().aset(key, written_at, self.sticky_seconds())
+        return response
+
+    def start(self, request, account_written_at=None):
+        # Not reset when the view returns: streamed responses still read while
+        # they are sent. end_request clears it once the response is closed.
+        if request.method in SAFE_METHODS:
+            written_at = max(self.written_at(request), account_written_at or 0)
+            _request.set(_ReplicaRequest(written_at))
+        else:
+            _request.set(None)
+
+    def finish(self, request, response):
+        # The time of the client's write, if it made one
+        if request.method in SAFE_METHODS:
+            return None
+        # After the view, so the write is committed by now
+        written_at = time.time()
+        response.set_cookie(
+            STICKY_COOKIE, f'{written_at:.6f}', max_age=self.sticky_seconds(), httponly=True, samesite='Lax',
+        )
+        return written_at
+
+    @staticmethod
+    def sticky_seconds():
+        return math.ceil(max_lag()) + 1
+
+    @staticmethod
+    def written_at(request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def account_key(request):
+        # sticky_cache key of the account behind the request's token, or None.
+        # The token is only read from its signed claims, no query.
+        from .authentication import StatelessJWTAuthentication
+
+        try:
+            authenticated = StatelessJWTAuthentication().authenticate(request)
+        except APIException:
+            return None
+        if authenticated is None:
+            return None
+        user = authenticated[0]
+        return f'replica:written:{user.role}:{user.id}'
+
+
+def end_request(**kwargs):
+    _request.set(None)
+
+
+def beat(using=DEFAULT_DB_ALIAS, now=None):
+    # Stamp the primary; replicas carry the stamp over with the data
+    from .models import ReplicaHeartbeat
+
+    ReplicaHeartbeat.objects.using(using).update_or_create(pk=1, defaults={'beat_at': now or timezone.now()})
+
+
+def sync_sqlite_replica(alias, using=DEFAULT_DB_ALIAS):
+    """Copy the primary SQLite database over the replica alias in one go,
+    heartbeat included: the local stand-in for real replication."""
+    for name in (using, alias):
+        if connections[name].vendor != 'sqlite':
+            raise ValueError(f'{name} is not a SQLite database.')
+    beat(using)
+    source, target = connections[using], connections[alias]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
@@ -0,0 +1,188 @@
+import random
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import geo
+from .hashers import hash_password
+from .intervals import to_timestamp
+from .models import Booking, Credentials, Floor, Park, ParkDetails, ParkingSlot, ParkingSlotRules, ParkOwner, Users
+from .pricing import PriceTimeline
+from .signals import slots_bulk_created
+
+# Generated data for load tests and benchmarks. Every owner gets one park
+# around Bucharest; slots get a booking history and some peak-hour pricing
+# rules spread over ``days`` days from ``start``. The same seed and start give
+# the same rows.
+
+# Every generated owner and user logs in with this password
+DEFAULT_PASSWORD = 'password'
+# Generated emails are <prefix><n>@SEED_DOMAIN
+SEED_DOMAIN = 'seed.local'
+
+CENTER = (44.4268, 26.1025)
+# Parks are spread over about +/- 10 km around CENTER
+SPREAD = 0.09
+
+# Relative chance of a booking starting at each hour of the day: commuter
+# peaks in the morning and late afternoon, little at night
+HOURLY_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 4, 9, 12, 10, 7, 6,
+    6, 6, 5, 5, 7, 9, 8, 6, 4, 3, 2, 1,
+)
+# Weekends see fewer bookings, Monday first
+WEEKDAY_WEIGHTS = (10, 10, 10, 10, 11, 6, 5)
+# Booking length in hours and its weight: mostly short stays, some all day
+DURATIONS = ((1, 30), (2, 28), (3, 15), (4, 10), (8, 10), (12, 4), (24, 3))
+
+STANDARD_PRICES = (5, 8, 10, 12, 15)
+VEHICLE_TYPES = ('Car', 'Car', 'Car', 'SUV', 'Van', 'Motorcycle')
+PLATE_LETTERS = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+
+
+def _plate(rng):
+    return f"B {rng.randint(10, 999)} {''.join(rng.choices(PLATE_LETTERS, k=3))}"
+
+
+def _bookings(rng, slot, timeline, user_ids, start, days, count):
+    # Independent starts, then the ones overlapping an earlier booking of the
+    # slot are dropped, so a slot gets at most count bookings
+    day_weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=day)).weekday()] for day in range(days)]
+    candidates = []
+    for _ in range(count):
+        day = rng.choices(range(days), day_weights)[0]
+        hour = rng.choices(range(24), HOURLY_WEIGHTS)[0]
+        begin = start + timedelta(days=day, hours=hour, minutes=rng.choice((0, 15, 30, 45)))
+        hours = rng.choices(*zip(*DURATIONS))[0]
+        candidates.append((begin, hours))
+
+    booked_until = None
+    for begin, hours in sorted(candidates):
+        if booked_until is not None and begin < booked_until:
+            continue
+        booked_until = begin + timedelta(hours=hours)
+        # The rate the API would charge, see pricing.PriceTimeline
+        yield Booking(
+            parking_slot=slot, user_id=rng.choice(user_ids), booking_start_date=begin,
+            booking_end_date=booked_until, price=timeline.price(to_timestamp(begin), to_timestamp(booked_until)),
+        )
+
+
+def _rules(rng, slot, start, days, count):
+    # Peak pricing on distinct days, so a slot's rules never overlap
+    for day in sorted(rng.sample(range(days), min(count, days))):
+        begin = start + timedelta(days=day, hours=8)
+        yield ParkingSlotRules(
+            parking_slot=slot, date_start_rule=begin, date_end_rule=begin + timedelta(hours=12),
+            price=float(slot.standard_price * rng.choice((1.5, 2, 2.5))),
+        )
+
+
+def _email(prefix, n):
+    return f'{prefix}{n}@{SEED_DOMAIN}'
+
+
+def _check_unused(model, prefix, using):
+    # Emails aren't unique, so seeding twice with the same prefix would give
+    # every account a twin and login would match both
+    pattern = rf'^{re.escape(prefix)}[0-9]+@{re.escape(SEED_DOMAIN)}$'
+    if model.objects.using(using).filter(email__regex=pattern).exists():
+        raise ValueError(f"The database already has seed accounts {_email(prefix, 0)}, ...; seed with another prefix.")
+
+
+def create_users(count, rng, prefix='user', password_hash=None, using=DEFAULT_DB_ALIAS):
+    """count users with credentials, emails <prefix><n>@seed.local, all with
+    DEFAULT_PASSWORD. Returns the users. Raises ValueError if the database
+    already has users with those emails."""
+    _check_unused(Credentials, prefix, using)
+    password_hash = password_hash or hash_password(DEFAULT_PASSWORD)
+    credentials = Credentials.objects.using(using).bulk_create(
+        Credentials(email=_email(prefix, n), password=password_hash) for n in range(count)
+    )
+    return Users.objects.using(using).bulk_create(
+        Users(
+            credentials=c, first_name='Seed', last_name=f'{prefix.title()} {n}', number_plate=_plate(rng),
+            vehicle_type=rng.choice(VEHICLE_TYPES), verified=rng.random() < 0.9,
+        )
+        for n, c in enumerate(credentials)
+    )
+
+
+def generate(owners=10, floors=3, slots=50, users=1000, rules=4, bookings=20, days=30, start=None,
+             seed=7, prefix='', batch_size=2000, using=DEFAULT_DB_ALIAS):
+    """Create owners parks with floors floors of slots slots each, users users,
+    and up to rules rules and bookings bookings per slot between start (a
+    date, by default days // 2 days before today) and days days later.
+    Accounts are <prefix>owner<n>@seed.local and <prefix>user<n>@seed.local;
+    ValueError is raised if the database already has accounts of that prefix.
+    Everything goes in with bulk_create in one transaction. Returns the number
+    of rows created per model name."""
+    rng = random.Random(seed)
+    days = max(days, 1)
+    if start is None:
+        start = timezone.localdate() - timedelta(days=days // 2)
+    start = timezone.make_aware(datetime.combine(start, time()))
+    # Hashing is deliberately slow, and every account gets the same password
+    password_hash = hash_password(DEFAULT_PASSWORD)
+
+    with transaction.atomic(using=using):
+        _check_unused(ParkOwner, f'{prefix}owner', using)
+        owner_objs = ParkOwner.objects.using(using).bulk_create(
+            ParkOwner(first_name='Seed', last_name=f'Owner {n}', email=_email(f'{prefix}owner', n), password=password_hash)
+            for n in range(owners)
+        )
+        details = []
+        for n in range(owners):
+            latitude = Decimal(CENTER[0] + rng.uniform(-SPREAD, SPREAD)).quantize(Decimal('0.000001'))
+            longitude = Decimal(CENTER[1] + rng.uniform(-SPREAD, SPREAD)).quantize(Decimal('0.000001'))
+            details.append(ParkDetails(
+                address=f'Strada Seed {n + 1}, Bucharest', latitude=latitude, longitude=longitude,
+                height_limit=rng.choice((2, 2, 3)), geohash=geo.encode(float(latitude), float(longitude)),
+            ))
+        details = ParkDetails.objects.using(using).bulk_create(details)
+        park_objs = Park.objects.using(using).bulk_create(
+            Park(park_owner=owner, park_details=detail, total_spots=floors * slots, no_floors=floors)
+            for owner, detail in zip(owner_objs, details)
+        )
+        floor_objs = Floor.objects.using(using).bulk_create(
+            Floor(park=park, floor_number=n) for park in park_objs for n in range(floors)
+        )
+        slot_objs = ParkingSlot.objects.using(using).bulk_create((
+            ParkingSlot(
+                floor=floor, slot_number=n + 1, has_charger=rng.random() < 0.15,
+                standard_price=rng.choice(STANDARD_PRICES),
+            )
+            for floor in floor_objs for n in range(slots)
+        ), batch_size=batch_size)
+        user_ids = [user.pk for user in create_users(users, rng, f'{prefix}user', password_hash, using)]
+
+        counts = {ParkingSlotRules: 0, Booking: 0}
+        pending = {ParkingSlotRules: [], Booking: []}
+        for slot in slot_objs:
+            # Bookings are priced from the slot's rules, as pricing_engine would
+            slot_rules = list(_rules(rng, slot, start, days, rules))
+            timeline = PriceTimeline(slot.standard_price, [
+                (to_timestamp(rule.date_start_rule), to_timestamp(rule.date_end_rule), rule.price, position)
+                for position, rule in enumerate(slot_rules)
+            ])
+            pending[ParkingSlotRules] += slot_rules
+            if user_ids:
+                pending[Booking] += _bookings(rng, slot, timeline, user_ids, start, days, bookings)
+            for model, objs in pending.items():
+                if len(objs) >= batch_size:
+                    counts[model] += len(model.objects.using(using).bulk_create(objs))
+                    pending[model] = []
+        for model, objs in pending.items():
+            counts[model] += len(model.objects.using(using).bulk_create(objs))
+
+        # Caches and occupancy counters, as for any bulk insert of slots
+        slots_bulk_created(slot_objs, using)
+
+    return {
+        'ParkOwner': len(owner_objs), 'ParkDetails': len(details), 'Park': len(park_objs), 'Floor': len(floor_objs),
+        'ParkingSlot': len(slot_objs), 'Users': len(user_ids), 'Credentials': len(user_ids),
+        'ParkingSlotRules': counts[ParkingSlotRules], 'Booking': counts[Booking],
+    }
@@ -1,10 +1,28 @@
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from rest_framework import serializers
+from .caching import entity_cache
 from .models import ParkOwner, Users, Park, ParkDetails, Floor, ParkingSlot, ParkingSlotRules, Booking, Credentials
 
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # Foreign keys to the models entity_cache holds are checked against it
+    # instead of with a query per field
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        if model not in entity_cache.models or self.pk_field is not None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        try:
+            return entity_cache.get(model, data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except ValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
 class ParkOwnerSerializer(serializers.ModelSerializer):
     class Meta:
         model = ParkOwner
         fields = '__all__'
+        # Stored hashed, never sent back
+        extra_kwargs = {'password': {'write_only': True}}
 
 class UsersSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,8 +33,11 @@ class CredentialsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Credentials
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
 
 class ParkSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
     class Meta:
         model = Park
         fields = '__all__'
@@ -37,12 +58,41 @@ class ParkingSlotSerializer(serializers.ModelSerializer):
         fields = '__all__'
         
 class ParkingSlotRulesSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
     class Meta:
         model = ParkingSlotRules
         fields = '__all__'
         
 class BookingSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
     class Meta:
         model = Booking
         fields = '__all__'
 
+
+class AvailableParkingSlotSerializer(ParkingSlotSerializer):
+    # Slots listed by the availability endpoints are free for the requested
+    # window, which is what physical_available used to be rewritten to mean.
+    constant_fields = {'physical_available': True}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data.update(self.constant_fields)
+        return data
+
+
+class SlotLayoutSerializer(ParkingSlotSerializer):
+    # Both are set by ParkLayoutView for the requested instant
+    occupied = serializers.BooleanField(read_only=True)
+    current_price = serializers.FloatField(read_only=True)
+
+
+class FloorLayoutSerializer(FloorSerializer):
+    slots = SlotLayoutSerializer(source='parkingslot_set', many=True, read_only=True)
+
+
+class ParkLayoutSerializer(ParkSerializer):
+    park_details = ParkDetailsSerializer(read_only=True)
+    floors = FloorLayoutSerializer(source='floor_set', many=True, read_only=True)
@@ -0,0 +1,141 @@
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events, metrics, occupancy, routers
+from .caching import entity_cache
+from .intervals import booking_index
+from .models import Booking, Floor, Park, ParkDetails, ParkingSlot, ParkingSlotRules
+from .pricing import pricing_engine
+
+# Inside a transaction a change may still roll back, so the handlers drop what
+# the indexes know about the slot straight away and only apply the change once
+# it is committed. Outside a transaction on_commit runs the callback at once,
+# which keeps the autocommit path incremental.
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, using, **kwargs):
+    if transaction.get_connection(using).in_atomic_block:
+        booking_index.discard(instance.pk)
+        booking_index.invalidate([instance.parking_slot_id])
+    transaction.on_commit(lambda: booking_index.add(instance), using=using)
+
+    # Occupancy counters change in the same transaction as the booking
+    period = (instance.parking_slot_id, instance.booking_start_date, instance.booking_end_date)
+    previous = getattr(instance, '_loaded_period', None)
+    if period != previous:
+        if previous is not None:
+            occupancy.booking_changed(*previous, -1, using=using)
+        occupancy.booking_changed(*period, 1, using=using)
+        instance._loaded_period = period
+
+        # Stream subscribers hear about it once it is committed
+        booking_id = instance.pk
+        if previous is not None:
+            transaction.on_commit(lambda: events.booking_changed(booking_id, *previous, False), using=using)
+        transaction.on_commit(lambda: events.booking_changed(booking_id, *period, True), using=using)
+
+
+def bookings_bulk_created(bookings, using=DEFAULT_DB_ALIAS):
+    # bulk_create doesn't send post_save, so bulk writers call this instead
+    for booking in bookings:
+        booking_saved(Booking, booking, using)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, using, **kwargs):
+    booking_id = instance.pk
+    if transaction.get_connection(using).in_atomic_block:
+        booking_index.invalidate([instance.parking_slot_id])
+    transaction.on_commit(lambda: booking_index.discard(booking_id), using=using)
+    period = (instance.parking_slot_id, instance.booking_start_date, instance.booking_end_date)
+    occupancy.booking_changed(*period, -1, using=using)
+    transaction.on_commit(lambda: events.booking_changed(booking_id, *period, False), using=using)
+
+
+def _invalidate_prices(using, **targets):
+    # Drop now so nothing compiles the old rules for this transaction, and
+    # again on commit in case another thread compiled them in between
+    pricing_engine.invalidate(**targets)
+    transaction.on_commit(lambda: pricing_engine.invalidate(**targets), using=using)
+
+
+@receiver(post_save, sender=ParkingSlotRules)
+@receiver(post_delete, sender=ParkingSlotRules)
+def parking_slot_rules_changed(sender, instance, using, **kwargs):
+    slot_id, rule_id = instance.parking_slot_id, instance.pk
+    _invalidate_prices(using, slot_ids=[slot_id], rule_ids=[rule_id])
+    transaction.on_commit(lambda: events.price_changed(slot_id, rule_id), using=using)
+
+
+@receiver(post_save, sender=ParkingSlot)
+@receiver(post_delete, sender=ParkingSlot)
+def parking_slot_changed(sender, instance, using, **kwargs):
+    _invalidate_prices(using, slot_ids=[instance.pk])
+    # A new or removed slot id must not inherit intervals cached under it
+    if kwargs.get('created', True):
+        booking_index.invalidate([instance.pk])
+
+
+def slots_bulk_created(slots, using=DEFAULT_DB_ALIAS):
+    # The bulk_create counterpart of parking_slot_changed and parking_slot_saved,
+    # also covering floors created in bulk with them: one recount per park
+    # instead of one counter update per slot
+    slot_ids = [slot.pk for slot in slots]
+    _invalidate_prices(using, slot_ids=slot_ids)
+    _invalidate_entities(ParkingSlot, slot_ids, using)
+    booking_index.invalidate(slot_ids)
+    floor_ids = {slot.floor_id for slot in slots}
+    park_ids = set(Floor.objects.using(using).filter(pk__in=floor_ids).values_list('park_id', flat=True))
+    occupancy.reconcile(park_ids, using=using)
+
+
+@receiver(post_save, sender=ParkingSlot)
+def parking_slot_saved(sender, instance, created, using, **kwargs):
+    if created:
+        occupancy.slot_changed(instance.floor_id, instance.has_charger, 1, using=using)
+    else:
+        # Edits are rare and may move the slot or its charger, so recount
+        floor_ids = {instance.floor_id, getattr(instance, '_loaded_floor_id', None)} - {None}
+        park_ids = set(Floor.objects.using(using).filter(pk__in=floor_ids).values_list('park_id', flat=True))
+        occupancy.reconcile(park_ids, using=using)
+    instance._loaded_floor_id = instance.floor_id
+
+
+@receiver(post_delete, sender=ParkingSlot)
+def parking_slot_deleted(sender, instance, using, **kwargs):
+    occupancy.slot_changed(instance.floor_id, instance.has_charger, -1, using=using)
+
+
+@receiver(post_save, sender=Floor)
+def floor_saved(sender, instance, created, using, **kwargs):
+    if created:
+        occupancy.floor_added(instance.pk, instance.park_id, using=using)
+
+
+def _invalidate_entities(model, pks, using):
+    # Same as _invalidate_prices: bump the versions now and again on commit
+    entity_cache.invalidate(model, pks)
+    transaction.on_commit(lambda: entity_cache.invalidate(model, pks), using=using)
+
+
+@receiver(post_save, sender=Park)
+@receiver(post_delete, sender=Park)
+@receiver(post_save, sender=ParkDetails)
+@receiver(post_delete, sender=ParkDetails)
+@receiver(post_save, sender=ParkingSlot)
+@receiver(post_delete, sender=ParkingSlot)
+@receiver(post_save, sender=ParkingSlotRules)
+@receiver(post_delete, sender=ParkingSlotRules)
+def cached_entity_changed(sender, instance, using, **kwargs):
+    _invalidate_entities(sender, [instance.pk], using)
+
+
+# Reads made after the response is closed no longer belong to the request
+request_finished.connect(routers.end_request, dispatch_uid='replica_end_request')
+
+# Lets MetricsMiddleware count the queries of each request, on any thread
+connection_created.connect(metrics.install_query_timer, dispatch_uid='metrics_query_timer')
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import archival
+from ..intervals import booking_index
+from ..models import *
+
+
+class ArchivalTest(TestCase):
+    def setUp(self):
+        booking_index.clear()
+        self.addCleanup(booking_index.clear)
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.now = timezone.now().replace(microsecond=0)
+        # Five finished long ago, one recent, one upcoming
+        self.old = [self.booking(days_ago=200 - n) for n in range(5)]
+        self.recent = self.booking(days_ago=10)
+        self.upcoming = self.booking(days_ago=-3)
+
+    def booking(self, days_ago):
+        start = self.now - timedelta(days=days_ago)
+        return Booking.objects.create(
+            parking_slot=self.slot, user=self.user, booking_start_date=start,
+            booking_end_date=start + timedelta(hours=2), price=20.0,
+        )
+
+    def test_moves_finished_bookings_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = archival.archive_bookings(days=90, batch_size=2, now=self.now)
+        self.assertEqual(moved, 5)
+        self.assertEqual(set(Booking.objects.values_list('pk', flat=True)), {self.recent.pk, self.upcoming.pk})
+
+        archived = BookingArchive.objects.get(pk=self.old[0].pk)
+        self.assertEqual(
+            (archived.parking_slot_id, archived.user_id, archived.booking_start_date, archived.price, archived.archived_at),
+            (self.slot.pk, self.user.pk, self.old[0].booking_start_date, 20.0, self.now),
+        )
+        self.assertEqual(archival.archive_bookings(days=90, now=self.now), 0)
+
+    def test_resumes_after_partial_run(self):
+        self.assertEqual(archival.archive_bookings(days=90, batch_size=2, max_batches=1, now=self.now), 2)
+        self.assertEqual(BookingArchive.objects.count(), 2)
+        self.assertEqual(archival.archive_bookings(days=90, batch_size=2, now=self.now), 3)
+        self.assertEqual(BookingArchive.objects.count(), 5)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_history_view_reads_both_tables(self):
+        archival.archive_bookings(days=90, now=self.now)
+        self.assertEqual(BookingHistory.objects.count(), 7)
+        self.assertEqual(BookingHistory.objects.filter(archived=True).count(), 5)
+        self.assertEqual(
+            BookingHistory.objects.filter(parking_slot=self.slot, booking_end_date__gt=self.now).get().pk,
+            self.upcoming.pk,
+        )
+
+    def test_bookings_list_opts_into_archive(self):
+        archival.archive_bookings(days=90, now=self.now)
+        url = reverse('booking-list')
+        response = self.client.get(url)
+        self.assertEqual([row['booking_id'] for row in response.data['results']], [self.recent.pk, self.upcoming.pk])
+
+        response = self.client.get(url, {'include_archived': 'true', 'page_size': 4})
+        ids = [row['booking_id'] for row in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [row['booking_id'] for row in response.data['results']]
+        self.assertEqual(ids, [booking.pk for booking in [*self.old, self.recent, self.upcoming]])
+
+        # Archived bookings are read-only
+        detail = reverse('booking-detail', args=[self.old[0].pk])
+        self.assertEqual(self.client.delete(detail + '?include_archived=true').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(BookingArchive.objects.filter(pk=self.old[0].pk).exists())
+
+    def test_export_opts_into_archive(self):
+        archival.archive_bookings(days=90, now=self.now)
+        url = reverse('booking-export')
+        self.assertEqual(len(b''.join(self.client.get(url).streaming_content).splitlines()), 2)
+        lines = b''.join(self.client.get(url, {'include_archived': 'true'}).streaming_content).splitlines()
+        self.assertEqual(len(lines), 7)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_bookings', '--batch-size=2', stdout=out)
+        self.assertIn('Archived 5 bookings.', out.getvalue())
+        call_command('archive_bookings', '--days=5', stdout=out)
+        self.assertIn('Archived 1 bookings.', out.getvalue())
+        self.assertEqual(list(Booking.objects.values_list('pk', flat=True)), [self.upcoming.pk])
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .. import archival
+from ..caching import entity_cache
+from ..intervals import booking_index
+from ..models import *
+from ..pricing import pricing_engine
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+class AsyncViewsTest(TestCase):
+    # Every async endpoint answers with the bytes of its sync counterpart
+    def setUp(self):
+        for cache in (booking_index, pricing_engine, entity_cache):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=6, no_floors=2)
+        self.slots = []
+        for floor_number in (1, 2):
+            floor = Floor.objects.create(park=self.park, floor_number=floor_number)
+            for slot_number in (1, 2, 3):
+                self.slots.append(ParkingSlot.objects.create(floor=floor, slot_number=slot_number, has_charger=slot_number == 1))
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.now = timezone.now().replace(microsecond=0)
+        self.start = self.now + timedelta(days=1)
+        self.booking = Booking.objects.create(
+            parking_slot=self.slots[0], user=self.user, booking_start_date=self.start,
+            booking_end_date=self.start + timedelta(hours=2), price=20.0,
+        )
+        self.rule = ParkingSlotRules.objects.create(
+            parking_slot=self.slots[1], date_start_rule=self.start, date_end_rule=self.start + timedelta(hours=4), price=7.5,
+        )
+
+    async def assertSameResponse(self, sync_url, async_url, data=None):
+        expected = await self.async_client.get(sync_url, data)
+        response = await self.async_client.get(async_url, data)
+        self.assertEqual(response.status_code, expected.status_code)
+        # Pagination links point at the endpoint that was asked
+        self.assertEqual(response.content.replace(b'/async/', b'/'), expected.content)
+        return response
+
+    async def test_available_slots(self):
+        window = {'start': timezone.localtime(self.start + timedelta(hours=1)).strftime(ISO_FORMAT), 'end': timezone.localtime(self.start + timedelta(hours=3)).strftime(ISO_FORMAT)}
+        sync_url, async_url = reverse('parkingslot-list-available'), reverse('async-parkingslot-list-available')
+        response = await self.assertSameResponse(sync_url, async_url, window)
+        self.assertEqual(len(response.json()['results']), 5)
+        await self.assertSameResponse(sync_url, async_url, {**window, 'has_charger': 'true'})
+        await self.assertSameResponse(sync_url, async_url, {'start': 'tomorrow'})
+
+        # Walk the pages both ways; the links stay on the async endpoint
+        page = await self.assertSameResponse(sync_url, async_url, {**window, 'page_size': 2})
+        seen = []
+        while page.json()['next']:
+            self.assertIn(async_url, page.json()['next'])
+            seen += [row['parking_slot_id'] for row in page.json()['results']]
+            page = await self.async_client.get(page.json()['next'])
+        seen += [row['parking_slot_id'] for row in page.json()['results']]
+        self.assertEqual(seen, [row['parking_slot_id'] for row in (await self.async_client.get(sync_url, window)).json()['results']])
+        previous = await self.async_client.get(page.json()['previous'])
+        self.assertEqual(previous.json()['results'], (await self.async_client.get(page.json()['previous'].replace('async/', ''))).json()['results'])
+
+    async def test_drf_errors(self):
+        # Raised by DRF inside the async views, answered as the sync views do
+        sync_url, async_url = reverse('parkingslot-list-available'), reverse('async-parkingslot-list-available')
+        response = await self.assertSameResponse(sync_url, async_url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+        for sync_url, async_url in (
+            (sync_url, async_url),
+            (reverse('park-layout', args=[self.park.pk]), reverse('async-park-layout', args=[self.park.pk])),
+        ):
+            expected = await self.async_client.generic('GET', sync_url, '{not json', content_type='application/json')
+            response = await self.async_client.generic('GET', async_url, '{not json', content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.content, expected.content)
+
+    async def test_park_layout(self):
+        at = {'at': timezone.localtime(self.start + timedelta(hours=1)).strftime(ISO_FORMAT)}
+        response = await self.assertSameResponse(
+            reverse('park-layout', args=[self.park.pk]), reverse('async-park-layout', args=[self.park.pk]), at,
+        )
+        slots = [slot for floor in response.json()['floors'] for slot in floor['slots']]
+        self.assertEqual([slot['occupied'] for slot in slots], [True, False, False, False, False, False])
+        self.assertEqual(slots[1]['current_price'], 7.5)
+        await self.assertSameResponse(reverse('park-layout', args=[0]), reverse('async-park-layout', args=[0]))
+        await self.assertSameResponse(
+            reverse('park-layout', args=[self.park.pk]), reverse('async-park-layout', args=[self.park.pk]), {'at': 'noon'},
+        )
+
+    async def test_booking_lookup(self):
+        url = reverse('async-booking-detail', args=[self.booking.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        listed = (await self.async_client.get(reverse('booking-list'))).json()['results']
+        self.assertEqual(response.json(), listed[0])
+
+        response = await self.async_client.get(reverse('async-booking-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archived_booking_lookup(self):
+        Booking.objects.filter(pk=self.booking.pk).update(
+            booking_start_date=self.now - timedelta(days=200), booking_end_date=self.now - timedelta(days=199),
+        )
+        archival.archive_bookings(days=90, now=self.now)
+        url = reverse('async-booking-detail', args=[self.booking.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {'include_archived': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['booking_id'], self.booking.pk)
+
+    async def test_rule_lookup(self):
+        url = reverse('async-parkingslotrules-detail-by-pk', args=[self.rule.pk])
+        response = await self.assertSameResponse(reverse('parkingslotrules-detail-by-pk', args=[self.rule.pk]), url)
+        self.assertEqual(response.json()['price'], 7.5)
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = await self.assertSameResponse(
+            reverse('parkingslotrules-detail-by-pk', args=[0]), reverse('async-parkingslotrules-detail-by-pk', args=[0]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_middleware_is_not_adapted(self):
+        # A sync-only middleware would push every async view back onto a
+        # thread; Django logs each adaptation when DEBUG is on
+        with override_settings(DEBUG=True), self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ..authentication import RevokedTokens, StatelessJWTAuthentication, revoked_tokens
+from ..login import login_cache
+from ..models import *
+
+
+class StatelessJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        login_cache.clear()
+        revoked_tokens.clear()
+        self.client = APIClient()
+        self.owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=self.owner, park_details=park_details, total_spots=1, no_floors=1)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+
+    def obtain(self, **data):
+        return self.client.post(reverse('token_obtain_pair'), data, format='json')
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return StatelessJWTAuthentication().authenticate(request)[0]
+
+    def test_user_token_claims(self):
+        response = self.obtain(email='user@example.com', password='userpassword')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = AccessToken(response.data['access'])
+        self.assertEqual(token['user_id'], self.user.pk)
+        self.assertEqual(token['role'], 'user')
+        self.assertEqual(token['credentials_id'], self.user.credentials_id)
+
+    def test_owner_token_claims(self):
+        response = self.obtain(email='john@example.com', password='password')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['user_id'], token['role'], token['park_id']), (self.owner.pk, 'owner', self.park.pk))
+
+    def test_staff_token(self):
+        get_user_model().objects.create_user(username='admin', password='adminpassword')
+        response = self.obtain(username='admin', password='adminpassword')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'staff')
+
+    def test_bad_credentials(self):
+        self.assertEqual(self.obtain(email='john@example.com', password='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.obtain(password='password').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_authenticate_without_queries(self):
+        access = self.obtain(email='john@example.com', password='password').data['access']
+        with self.assertNumQueries(0):
+            user = self.authenticate(access)
+        self.assertEqual((user.id, user.role, user.park_id), (self.owner.pk, 'owner', self.park.pk))
+        self.assertTrue(user.is_authenticated)
+
+    def test_token_without_role_is_unprivileged(self):
+        token = AccessToken()
+        token['user_id'] = self.user.pk
+        user = self.authenticate(str(token))
+        self.assertIsNone(user.role)
+        self.assertFalse(user.is_staff)
+
+    def test_revoked_tokens_are_rejected(self):
+        tokens = self.obtain(email='user@example.com', password='userpassword').data
+        response = self.client.post(reverse('token_revoke'), {'token': tokens['access']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(tokens['access'])
+
+        self.client.post(reverse('token_revoke'), {'token': tokens['refresh']}, format='json')
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse('token_revoke'), {'token': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_keeps_claims(self):
+        refresh = self.obtain(email='john@example.com', password='password').data['refresh']
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['park_id'], self.park.pk)
+
+    def test_revoked_tokens_lru(self):
+        revoked = RevokedTokens(size=2)
+        for jti in ('a', 'b', 'c'):
+            revoked.revoke({'jti': jti, 'exp': float('inf')})
+        self.assertNotIn('a', revoked)
+        self.assertIn('c', revoked)
+        revoked.revoke({'jti': 'old', 'exp': 0})
+        self.assertNotIn('old', revoked)
@@ -0,0 +1,113 @@
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..caching import EntityCache, entity_cache
+from ..intervals import booking_index
+from ..models import *
+from ..pricing import pricing_engine
+
+
+class EntityCacheTest(TransactionTestCase):
+    # Rows are only cached outside transactions, so these tests commit
+
+    def setUp(self):
+        for cache in (entity_cache, pricing_engine, booking_index):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        self.floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=self.floor, slot_number=1, has_charger=True)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+
+    def test_read_through_and_invalidation(self):
+        cache = EntityCache()
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get(ParkingSlot, self.slot.pk).slot_number, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get(ParkingSlot, str(self.slot.pk)).slot_number, 1)
+
+        self.slot.slot_number = 2
+        self.slot.save()
+        self.assertEqual(cache.get(ParkingSlot, self.slot.pk).slot_number, 2)
+
+        slot_id = self.slot.pk
+        self.slot.delete()
+        with self.assertRaises(ParkingSlot.DoesNotExist):
+            cache.get(ParkingSlot, slot_id)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+        self.assertEqual(stats['models']['ParkingApp.parkingslot'], {'hits': 1, 'misses': 3})
+
+    def test_late_write_back_is_not_read(self):
+        # A reader that loaded the row before a change stores it under the
+        # version it saw, which the change has since replaced
+        stale_versions = entity_cache._versions(ParkingSlot, [self.slot.pk])
+        stale = ParkingSlot.objects.get(pk=self.slot.pk)
+        ParkingSlot.objects.filter(pk=self.slot.pk).update(standard_price=50)
+        entity_cache.invalidate(ParkingSlot, [self.slot.pk])
+        entity_cache.cache.set(f'entity:ParkingApp.parkingslot:{self.slot.pk}:{stale_versions[self.slot.pk]}', stale)
+        self.assertEqual(entity_cache.get(ParkingSlot, self.slot.pk).standard_price, 50)
+
+    def test_not_filled_inside_transactions(self):
+        with transaction.atomic():
+            entity_cache.get(Park, self.park.pk)
+        with self.assertNumQueries(1):
+            entity_cache.get(Park, self.park.pk)
+
+    def test_booking_create_reads_slot_from_cache(self):
+        entity_cache.get(ParkingSlot, self.slot.pk)
+        pricing_engine.clear()
+        data = {
+            'user': self.user.pk,
+            'parking_slot': self.slot.pk,
+            'booking_start_date': '2023-01-01T10:00:00.000Z',
+            'booking_end_date': '2023-01-01T12:00:00.000Z',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('booking-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        slot_reads = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "ParkingApp_parkingslot"' in query['sql']
+        ]
+        self.assertEqual(slot_reads, [])
+
+    def test_detail_views(self):
+        url = reverse('parkingslot-detail', args=[self.slot.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        # Only the table version behind the ETag
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['slot_number'], 1)
+
+        response = self.client.patch(url, {'slot_number': 7}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data['slot_number'], 7)
+
+        self.assertEqual(self.client.get(reverse('parkingslot-detail', args=[999])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('park-details-detail', args=[self.park.park_details_id])).status_code, status.HTTP_200_OK)
+
+        stats = self.client.get(reverse('cache-stats')).data
+        self.assertEqual(stats['models']['ParkingApp.parkingslot']['hits'], 1)
+
+    def test_detail_views_see_writes_bypassing_signals(self):
+        # The body must not be older than the ETag sent with it
+        url = reverse('park-detail', args=[self.park.pk])
+        first = self.client.get(url)
+        Park.objects.filter(pk=self.park.pk).update(total_spots=99)
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['total_spots'], 99)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
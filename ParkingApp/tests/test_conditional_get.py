@@ -0,0 +1,100 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import *
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        self.floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=self.floor, slot_number=1, has_charger=True)
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_not_modified(self):
+        url = reverse('parkingslot-list-create')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Answered from the table versions alone
+        with self.assertNumQueries(1):
+            response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        self.assertEqual(self.revalidate(url, f'"other", W/{etag}').status_code, status.HTTP_304_NOT_MODIFIED)
+        # Another page is another resource
+        self.assertEqual(self.revalidate(url, etag, page_size=1).status_code, status.HTTP_200_OK)
+
+        ParkingSlot.objects.create(floor=self.floor, slot_number=2, has_charger=False)
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_detail_not_modified(self):
+        url = reverse('parkingslot-detail', args=[self.slot.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {'slot_number': 5}, format='json')
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['slot_number'], 5)
+
+        self.assertFalse(self.client.get(reverse('parkingslot-detail', args=[999])).has_header('ETag'))
+
+    def test_tables_are_independent(self):
+        floors = reverse('floor-list-create')
+        parks = reverse('park-list-create')
+        floors_etag = self.client.get(floors)['ETag']
+        parks_etag = self.client.get(parks)['ETag']
+
+        ParkingSlotRules.objects.create(
+            parking_slot=self.slot, date_start_rule='2023-01-01T00:00:00Z', date_end_rule='2023-01-02T00:00:00Z', price=5.0
+        )
+        self.assertEqual(self.revalidate(floors, floors_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Deleting the park cascades to its floors
+        self.park.delete()
+        self.assertEqual(self.revalidate(floors, floors_etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.revalidate(parks, parks_etag).status_code, status.HTTP_200_OK)
+
+    def test_writes_bypassing_signals(self):
+        url = reverse('parkingslot-list-create')
+        etag = self.client.get(url)['ETag']
+        ParkingSlot.objects.filter(pk=self.slot.pk).update(has_charger=False)
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_200_OK)
+
+        etag = self.client.get(url)['ETag']
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{ParkingSlot._meta.db_table}"')
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+    def test_versions_outlive_the_cache(self):
+        # Kept in the database, so every worker sees the same ones
+        url = reverse('park-list-create')
+        etag = self.client.get(url)['ETag']
+        caches['default'].clear()
+        self.assertEqual(self.revalidate(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_any_etag(self):
+        self.assertEqual(self.revalidate(reverse('parkingslot-detail', args=[self.slot.pk]), '*').status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.revalidate(reverse('parkingslot-list-create'), '*').status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.revalidate(reverse('parkingslot-detail', args=[999]), '*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.revalidate(reverse('parkingslotrules-detail-by-pk', args=[999]), '*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
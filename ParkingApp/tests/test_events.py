@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import events
+from ..events import InProcessEventBus, event_bus, floor_topic, park_topic
+from ..models import *
+from ..views import SlotEventStreamView
+
+
+class InProcessEventBusTest(TestCase):
+    def test_publish_from_other_thread(self):
+        bus = InProcessEventBus()
+
+        async def scenario():
+            with bus.subscribe([park_topic(1), floor_topic(2)]) as both, bus.subscribe([park_topic(3)]) as other:
+                thread = threading.Thread(target=bus.publish, args=([park_topic(1), floor_topic(2)], {'n': 1}))
+                thread.start()
+                thread.join()
+                self.assertEqual(await both.get(timeout=1), {'n': 1})
+                self.assertIsNone(await both.get(timeout=0.01))
+                self.assertIsNone(await other.get(timeout=0.01))
+            self.assertFalse(bus.has_subscribers())
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_drops_oldest(self):
+        bus = InProcessEventBus()
+
+        async def scenario():
+            with bus.subscribe([park_topic(1)], maxsize=2) as subscription:
+                for n in range(5):
+                    bus.publish([park_topic(1)], {'n': n})
+                await asyncio.sleep(0)
+                self.assertEqual(subscription.dropped, 3)
+                self.assertEqual([(await subscription.get(timeout=1))['n'] for _ in range(2)], [3, 4])
+
+        asyncio.run(scenario())
+
+
+class SlotEventStreamTest(TestCase):
+    def setUp(self):
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        self.floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=self.floor, slot_number=1, has_charger=True)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.url = reverse('parkingslot-stream')
+
+    def write(self, action):
+        # Run a write and its on_commit callbacks, as a committed request would
+        with self.captureOnCommitCallbacks(execute=True):
+            return action()
+
+    async def test_booking_and_rule_changes_are_published(self):
+        start = timezone.now() + timedelta(hours=1)
+        with event_bus.subscribe([floor_topic(self.floor.pk)]) as subscription:
+            booking = await sync_to_async(self.write)(lambda: Booking.objects.create(
+                parking_slot=self.slot, user=self.user,
+                booking_start_date=start, booking_end_date=start + timedelta(hours=2), price=10.0
+            ))
+            event = await subscription.get(timeout=1)
+            self.assertEqual(event['type'], 'availability')
+            self.assertEqual((event['park'], event['parking_slot'], event['booking'], event['booked']), (self.park.pk, self.slot.pk, booking.pk, True))
+
+            await sync_to_async(self.write)(booking.delete)
+            self.assertFalse((await subscription.get(timeout=1))['booked'])
+
+            await sync_to_async(self.write)(lambda: ParkingSlotRules.objects.create(
+                parking_slot=self.slot, date_start_rule=timezone.now() - timedelta(hours=1),
+                date_end_rule=timezone.now() + timedelta(hours=1), price=25.0
+            ))
+            event = await subscription.get(timeout=1)
+            self.assertEqual((event['type'], event['current_price']), ('price', 25.0))
+
+    async def test_stream(self):
+        response = await self.async_client.get(self.url, {'park': self.park.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        events.event_bus.publish([park_topic(self.park.pk)], {'type': 'availability', 'parking_slot': self.slot.pk})
+        chunk = (await anext(stream)).decode()
+        self.assertIn('event: availability\n', chunk)
+        data = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(data['parking_slot'], self.slot.pk)
+        await stream.aclose()
+
+    async def test_closed_stream_unsubscribes(self):
+        stream = SlotEventStreamView().stream([park_topic(self.park.pk)])
+        await anext(stream)
+        self.assertTrue(event_bus.has_subscribers())
+        await stream.aclose()
+        self.assertFalse(event_bus.has_subscribers())
+
+    @override_settings(EVENT_STREAM_HEARTBEAT=0.01)
+    async def test_stream_keepalive(self):
+        response = await self.async_client.get(self.url, {'floor': self.floor.pk})
+        stream = response.streaming_content
+        await anext(stream)
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+        await stream.aclose()
+
+    async def test_stream_requires_topics(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 400)
+        self.assertEqual((await self.async_client.get(self.url, {'park': 'x'})).status_code, 400)
@@ -0,0 +1,96 @@
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from .. import export
+from ..models import *
+
+
+class BookingExportTest(TestCase):
+    def setUp(self):
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=2, no_floors=1)
+        other_owner = ParkOwner.objects.create(first_name='Ann', last_name='Doe', email='ann@example.com', password='password')
+        other_details = ParkDetails.objects.create(address='Other Address', latitude=1.0, longitude=1.0)
+        other_park = Park.objects.create(park_owner=other_owner, park_details=other_details, total_spots=1, no_floors=1)
+        self.floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slot1 = ParkingSlot.objects.create(floor=self.floor, slot_number=1, has_charger=False)
+        self.slot2 = ParkingSlot.objects.create(floor=self.floor, slot_number=2, has_charger=False)
+        self.other_slot = ParkingSlot.objects.create(floor=Floor.objects.create(park=other_park, floor_number=1), slot_number=1, has_charger=False)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.bookings = [
+            self.book(self.slot1, 1, 2),
+            self.book(self.slot2, 1, 3),
+            self.book(self.slot1, 5, 6),
+            self.book(self.other_slot, 1, 2),
+        ]
+        self.url = reverse('booking-export')
+
+    def book(self, slot, start_day, end_day):
+        return Booking.objects.create(
+            parking_slot=slot, user=self.user, price=10.0,
+            booking_start_date=timezone.make_aware(datetime(2023, 1, start_day)),
+            booking_end_date=timezone.make_aware(datetime(2023, 1, end_day)),
+        )
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        lines = self.export().splitlines()
+        self.assertEqual(len(lines), 4)
+        row = json.loads(lines[0])
+        self.assertEqual(list(row), list(export.HEADER))
+        booking = self.bookings[0]
+        self.assertEqual(
+            (row['booking_id'], row['park'], row['floor'], row['parking_slot'], row['user'], row['price']),
+            (booking.pk, self.park.pk, self.floor.pk, self.slot1.pk, self.user.pk, 10.0)
+        )
+        self.assertEqual(row['booking_start_date'], '2023-01-01T00:00:00+02:00')
+
+    def test_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('bookings.csv', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(tuple(rows[0]), export.HEADER)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [booking.pk for booking in self.bookings])
+
+    def test_filters(self):
+        def ids(**params):
+            return [json.loads(line)['booking_id'] for line in self.export(**params).splitlines()]
+
+        self.assertEqual(ids(park=self.park.pk), [booking.pk for booking in self.bookings[:3]])
+        self.assertEqual(ids(parking_slot=self.slot1.pk), [self.bookings[0].pk, self.bookings[2].pk])
+        # Bookings overlapping the range
+        self.assertEqual(
+            ids(park=self.park.pk, start='2023-01-02T00:00:00.000Z', end='2023-01-05T12:00:00.000Z'),
+            [self.bookings[1].pk, self.bookings[2].pk]
+        )
+
+    @override_settings(EXPORT_CHUNK_SIZE=3)
+    def test_streams_in_chunks(self):
+        response = self.client.get(self.url)
+        # One read per chunk, each encoded as it is fetched
+        with self.assertNumQueries(1):
+            chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [3, 1])
+
+    def test_bad_parameters(self):
+        for params in ({'format': 'xml'}, {'park': 'x'}, {'start': '2023-01-01'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.json())
@@ -0,0 +1,92 @@
+from datetime import datetime
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.test import APIClient
+
+from .. import fastpath
+from ..fastpath import FastJSONRenderer, fast_serializer
+from ..models import *
+from ..serializers import *
+from ..views import ParkingSlotListCreateView
+
+
+class FastPathTest(TestCase):
+    def setUp(self):
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Strada Ştefan cel Mare   "7"', latitude=44.4268, longitude=-26.1)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=2, no_floors=1)
+        floor = Floor.objects.create(park=self.park, floor_number=1)
+        self.slots = [
+            ParkingSlot.objects.create(floor=floor, slot_number=n, has_charger=n % 2 == 0)
+            for n in range(1, 4)
+        ]
+        user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        for n, slot in enumerate(self.slots):
+            start = timezone.make_aware(datetime(2023, 1 + n * 5, 1, 10, 30, 0, 123456 * n))
+            Booking.objects.create(parking_slot=slot, user=user, booking_start_date=start, booking_end_date=start, price=10.5 + n)
+            ParkingSlotRules.objects.create(parking_slot=slot, date_start_rule=start, date_end_rule=start, price=2.25)
+
+    def assertSameJSON(self, serializer_class, queryset):
+        queryset = queryset.order_by('pk')
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        fast = fast_serializer(serializer_class)
+        for orjson in (fastpath.orjson, None):
+            with mock.patch.object(fastpath, 'orjson', orjson):
+                rendered = FastJSONRenderer().render(fast.many(fast.rows(queryset)))
+            self.assertEqual(rendered, expected, (serializer_class.__name__, orjson))
+
+    def test_byte_compatible(self):
+        cases = [
+            (ParkSerializer, Park.objects.all()),
+            (ParkDetailsSerializer, ParkDetails.objects.all()),
+            (FloorSerializer, Floor.objects.all()),
+            (ParkingSlotSerializer, ParkingSlot.objects.all()),
+            (AvailableParkingSlotSerializer, ParkingSlot.objects.all()),
+            (ParkingSlotRulesSerializer, ParkingSlotRules.objects.all()),
+            (BookingSerializer, Booking.objects.all()),
+        ]
+        for serializer_class, queryset in cases:
+            self.assertSameJSON(serializer_class, queryset)
+        with timezone.override('UTC'):
+            self.assertSameJSON(BookingSerializer, Booking.objects.all())
+
+    def test_floats_orjson_writes_differently(self):
+        Booking.objects.filter(pk=Booking.objects.first().pk).update(price=1e-05)
+        Booking.objects.filter(pk=Booking.objects.last().pk).update(price=1e20)
+        fast = fast_serializer(BookingSerializer)
+        self.assertFalse(fast.many(fast.rows(Booking.objects.all())).json_safe)
+        self.assertSameJSON(BookingSerializer, Booking.objects.all())
+
+    def test_unsupported_serializer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            fastpath.FastSerializer(ParkLayoutSerializer)
+
+    def test_paginated_views(self):
+        client = APIClient()
+        response = client.get(reverse('booking-list'), {'page_size': 2})
+        self.assertEqual([row['booking_id'] for row in response.data['results']], [booking.pk for booking in Booking.objects.order_by('booking_start_date')[:2]])
+        response = client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+        response = client.get(reverse('parkingslot-list-available'), {'page_size': 1})
+        self.assertEqual(response.data['results'][0]['physical_available'], True)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_view_renderers_are_kept(self):
+        # FastJSONRenderer goes in front of the view's renderers, not instead
+        url = reverse('parkingslot-list-create')
+        with mock.patch.object(ParkingSlotListCreateView, 'renderer_classes', (JSONRenderer, BrowsableAPIRenderer)):
+            response = APIClient().get(url)
+            self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+            response = APIClient().get(url, HTTP_ACCEPT='text/html')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsInstance(response.accepted_renderer, BrowsableAPIRenderer)
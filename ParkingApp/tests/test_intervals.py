@@ -0,0 +1,113 @@
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..intervals import SlotIntervals, booking_index
+from ..models import *
+from ..utils import parse_iso_datetime
+
+
+class SlotIntervalsTest(TestCase):
+    def setUp(self):
+        self.intervals = SlotIntervals([(10, 20, 1), (30, 40, 2), (50, 60, 3)])
+
+    def test_overlaps_half_open(self):
+        self.assertTrue(self.intervals.overlaps(15, 16))
+        self.assertTrue(self.intervals.overlaps(19, 31))
+        self.assertFalse(self.intervals.overlaps(20, 30))
+        self.assertFalse(self.intervals.overlaps(0, 10))
+        self.assertFalse(self.intervals.overlaps(60, 70))
+
+    def test_point_query(self):
+        self.assertTrue(self.intervals.overlaps(30, 30))
+        self.assertFalse(self.intervals.overlaps(40, 40))
+
+    def test_exclude(self):
+        self.assertFalse(self.intervals.overlaps(32, 35, exclude=2))
+        self.assertEqual(list(self.intervals.overlapping(15, 55, exclude=2)), [3, 1])
+
+    def test_long_interval_shadowed_by_later_starts(self):
+        intervals = SlotIntervals([(0, 100, 1), (10, 20, 2), (30, 40, 3)])
+        self.assertTrue(intervals.overlaps(50, 60))
+
+    def test_add_and_remove(self):
+        self.intervals.add(20, 30, 4)
+        self.assertTrue(self.intervals.overlaps(25, 26))
+        self.intervals.add(70, 80, 4)
+        self.assertFalse(self.intervals.overlaps(25, 26))
+        self.assertTrue(self.intervals.remove(4))
+        self.assertFalse(self.intervals.overlaps(70, 80))
+        self.assertEqual(len(self.intervals), 3)
+
+
+class BookingIntervalIndexTest(TestCase):
+    def setUp(self):
+        booking_index.clear()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=2, no_floors=1)
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+        self.other_slot = ParkingSlot.objects.create(floor=floor, slot_number=2, has_charger=True)
+        self.start = parse_iso_datetime('2030-01-01T12:00:00.000Z')
+        self.end = parse_iso_datetime('2030-01-01T14:00:00.000Z')
+
+    def tearDown(self):
+        booking_index.clear()
+
+    def book(self, slot, start, end):
+        return Booking.objects.create(parking_slot=slot, user=self.user, booking_start_date=start, booking_end_date=end, price=10.0)
+
+    def test_loads_lazily_then_answers_without_queries(self):
+        self.book(self.slot, self.start, self.end)
+        with self.assertNumQueries(1):
+            self.assertTrue(booking_index.overlaps(self.slot.pk, self.start, self.end))
+        with self.assertNumQueries(0):
+            self.assertTrue(booking_index.overlaps(self.slot.pk, self.start, self.end))
+            self.assertFalse(booking_index.overlaps(self.slot.pk, self.end, parse_iso_datetime('2030-01-01T15:00:00.000Z')))
+
+    def test_save_and_delete_keep_index_current(self):
+        self.assertFalse(booking_index.overlaps(self.slot.pk, self.start, self.end))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.book(self.slot, self.start, self.end)
+        self.assertTrue(booking_index.overlaps(self.slot.pk, self.start, self.end))
+
+        booking_index.overlaps(self.other_slot.pk, self.start, self.end)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.parking_slot = self.other_slot
+            booking.save()
+        with self.assertNumQueries(1):
+            self.assertFalse(booking_index.overlaps(self.slot.pk, self.start, self.end))
+            self.assertTrue(booking_index.overlaps(self.other_slot.pk, self.start, self.end))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertFalse(booking_index.overlaps(self.other_slot.pk, self.start, self.end))
+
+    def test_rebuild(self):
+        booking = self.book(self.slot, self.start, self.end)
+        booking_index.rebuild()
+        with self.assertNumQueries(0):
+            self.assertEqual(booking_index.overlapping(self.slot.pk, self.start, self.end), [booking.pk])
+
+    def test_stale_hits_are_confirmed(self):
+        # Another worker cancelled the booking this process' index still holds
+        booking = self.book(self.slot, self.start, self.end)
+        self.assertTrue(booking_index.overlaps(self.slot.pk, self.start, self.end))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{Booking._meta.db_table}" WHERE booking_id = %s', [booking.pk])
+
+        data = {
+            'user': self.user.pk,
+            'parking_slot': self.slot.pk,
+            'booking_start_date': '2030-01-01T12:00:00.000Z',
+            'booking_end_date': '2030-01-01T14:00:00.000Z',
+        }
+        response = APIClient().post(reverse('booking-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
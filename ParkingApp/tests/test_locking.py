@@ -0,0 +1,132 @@
+import copy
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..backends.sqlite3.base import DatabaseWrapper
+from ..intervals import booking_index
+from ..locking import retry_on_lock
+from ..models import *
+from ..utils import parse_iso_datetime
+
+
+class SlotWriteLockTest(TestCase):
+    def setUp(self):
+        booking_index.clear()
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+
+    def tearDown(self):
+        booking_index.clear()
+
+    def test_stale_index_cannot_double_book(self):
+        # Load the slot, then write behind the index's back the way another
+        # worker process would
+        self.assertEqual(booking_index.overlapping(self.slot.pk, parse_iso_datetime('2030-01-01T12:00:00.000Z'), parse_iso_datetime('2030-01-01T14:00:00.000Z')), [])
+        Booking.objects.bulk_create([Booking(
+            parking_slot=self.slot,
+            user=self.user,
+            booking_start_date=parse_iso_datetime('2030-01-01T12:00:00.000Z'),
+            booking_end_date=parse_iso_datetime('2030-01-01T14:00:00.000Z'),
+            price=10.0
+        )])
+
+        data = {
+            'user': self.user.pk,
+            'parking_slot': self.slot.pk,
+            'booking_start_date': '2030-01-01T13:00:00.000Z',
+            'booking_end_date': '2030-01-01T15:00:00.000Z',
+        }
+        response = self.client.post(reverse('booking-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class SQLiteTransactionModeTest(TestCase):
+    def wrapper(self, mode, **options):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict['OPTIONS'] = {'transaction_mode': mode, **options}
+        return DatabaseWrapper(settings_dict)
+
+    def test_transaction_mode(self):
+        wrapper = self.wrapper('immediate')
+        self.assertNotIn('transaction_mode', wrapper.get_connection_params())
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+    def test_invalid_transaction_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper('sometimes').get_connection_params()
+
+    def test_pragmas(self):
+        settings_dict = copy.deepcopy(connection.settings_dict)
+        settings_dict['NAME'] = Path(tempfile.mkdtemp()) / 'pragmas.sqlite3'
+        settings_dict['OPTIONS'] = {'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -2048}}
+        wrapper = DatabaseWrapper(settings_dict)
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -2048)
+
+    def test_invalid_pragma(self):
+        for pragmas in ({'journal_mode': 'WAL; DROP TABLE Booking'}, {'cache size': 1}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.wrapper('immediate', pragmas=pragmas).get_connection_params()
+
+
+@override_settings(DB_LOCK_RETRIES=3, DB_LOCK_RETRY_DELAY=0)
+class RetryOnLockTest(SimpleTestCase):
+    def failing(self, *errors):
+        calls = mock.Mock(side_effect=[*errors, 'done'])
+        return calls, retry_on_lock(calls)
+
+    def test_retries_lock_errors(self):
+        calls, func = self.failing(OperationalError('database is locked'), OperationalError('database is locked'))
+        self.assertEqual(func(1, key=2), 'done')
+        self.assertEqual(calls.call_count, 3)
+        calls.assert_called_with(1, key=2)
+
+    def test_gives_up(self):
+        calls, func = self.failing(*[OperationalError('database is locked')] * 4)
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 4)
+
+    def test_other_errors_are_not_retried(self):
+        calls, func = self.failing(OperationalError('no such table: Booking'))
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_backoff(self):
+        calls, func = self.failing(*[OperationalError('database is locked')] * 3)
+        with override_settings(DB_LOCK_RETRY_DELAY=0.1, DB_LOCK_RETRY_MAX_DELAY=0.3), \
+                mock.patch('ParkingApp.locking.time.sleep') as sleep, \
+                mock.patch('ParkingApp.locking.random.uniform', side_effect=lambda low, high: high):
+            func()
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.1, 0.2, 0.3])
+
+
+class RetryInTransactionTest(TestCase):
+    def test_not_retried_inside_atomic(self):
+        # TestCase runs every test inside a transaction
+        calls = mock.Mock(side_effect=[OperationalError('database is locked'), 'done'])
+        with self.assertRaises(OperationalError):
+            retry_on_lock(calls)()
+        self.assertEqual(calls.call_count, 1)
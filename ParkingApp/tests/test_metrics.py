@@ -0,0 +1,136 @@
+import gc
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..metrics import MetricsRegistry, metrics, render_prometheus
+from ..models import *
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+
+    def test_requests_recorded_by_route(self):
+        self.client.get(reverse('parkingslot-list-create'))
+        self.client.get(reverse('parkingslot-detail', args=[self.slot.pk]))
+        self.client.get(reverse('parkingslot-detail', args=[999]))
+        self.client.get('/no-such-page/')
+
+        series = metrics.snapshot()
+        detail = series['/ParkingApp/parking-slots/<int:pk>/', 'GET']
+        self.assertEqual(detail.statuses, {'200': 1, '404': 1})
+        self.assertEqual(sum(detail.latency.counts), 2)
+
+        listing = series['/ParkingApp/parking-slots/', 'GET']
+        self.assertEqual(sum(listing.queries.counts), 1)
+        self.assertGreater(listing.queries.sum, 0)
+        self.assertGreater(listing.size.sum, 0)
+        self.assertEqual(series['<unmatched>', 'GET'].statuses, {'404': 1})
+
+    async def test_async_views_count_queries(self):
+        # The async ORM queries on another thread than the middleware runs on
+        booking = await Booking.objects.acreate(
+            parking_slot=self.slot, user=await Users.objects.acreate(
+                credentials=await Credentials.objects.acreate(email='user@example.com', password='userpassword'),
+                first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True,
+            ),
+            booking_start_date=timezone.now(), booking_end_date=timezone.now() + timedelta(hours=1), price=10.0,
+        )
+        response = await self.async_client.get(reverse('async-booking-detail', args=[booking.pk]))
+        self.assertEqual(response.status_code, 200)
+        series = metrics.snapshot()['/ParkingApp/async/bookings/<int:pk>/', 'GET']
+        self.assertEqual(series.queries.sum, 1)
+        self.assertGreater(series.db_latency.sum, 0)
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse('parkingslot-list-create'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'route="/ParkingApp/parking-slots/",method="GET"'
+        self.assertIn(f'parking_http_requests_total{{{labels},status="200"}} 1\n', body)
+        self.assertIn(f'parking_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n', body)
+        self.assertIn(f'parking_http_request_duration_seconds_count{{{labels}}} 1\n', body)
+        self.assertIn('# TYPE parking_http_db_queries histogram\n', body)
+
+    def test_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        for seconds in (0.001, 0.005, 0.3, 60):
+            registry.record('/r/', 'BREW', 200, seconds, 0, 0.0)
+        body = render_prometheus(registry.snapshot())
+        labels = 'route="/r/",method="OTHER"'
+        self.assertIn(f'parking_http_request_duration_seconds_bucket{{{labels},le="0.005"}} 2\n', body)
+        self.assertIn(f'parking_http_request_duration_seconds_bucket{{{labels},le="0.5"}} 3\n', body)
+        self.assertIn(f'parking_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4\n', body)
+        self.assertIn(f'parking_http_response_size_bytes_count{{{labels}}} 0\n', body)
+
+    def test_threads_record_into_shards(self):
+        registry = MetricsRegistry()
+
+        def worker():
+            for _ in range(1000):
+                registry.record('/r/', 'GET', 200, 0.01, 1, 0.001, 10)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        series = registry.snapshot()['/r/', 'GET']
+        self.assertEqual(series.statuses, {'200': 4000})
+        self.assertEqual(series.queries.sum, 4000)
+
+    def test_finished_threads_are_retired(self):
+        # A thread per request must not leave a shard per request behind
+        registry = MetricsRegistry()
+        for _ in range(50):
+            thread = threading.Thread(target=registry.record, args=('/r/', 'GET', 200, 0.01, 1, 0.001, 10))
+            thread.start()
+            thread.join()
+        gc.collect()
+        self.assertEqual(len(registry._shards), 0)
+        registry.record('/r/', 'GET', 404, 0.01, 1, 0.001, 10)
+        series = registry.snapshot()['/r/', 'GET']
+        self.assertEqual(series.statuses, {'200': 50, '404': 1})
+        self.assertEqual(series.queries.sum, 51)
+
+    def test_file_names_are_unique(self):
+        # A pid can come back after its worker died, its file must not be reused
+        self.assertNotEqual(MetricsRegistry().name, MetricsRegistry().name)
+
+    def test_workers_share_a_directory(self):
+        directory = tempfile.mkdtemp()
+        worker = MetricsRegistry(directory=directory, name='worker-1')
+        other = MetricsRegistry(directory=directory, name='worker-2')
+        worker.record('/r/', 'GET', 200, 0.01, 1, 0.001, 10)
+        other.record('/r/', 'GET', 500, 0.02, 2, 0.002, 20)
+        other.flush()
+
+        series = worker.collect()['/r/', 'GET']
+        self.assertEqual(series.statuses, {'200': 1, '500': 1})
+        self.assertEqual(series.queries.sum, 3)
+
+        other.clear()
+        self.assertEqual(worker.collect()['/r/', 'GET'].statuses, {'200': 1})
+
+    def test_middleware_flushes_to_directory(self):
+        directory = tempfile.mkdtemp()
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('parkingslot-list-create'))
+            other = MetricsRegistry(name='other')
+            self.assertEqual(other.collect()['/ParkingApp/parking-slots/', 'GET'].statuses, {'200': 1})
+            metrics.clear()
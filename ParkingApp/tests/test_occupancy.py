@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import occupancy
+from ..models import *
+
+
+class OccupancyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        self.park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=3, no_floors=2)
+        self.floor1 = Floor.objects.create(park=self.park, floor_number=1)
+        self.floor2 = Floor.objects.create(park=self.park, floor_number=2)
+        self.charger_slot = ParkingSlot.objects.create(floor=self.floor1, slot_number=1, has_charger=True)
+        self.plain_slot = ParkingSlot.objects.create(floor=self.floor1, slot_number=2, has_charger=False)
+        self.upper_slot = ParkingSlot.objects.create(floor=self.floor2, slot_number=1, has_charger=False)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.url = reverse('park-occupancy', args=[self.park.pk])
+        self.now = timezone.now()
+
+    def book(self, slot, start, end):
+        return Booking.objects.create(
+            parking_slot=slot, user=self.user, booking_start_date=start, booking_end_date=end, price=10.0
+        )
+
+    def counters(self, now=None):
+        # (total, free, free with charger, booked) of the park, then per floor
+        rows = occupancy.advance(self.park.pk, now=now)
+        return [(row.total, row.free, row.free_with_charger, row.booked) for row in rows]
+
+    def test_endpoint(self):
+        self.book(self.charger_slot, self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['total'], response.data['free'], response.data['free_with_charger'], response.data['booked']),
+            (3, 2, 0, 1)
+        )
+        self.assertEqual([floor['floor'] for floor in response.data['floors']], [self.floor1.pk, self.floor2.pk])
+        self.assertEqual([floor['free'] for floor in response.data['floors']], [1, 1])
+
+        # Fresh counters are a single read
+        occupancy.reconcile([self.park.pk])
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        self.assertEqual(self.client.get(reverse('park-occupancy', args=[999])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reads_do_not_write(self):
+        # A park without rows is counted, not reconciled
+        self.book(self.charger_slot, self.now - timedelta(hours=1), self.now + timedelta(hours=3))
+        self.assertEqual(occupancy.current(self.park.pk, now=self.now)[0].booked, 1)
+        self.assertFalse(Occupancy.objects.exists())
+
+        # Stale rows are brought forward in the response only
+        occupancy.reconcile([self.park.pk], now=self.now)
+        start = self.now + timedelta(hours=1)
+        self.book(self.plain_slot, start, start + timedelta(hours=1))
+        rows = occupancy.current(self.park.pk, now=start + timedelta(minutes=30))
+        self.assertEqual([(row.booked, row.as_of) for row in rows[:2]], [(2, start + timedelta(minutes=30))] * 2)
+        stored = Occupancy.objects.get(park=self.park, floor__isnull=True)
+        self.assertEqual((stored.booked, stored.as_of), (1, self.now))
+
+        self.assertEqual(occupancy.current(999), [])
+
+    def test_advance_command(self):
+        occupancy.reconcile([self.park.pk], now=self.now - timedelta(hours=2))
+        self.book(self.charger_slot, self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+        out = StringIO()
+        call_command('reconcile_occupancy', advance=True, stdout=out)
+        self.assertIn('of 1 parks', out.getvalue())
+        stored = Occupancy.objects.get(park=self.park, floor__isnull=True)
+        self.assertEqual(stored.booked, 1)
+        self.assertGreater(stored.as_of, self.now)
+
+    def test_bookings_created_and_cancelled(self):
+        occupancy.reconcile([self.park.pk])
+        booking = self.book(self.plain_slot, self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+        self.assertEqual(self.counters(self.now), [(3, 2, 1, 1), (2, 1, 1, 1), (1, 1, 0, 0)])
+
+        booking.parking_slot = self.upper_slot
+        booking.save()
+        self.assertEqual(self.counters(self.now), [(3, 2, 1, 1), (2, 2, 1, 0), (1, 0, 0, 1)])
+
+        booking.delete()
+        self.assertEqual(self.counters(self.now), [(3, 3, 1, 0), (2, 2, 1, 0), (1, 1, 0, 0)])
+
+    def test_bookings_start_and_end(self):
+        occupancy.reconcile([self.park.pk], now=self.now)
+        start, end = self.now + timedelta(hours=1), self.now + timedelta(hours=2)
+        self.book(self.charger_slot, start, end)
+        self.assertEqual(self.counters(self.now)[0], (3, 3, 1, 0))
+        self.assertEqual(self.counters(start)[0], (3, 2, 0, 1))
+        self.assertEqual(self.counters(start + timedelta(minutes=30))[0], (3, 2, 0, 1))
+        self.assertEqual(self.counters(end)[0], (3, 3, 1, 0))
+
+    def test_booking_inside_one_advance(self):
+        occupancy.reconcile([self.park.pk], now=self.now)
+        self.book(self.charger_slot, self.now + timedelta(hours=1), self.now + timedelta(hours=2))
+        self.assertEqual(self.counters(self.now + timedelta(hours=3))[0], (3, 3, 1, 0))
+
+    def test_slots_and_floors(self):
+        occupancy.reconcile([self.park.pk])
+        floor3 = Floor.objects.create(park=self.park, floor_number=3)
+        ParkingSlot.objects.create(floor=floor3, slot_number=1, has_charger=True)
+        self.assertEqual(self.counters(self.now)[0], (4, 4, 2, 0))
+        self.assertEqual(self.counters(self.now)[3], (1, 1, 1, 0))
+
+        self.plain_slot.has_charger = True
+        self.plain_slot.save()
+        self.upper_slot.delete()
+        self.assertEqual(self.counters()[0], (3, 3, 3, 0))
+
+    def test_reconcile_command_matches(self):
+        occupancy.reconcile([self.park.pk])
+        self.book(self.charger_slot, self.now - timedelta(hours=1), self.now + timedelta(hours=1))
+        self.book(self.upper_slot, self.now - timedelta(hours=3), self.now - timedelta(hours=2))
+        ParkingSlot.objects.create(floor=self.floor2, slot_number=2, has_charger=False)
+        incremental = self.counters(self.now)
+
+        out = StringIO()
+        call_command('reconcile_occupancy', park=[self.park.pk], stdout=out)
+        self.assertIn(f'park {self.park.pk}: 3/4 free', out.getvalue())
+        self.assertEqual(self.counters(self.now), incremental)
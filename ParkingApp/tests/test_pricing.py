@@ -0,0 +1,110 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import *
+from ..pricing import PriceTimeline, pricing_engine
+from ..utils import parse_iso_datetime
+
+
+class PriceTimelineTest(TestCase):
+    def setUp(self):
+        self.timeline = PriceTimeline(10, [
+            (100, 200, 20, 1),
+            (150, 300, 30, 2),
+            (400, 500, 40, 3),
+            (600, 600, 99, 4),
+        ])
+
+    def test_compiles_sorted_non_overlapping_segments(self):
+        self.assertEqual(self.timeline.boundaries, [100, 200, 300, 400, 500])
+        self.assertEqual(self.timeline.rates, [20.0, 30.0, 10.0, 40.0])
+
+    def test_window_inside_one_rule(self):
+        self.assertEqual(self.timeline.price(110, 190), 20.0)
+        self.assertEqual(self.timeline.price(0, 100), 10.0)
+        self.assertEqual(self.timeline.price(700, 800), 10.0)
+
+    def test_window_across_rules_is_prorated(self):
+        self.assertEqual(self.timeline.price(150, 350), 22.5)
+        self.assertEqual(self.timeline.price(50, 150), 15.0)
+        self.assertEqual(self.timeline.price(450, 550), 25.0)
+
+    def test_point_window(self):
+        self.assertEqual(self.timeline.price(250, 250), 30.0)
+        self.assertEqual(self.timeline.price(600, 600), 10.0)
+
+    def test_no_rules(self):
+        timeline = PriceTimeline(12)
+        self.assertEqual(timeline.price(0, 100), 12.0)
+
+
+class PriceQuoteAPITest(TestCase):
+    def setUp(self):
+        pricing_engine.clear()
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=1, no_floors=1)
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True, standard_price=10)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        ParkingSlotRules.objects.create(
+            parking_slot=self.slot,
+            date_start_rule=parse_iso_datetime('2030-01-01T12:00:00.000Z'),
+            date_end_rule=parse_iso_datetime('2030-01-01T14:00:00.000Z'),
+            price=30.0
+        )
+        self.url = reverse('price-quote')
+
+    def tearDown(self):
+        pricing_engine.clear()
+
+    def quote(self, start, end, slot=None):
+        data = {'parking_slot': slot or self.slot.pk, 'start': start, 'end': end}
+        return self.client.get(self.url, data=data)
+
+    def test_quote(self):
+        response = self.quote('2030-01-01T13:00:00.000Z', '2030-01-01T15:00:00.000Z')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['price'], 20.0)
+        with self.assertNumQueries(0):
+            self.quote('2030-01-01T12:00:00.000Z', '2030-01-01T13:00:00.000Z')
+
+    def test_quote_invalid(self):
+        self.assertEqual(self.quote('2030-01-01T15:00:00.000Z', '2030-01-01T13:00:00.000Z').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.quote('2030-01-01', '2030-01-01T13:00:00.000Z').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.quote('2030-01-01T12:00:00.000Z', '2030-01-01T13:00:00.000Z', slot=999).status_code, status.HTTP_404_NOT_FOUND)
+
+        # The slot id has its own error, apart from the dates'
+        response = self.quote('2030-01-01T12:00:00.000Z', '2030-01-01T13:00:00.000Z', slot='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'parking_slot must be an id.')
+
+    def test_rule_change_invalidates_timeline(self):
+        self.assertEqual(self.quote('2030-01-01T14:00:00.000Z', '2030-01-01T15:00:00.000Z').data['price'], 10.0)
+        ParkingSlotRules.objects.create(
+            parking_slot=self.slot,
+            date_start_rule=parse_iso_datetime('2030-01-01T14:00:00.000Z'),
+            date_end_rule=parse_iso_datetime('2030-01-01T15:00:00.000Z'),
+            price=50.0
+        )
+        self.assertEqual(self.quote('2030-01-01T14:00:00.000Z', '2030-01-01T15:00:00.000Z').data['price'], 50.0)
+        self.slot.standard_price = 20
+        self.slot.save()
+        self.assertEqual(self.quote('2030-01-01T15:00:00.000Z', '2030-01-01T16:00:00.000Z').data['price'], 20.0)
+
+    def test_booking_uses_prorated_price(self):
+        data = {
+            'user': self.user.pk,
+            'parking_slot': self.slot.pk,
+            'booking_start_date': '2030-01-01T13:00:00.000Z',
+            'booking_end_date': '2030-01-01T15:00:00.000Z',
+        }
+        response = self.client.post(reverse('booking-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['price'], 20.0)
@@ -0,0 +1,114 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import occupancy, provisioning
+from ..models import *
+
+
+class ParkProvisionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        self.url = reverse('park-provision')
+        self.layout = {
+            'park_owner': self.owner.pk,
+            'details': {'address': 'Test Address', 'latitude': 44.4268, 'longitude': 26.1025},
+            'standard_price': 12,
+            'floors': [
+                {'floor_number': 0, 'slots': 5, 'chargers': ['1-2', 5]},
+                {'floor_number': 1, 'slots': ['1-3', '10-11'], 'standard_price': 8},
+            ],
+        }
+
+    def test_provision(self):
+        response = self.client.post(self.url, self.layout, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        park = Park.objects.get(pk=response.data['park_id'])
+        self.assertEqual((park.park_owner_id, park.total_spots, park.no_floors), (self.owner.pk, 10, 2))
+        self.assertTrue(park.park_details.geohash)
+        self.assertEqual([floor['slots'] for floor in response.data['floors']], [5, 5])
+
+        ground, first = Floor.objects.filter(park=park).order_by('floor_number')
+        self.assertEqual(
+            list(ground.parkingslot_set.order_by('slot_number').values_list('slot_number', 'has_charger', 'standard_price')),
+            [(1, True, 12), (2, True, 12), (3, False, 12), (4, False, 12), (5, True, 12)]
+        )
+        self.assertEqual(list(first.parkingslot_set.order_by('slot_number').values_list('slot_number', flat=True)), [1, 2, 3, 10, 11])
+        self.assertEqual(set(first.parkingslot_set.values_list('standard_price', flat=True)), {8})
+
+        # Occupancy counters are in place for the new park
+        row = occupancy.current(park.pk)[0]
+        self.assertEqual((row.total, row.with_charger, row.free), (10, 3, 10))
+
+    def test_query_count(self):
+        big = dict(self.layout, floors=[{'floor_number': n, 'slots': 400, 'chargers': ['1-40']} for n in range(5)])
+        # Owner check, details, park, floors, slots in batches of as many rows
+        # as the database takes per INSERT, and one occupancy recount
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, big, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(queries), 40)
+        self.assertEqual(ParkingSlot.objects.count(), 2000)
+
+    def test_invalid_layouts(self):
+        invalid = [
+            dict(self.layout, park_owner=999),
+            dict(self.layout, details={'address': 'No coordinates'}),
+            dict(self.layout, floors=[]),
+            dict(self.layout, floors=[{'floor_number': 0, 'slots': 2, 'chargers': [3]}]),
+            dict(self.layout, floors=[{'floor_number': 0, 'slots': ['1-3', 2]}]),
+            dict(self.layout, floors=[{'floor_number': 0, 'slots': 1}, {'floor_number': 0, 'slots': 1}]),
+            dict(self.layout, floors=[{'floor_number': 0, 'slots': ['a-b']}]),
+        ]
+        for layout in invalid:
+            response = self.client.post(self.url, layout, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, layout)
+            self.assertIn('error', response.data)
+        self.assertFalse(Park.objects.exists())
+
+        # An owner has at most one park
+        self.client.post(self.url, self.layout, format='json')
+        response = self.client.post(self.url, self.layout, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Park.objects.count(), 1)
+
+    def test_slot_limit(self):
+        # Counts and ranges over the limit are refused before they are expanded
+        for slots in (10 ** 12, ['1-1000000000000'], ['1-6000', '7001-12000']):
+            response = self.client.post(self.url, dict(self.layout, floors=[{'floor_number': 0, 'slots': slots}]), format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['error'], 'At most 10000 slots per park.')
+        floors = [{'floor_number': 0, 'slots': 6000}, {'floor_number': 1, 'slots': 5000}]
+        response = self.client.post(self.url, dict(self.layout, floors=floors), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, dict(self.layout, floors=[{'floor_number': 0, 'slots': 2, 'chargers': ['1-1000000000000']}]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Park.objects.exists())
+
+    def test_owner_given_a_park_meanwhile(self):
+        parsed = provisioning.parse_layout(self.layout)
+        provisioning.provision_layout(self.layout)
+        with self.assertRaisesMessage(ValueError, 'already has a park'):
+            provisioning.provision(*parsed)
+        self.assertEqual(Park.objects.count(), 1)
+        self.assertEqual(ParkDetails.objects.count(), 1)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as layout_file:
+            json.dump(dict(self.layout, park_owner=None), layout_file)
+            layout_file.flush()
+            out = StringIO()
+            call_command('provision_park', layout_file.name, owner=self.owner.pk, stdout=out)
+        self.assertIn('with 2 floors and 10 slots', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('provision_park', '/nonexistent.json')
@@ -0,0 +1,144 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connections, router
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import routers
+from ..intervals import booking_index
+from ..models import *
+from ..pricing import pricing_engine
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs the replica alias of Parking.test_settings')
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG=5, REPLICA_CHECK_INTERVAL=0)
+class ReplicaRouterTest(TransactionTestCase):
+    # Two databases standing in for the primary and its replica, copied with
+    # the sync_replicas command
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        for cache in (booking_index, pricing_engine, routers.replica_lag, caches['default']):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        park_owner = ParkOwner.objects.create(first_name='John', last_name='Doe', email='john@example.com', password='password')
+        park_details = ParkDetails.objects.create(address='Test Address', latitude=0.0, longitude=0.0)
+        park = Park.objects.create(park_owner=park_owner, park_details=park_details, total_spots=2, no_floors=1)
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane', last_name='Doe', number_plate='ABC123', vehicle_type='Car', verified=True
+        )
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.booking(0)
+        self.sync()
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+    def booking(self, hours):
+        start = self.start + timedelta(hours=hours)
+        return Booking.objects.create(
+            parking_slot=self.slot, user=self.user, booking_start_date=start,
+            booking_end_date=start + timedelta(hours=1), price=10.0,
+        )
+
+    def listed(self, client):
+        response = client.get(reverse('booking-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['booking_id'] for row in response.data['results']}
+
+    def test_reads_go_to_the_replica(self):
+        booking = self.booking(2)
+        self.assertEqual(len(self.listed(APIClient())), 1)
+        self.sync()
+        self.assertIn(booking.pk, self.listed(APIClient()))
+
+    def test_writers_read_their_writes(self):
+        writer = APIClient()
+        response = writer.post(reverse('booking-list'), {
+            'user': self.user.pk, 'parking_slot': self.slot.pk,
+            'booking_start_date': (self.start + timedelta(hours=4)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'booking_end_date': (self.start + timedelta(hours=5)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+        # The replica hasn't seen the booking: the writer reads the primary,
+        # everyone else the replica
+        self.assertEqual(len(self.listed(writer)), 2)
+        self.assertEqual(len(self.listed(APIClient())), 1)
+
+        # Caught up, the writer is back on the replica
+        self.sync()
+        self.booking(6)
+        self.assertEqual(len(self.listed(writer)), 2)
+
+    def test_token_clients_read_their_writes(self):
+        # Clients sending a token are remembered by account, cookies or not
+        tokens = APIClient().post(reverse('token_obtain_pair'), {'email': 'user@example.com', 'password': 'userpassword'}, format='json').data
+        writer = APIClient()
+        writer.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        response = writer.post(reverse('booking-list'), {
+            'user': self.user.pk, 'parking_slot': self.slot.pk,
+            'booking_start_date': (self.start + timedelta(hours=4)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'booking_end_date': (self.start + timedelta(hours=5)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        writer.cookies.clear()
+        self.assertEqual(len(self.listed(writer)), 2)
+        self.assertEqual(len(self.listed(APIClient())), 1)
+
+    def test_etag_reads_use_the_primary(self):
+        # The ETag comes from versions bumped on the primary, so the body must
+        # too, or a stale body would be cached under the new ETag
+        ParkingSlot.objects.create(floor=self.slot.floor, slot_number=2, has_charger=False)
+        response = APIClient().get(reverse('parkingslot-list-create'))
+        self.assertEqual(len(response.data['results']), 2)
+        rule = ParkingSlotRules.objects.create(
+            parking_slot=self.slot, date_start_rule=self.start, date_end_rule=self.start + timedelta(hours=1), price=5.0,
+        )
+        for name in ('parkingslotrules-detail-by-pk', 'async-parkingslotrules-detail-by-pk'):
+            self.assertEqual(APIClient().get(reverse(name, args=[rule.pk])).status_code, status.HTTP_200_OK)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.booking(2)
+        ReplicaHeartbeat.objects.using('replica').update(beat_at=timezone.now() - timedelta(seconds=60))
+        self.assertEqual(len(self.listed(APIClient())), 2)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.booking(2)
+        replica = connections['replica']
+        replica.close()
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError('unable to open database file')), \
+                self.assertLogs('ParkingApp.routers', 'WARNING'):
+            self.assertEqual(len(self.listed(APIClient())), 2)
+
+    def test_outside_requests_use_the_primary(self):
+        self.assertEqual(router.db_for_read(Booking), 'default')
+        self.listed(APIClient())
+        self.assertEqual(router.db_for_read(Booking), 'default')
+        self.assertEqual(router.db_for_write(Booking), 'default')
+
+    def test_shared_indexes_load_from_the_primary(self):
+        # Loaded during a replica read, they still see the primary's bookings
+        booking = self.booking(2)
+        routers._request.set(routers._ReplicaRequest(0))
+        self.addCleanup(routers.end_request)
+        self.assertEqual(router.db_for_read(Booking), 'replica')
+        self.assertIn(booking.pk, booking_index.get(self.slot.pk).ids)
+
+    def test_command_requires_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]), self.assertRaises(CommandError):
+            call_command('sync_replicas', stdout=StringIO())
+        call_command('sync_replicas', '--heartbeat-only', stdout=StringIO())
+        self.assertEqual(ReplicaHeartbeat.objects.count(), 1)
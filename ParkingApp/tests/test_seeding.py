@@ -0,0 +1,88 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import seeding
+from ..login import login_cache
+from ..models import *
+from ..pricing import pricing_engine
+
+
+class SeedingTest(TestCase):
+    options = dict(owners=2, floors=2, slots=3, users=5, rules=2, bookings=6, days=10, start=date(2030, 1, 1), seed=3)
+
+    def rows(self):
+        return {
+            'bookings': list(Booking.objects.order_by('pk').values_list(
+                'parking_slot__slot_number', 'parking_slot__floor__floor_number', 'booking_start_date', 'booking_end_date', 'price',
+            )),
+            'rules': list(ParkingSlotRules.objects.order_by('pk').values_list('date_start_rule', 'date_end_rule', 'price')),
+            'slots': list(ParkingSlot.objects.order_by('pk').values_list('slot_number', 'has_charger', 'standard_price')),
+        }
+
+    def test_generate(self):
+        created = seeding.generate(**self.options)
+        self.assertEqual(created['Park'], 2)
+        self.assertEqual(ParkingSlot.objects.count(), 12)
+        self.assertEqual(Users.objects.count(), 5)
+        self.assertEqual(ParkingSlotRules.objects.count(), 24)
+        self.assertEqual(Booking.objects.count(), created['Booking'])
+        self.assertTrue(0 < created['Booking'] <= 72)
+
+        for slot in ParkingSlot.objects.all():
+            periods = list(slot.booking_set.order_by('booking_start_date').values_list('booking_start_date', 'booking_end_date'))
+            for (_, end), (start, _) in zip(periods, periods[1:]):
+                self.assertLessEqual(end, start)
+        self.assertEqual(ParkDetails.objects.filter(geohash='').count(), 0)
+        # Prices are rates, as the API would charge them
+        pricing_engine.clear()
+        self.addCleanup(pricing_engine.clear)
+        for booking in Booking.objects.all():
+            quote = pricing_engine.quote(booking.parking_slot_id, booking.booking_start_date, booking.booking_end_date)
+            self.assertEqual(booking.price, quote)
+        self.assertTrue(Booking.objects.exclude(price__in=seeding.STANDARD_PRICES).exists())
+        # Occupancy counters were reconciled
+        self.assertEqual(sum(Occupancy.objects.filter(floor__isnull=True).values_list('total', flat=True)), 12)
+
+    def test_same_seed_same_rows(self):
+        seeding.generate(**self.options)
+        first = self.rows()
+        ParkOwner.objects.all().delete()
+        Credentials.objects.all().delete()
+        seeding.generate(**self.options)
+        self.assertEqual(self.rows(), first)
+
+    def test_accounts_can_log_in(self):
+        seeding.generate(**self.options)
+        login_cache.clear()
+        for email in ('user0@seed.local', 'owner1@seed.local'):
+            response = APIClient().post(reverse('login'), {'email': email, 'password': seeding.DEFAULT_PASSWORD}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_seeding_twice(self):
+        seeding.generate(**self.options)
+        with self.assertRaisesMessage(ValueError, 'already has seed accounts'):
+            seeding.generate(**self.options)
+        with self.assertRaisesMessage(ValueError, 'already has seed accounts'):
+            seeding.create_users(1, None)
+        self.assertEqual(ParkOwner.objects.count(), 2)
+
+        seeding.generate(**dict(self.options, prefix='again-'))
+        self.assertEqual(Credentials.objects.filter(email='again-user0@seed.local').count(), 1)
+        self.assertEqual(Credentials.objects.filter(email='user0@seed.local').count(), 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('seed_data', '--owners=1', '--floors=1', '--slots=2', '--users=1', '--start=2030-01-01', stdout=out)
+        self.assertIn('1 Park, 1 Floor, 2 ParkingSlot', out.getvalue())
+        self.assertEqual(ParkingSlot.objects.count(), 2)
+
+        with self.assertRaisesMessage(CommandError, 'another prefix'):
+            call_command('seed_data', '--owners=1', '--users=1', stdout=StringIO())
+        call_command('seed_data', '--owners=1', '--floors=1', '--slots=2', '--users=1', '--prefix=b', stdout=StringIO())
+        self.assertTrue(ParkOwner.objects.filter(email='bowner0@seed.local').exists())
@@ -1,12 +1,20 @@
 from django.urls import reverse
-from django.test import TestCase
+from django.db.models import Q
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from ..serializers import *
 from ..models import *
+from ..utils import parse_iso_datetime
+from ..intervals import booking_index
+from ..bitmaps import occupancy_bitmaps
+from ..pricing import pricing_engine
+from ..login import login_cache
 from datetime import datetime
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
 import json
+from unittest import mock
 
 
 class ParkOwnerAPITest(TestCase):
@@ -29,7 +37,7 @@ class ParkOwnerAPITest(TestCase):
     def test_get_park_owner_list(self):
         response = self.client.get(self.list_create_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), ParkOwner.objects.count())
+        self.assertEqual(len(response.data['results']), ParkOwner.objects.count())
 
     def test_get_park_owner_detail(self):
         response = self.client.get(self.detail_url)
@@ -95,7 +103,7 @@ class ParkAPITest(TestCase):
     def test_get_park_list(self):
         response = self.client.get(self.list_create_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), Park.objects.count())
+        self.assertEqual(len(response.data['results']), Park.objects.count())
 
     def test_get_park_detail(self):
         park = Park.objects.create(**self.park_data)
@@ -147,7 +155,7 @@ class ParkDetailsAPITest(TestCase):
     def test_get_park_details_list(self):
         response = self.client.get(self.list_create_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), ParkDetails.objects.count())
+        self.assertEqual(len(response.data['results']), ParkDetails.objects.count())
 
     def test_get_park_details_detail(self):
         response = self.client.get(self.detail_url)
@@ -172,6 +180,57 @@ class ParkDetailsAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(ParkDetails.objects.count(), 0)
         
+class ParkNearbyAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('park-nearby')
+        self.parks = {}
+        for name, latitude, longitude in [
+            ('center', 44.4268, 26.1025),
+            ('near', 44.4350, 26.1100),
+            ('far', 44.5000, 26.2000),
+            ('other city', 46.7712, 23.6236),
+        ]:
+            details = ParkDetails.objects.create(address=name, latitude=latitude, longitude=longitude)
+            owner = ParkOwner.objects.create(first_name=name, last_name='Owner', email=f'{len(self.parks)}@example.com', password='password')
+            self.parks[name] = Park.objects.create(park_owner=owner, park_details=details, total_spots=1, no_floors=1)
+
+    def test_geohash_maintained_on_save(self):
+        details = self.parks['center'].park_details
+        self.assertEqual(len(details.geohash), 9)
+        self.assertTrue(details.geohash.startswith('sxfs'))
+        details.latitude = 46.7712
+        details.longitude = 23.6236
+        details.save()
+        details.refresh_from_db()
+        self.assertEqual(details.geohash, self.parks['other city'].park_details.geohash)
+
+    def test_nearby_ranked_by_distance(self):
+        response = self.client.get(self.url, data={'lat': 44.4268, 'lon': 26.1025, 'radius': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['address'] for item in response.data], ['center', 'near'])
+        self.assertEqual(response.data[0]['distance_km'], 0)
+        self.assertEqual(response.data[1]['park'], self.parks['near'].pk)
+
+    def test_nearby_radius_and_limit(self):
+        response = self.client.get(self.url, data={'lat': 44.4268, 'lon': 26.1025, 'radius': 20, 'limit': 2})
+        self.assertEqual([item['address'] for item in response.data], ['center', 'near'])
+        response = self.client.get(self.url, data={'lat': 44.4268, 'lon': 26.1025, 'radius': 20})
+        self.assertEqual([item['address'] for item in response.data], ['center', 'near', 'far'])
+
+    def test_nearby_with_free_slots(self):
+        floor = Floor.objects.create(park=self.parks['near'], floor_number=0)
+        ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=False)
+        ParkingSlot.objects.create(floor=floor, slot_number=2, has_charger=False)
+        response = self.client.get(self.url, data={'lat': 44.4268, 'lon': 26.1025, 'radius': 2, 'with_free_slots': 'true'})
+        self.assertEqual([item['free_slots'] for item in response.data], [0, 2])
+
+    def test_nearby_invalid_params(self):
+        response = self.client.get(self.url, data={'lat': 44.4268})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, data={'lat': 144.4268, 'lon': 26.1025})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
 class CredentialsAPITest(TestCase):
     def setUp(self):
         self.credentials_data = {
@@ -194,7 +253,7 @@ class CredentialsAPITest(TestCase):
     def test_get_credentials_list(self):
         response = self.client.get(self.credentials_list_create_url)   
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), Credentials.objects.count())
+        self.assertEqual(len(response.data['results']), Credentials.objects.count())
         
     def test_get_credentials_detail(self):
         response = self.client.get(self.credentials_detail_url)
@@ -212,7 +271,7 @@ class CredentialsAPITest(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.credentials.refresh_from_db()
-        self.assertEqual(self.credentials.password, updated_data['password'])
+        self.assertTrue(check_password(updated_data['password'], self.credentials.password))
 
     def test_delete_credentials(self):
         response = self.client.delete(self.credentials_detail_url)
@@ -255,7 +314,7 @@ class UsersAPITest(TestCase):
     def test_get_users_list(self):
         response = self.client.get(self.users_list_create_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), Park.objects.count())
+        self.assertEqual(len(response.data['results']), Park.objects.count())
 
     def test_get_users_detail(self):
         users = Users.objects.create(**self.users_data)
@@ -329,7 +388,7 @@ class FloorAPITest(TestCase):
     def test_get_floor_list(self):
         response = self.client.get(self.list_create_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), Park.objects.count())
+        self.assertEqual(len(response.data['results']), Park.objects.count())
         
     def test_get_floor_details(self):
         response = self.client.get(self.detail_url)
@@ -445,8 +504,346 @@ class ParkingSlotAPITest(TestCase):
         response = self.client.get(self.parking_slot_available_list_url, data=data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
             
+class BookedSlotsFixture:
+    def setUp(self):
+        self.client = APIClient()
+        park_owner = ParkOwner.objects.create(
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            password='password'
+        )
+        park_details = ParkDetails.objects.create(
+            address='Test Address',
+            latitude=0.0,
+            longitude=0.0
+        )
+        park = Park.objects.create(
+            park_owner=park_owner,
+            park_details=park_details,
+            total_spots=2,
+            no_floors=1
+        )
+        floor = Floor.objects.create(park=park, floor_number=1)
+        self.user = Users.objects.create(
+            credentials=Credentials.objects.create(email='user@example.com', password='userpassword'),
+            first_name='Jane',
+            last_name='Doe',
+            number_plate='ABC123',
+            vehicle_type='Car',
+            verified=True
+        )
+        self.booked_slot = ParkingSlot.objects.create(floor=floor, slot_number=1, has_charger=True)
+        self.free_slot = ParkingSlot.objects.create(floor=floor, slot_number=2, has_charger=False)
+        Booking.objects.create(
+            parking_slot=self.booked_slot,
+            user=self.user,
+            booking_start_date=parse_iso_datetime('2030-01-01T12:00:00.000Z'),
+            booking_end_date=parse_iso_datetime('2030-01-01T14:00:00.000Z'),
+            price=10.0
+        )
+
+    def slot_ids(self, response):
+        return sorted(slot['parking_slot_id'] for slot in response.data['results'])
+
+class ParkingSlotAvailabilityAPITest(BookedSlotsFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('parkingslot-list-available')
+
+    def test_available_now_does_not_write(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.slot_ids(response), [self.booked_slot.pk, self.free_slot.pk])
+        self.assertTrue(all(slot['physical_available'] for slot in response.data['results']))
+        self.assertFalse(ParkingSlot.objects.filter(physical_available=True).exists())
+
+    def test_available_in_window(self):
+        data = {
+            'start': '2030-01-01T13:00:00.000Z',
+            'end': '2030-01-01T15:00:00.000Z'
+        }
+        response = self.client.get(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.slot_ids(response), [self.free_slot.pk])
+
+    def test_available_touching_window(self):
+        data = {
+            'start': '2030-01-01T14:00:00.000Z',
+            'end': '2030-01-01T15:00:00.000Z'
+        }
+        response = self.client.get(self.url, data=data)
+        self.assertEqual(self.slot_ids(response), [self.booked_slot.pk, self.free_slot.pk])
+
+    def test_available_with_charger_filter(self):
+        data = {
+            'has_charger': 'false',
+            'start': '2030-01-01T13:00:00.000Z'
+        }
+        response = self.client.get(self.url, data=data)
+        self.assertEqual(self.slot_ids(response), [self.free_slot.pk])
+
+    def test_available_invalid_window(self):
+        data = {
+            'start': '2030-01-01T15:00:00.000Z',
+            'end': '2030-01-01T13:00:00.000Z'
+        }
+        response = self.client.get(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, data={'start': '2030-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            
+# The fixture books in 2030, keep that inside the bitmaps
+@override_settings(OCCUPANCY_BITMAP_HORIZON_DAYS=3650)
+class ParkingSlotSearchAPITest(BookedSlotsFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        booking_index.clear()
+        occupancy_bitmaps.clear()
+        self.url = reverse('parkingslot-search')
+
+    def search(self, start, end, **filters):
+        data = {'start': start, 'end': end, **filters}
+        response = self.client.get(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return self.slot_ids(response)
+
+    def test_search_requires_window(self):
+        response = self.client.get(self.url, data={'start': '2030-01-01T13:00:00.000Z'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_aligned_window(self):
+        both = [self.booked_slot.pk, self.free_slot.pk]
+        self.assertEqual(self.search('2030-01-01T13:00:00.000Z', '2030-01-01T15:00:00.000Z'), [self.free_slot.pk])
+        self.assertEqual(self.search('2030-01-01T14:00:00.000Z', '2030-01-01T15:00:00.000Z'), both)
+        self.assertEqual(self.search('2030-01-01T10:00:00.000Z', '2030-01-01T12:00:00.000Z'), both)
+
+    def test_search_partial_buckets(self):
+        Booking.objects.create(
+            parking_slot=self.free_slot,
+            user=self.user,
+            booking_start_date=parse_iso_datetime('2030-01-01T15:00:00.000Z'),
+            booking_end_date=parse_iso_datetime('2030-01-01T15:05:00.000Z'),
+            price=10.0
+        )
+        self.assertEqual(self.search('2030-01-01T15:05:00.000Z', '2030-01-01T15:10:00.000Z'), [self.booked_slot.pk, self.free_slot.pk])
+        self.assertEqual(self.search('2030-01-01T15:04:00.000Z', '2030-01-01T15:10:00.000Z'), [self.booked_slot.pk])
+        self.assertEqual(self.search('2030-01-01T13:59:00.000Z', '2030-01-01T13:59:00.000Z'), [self.free_slot.pk])
+
+    def test_search_filters(self):
+        window = ('2030-01-01T15:00:00.000Z', '2030-01-01T16:00:00.000Z')
+        self.assertEqual(self.search(*window, has_charger='true'), [self.booked_slot.pk])
+        self.assertEqual(self.search(*window, park=self.free_slot.floor.park_id, floor=self.free_slot.floor_id), [self.booked_slot.pk, self.free_slot.pk])
+        self.assertEqual(self.search(*window, park=self.free_slot.floor.park_id + 1), [])
+
+    def test_search_beyond_the_horizon(self):
+        # Far future bookings and windows are checked against the intervals,
+        # the bitmaps stay within the horizon
+        Booking.objects.create(
+            parking_slot=self.free_slot,
+            user=self.user,
+            booking_start_date=parse_iso_datetime('2999-01-01T10:00:00.000Z'),
+            booking_end_date=parse_iso_datetime('2999-01-01T12:00:00.000Z'),
+            price=10.0
+        )
+        self.assertEqual(self.search('2999-01-01T11:00:00.000Z', '2999-01-01T13:00:00.000Z'), [self.booked_slot.pk])
+        self.assertEqual(self.search('2999-01-01T12:00:00.000Z', '2999-01-01T13:00:00.000Z'), [self.booked_slot.pk, self.free_slot.pk])
+        self.assertEqual(self.search('2030-01-01T13:00:00.000Z', '2030-01-01T15:00:00.000Z'), [self.free_slot.pk])
+        bits = occupancy_bitmaps._bitmaps[self.free_slot.pk][3]
+        self.assertLessEqual(bits.bit_length(), (3650 + 2) * 24 * 4)
+
+    def test_search_sees_new_bookings(self):
+        window = ('2030-01-01T15:00:00.000Z', '2030-01-01T16:00:00.000Z')
+        self.assertEqual(self.search(*window), [self.booked_slot.pk, self.free_slot.pk])
+        Booking.objects.create(
+            parking_slot=self.free_slot,
+            user=self.user,
+            booking_start_date=parse_iso_datetime('2030-01-01T15:30:00.000Z'),
+            booking_end_date=parse_iso_datetime('2030-01-01T17:00:00.000Z'),
+            price=10.0
+        )
+        self.assertEqual(self.search(*window), [self.booked_slot.pk])
+
+class BookingBulkCreateAPITest(BookedSlotsFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        booking_index.clear()
+        self.url = reverse('booking-bulk-create')
+
+    def item(self, slot, start, end, **extra):
+        return {
+            'user': self.user.pk,
+            'parking_slot': slot.pk,
+            'booking_start_date': start,
+            'booking_end_date': end,
+            **extra
+        }
+
+    def test_bulk_create(self):
+        items = [
+            self.item(self.free_slot, '2030-01-01T12:00:00.000Z', '2030-01-01T14:00:00.000Z'),
+            self.item(self.booked_slot, '2030-01-01T14:00:00.000Z', '2030-01-01T16:00:00.000Z'),
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertEqual(response.data['results'][1]['booking']['price'], 10.0)
+        self.assertTrue(booking_index.overlaps(self.free_slot.pk, parse_iso_datetime('2030-01-01T13:00:00.000Z'), parse_iso_datetime('2030-01-01T13:00:00.000Z')))
+
+    def test_bulk_create_reports_each_item(self):
+        items = [
+            self.item(self.booked_slot, '2030-01-01T13:00:00.000Z', '2030-01-01T15:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-01T12:00:00.000Z', '2030-01-01T14:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-01T13:00:00.000Z', '2030-01-01T15:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-01T14:00:00.000Z', '2030-01-01T15:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-01', '2030-01-01T15:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-01T16:00:00.000Z', '2030-01-01T15:00:00.000Z'),
+            self.item(self.free_slot, '2030-01-02T14:00:00.000Z', '2030-01-02T15:00:00.000Z', user=999),
+            {'parking_slot': self.free_slot.pk},
+        ]
+        response = self.client.post(self.url, {'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data['results']], [400, 201, 400, 201, 400, 400, 400, 400])
+        self.assertEqual(Booking.objects.filter(parking_slot=self.free_slot).count(), 2)
+
+    def test_bulk_create_query_count(self):
+        items = [
+            self.item(self.free_slot, f'2030-01-0{day}T12:00:00.000Z', f'2030-01-0{day}T14:00:00.000Z')
+            for day in range(1, 10)
+        ]
+        # users, slots, rules, savepoint, conflicts, insert, release
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.data['created'], 9)
+
+    def test_bulk_create_rejects_bad_payload(self):
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, {'user': 1}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+class ParkLayoutAPITest(BookedSlotsFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        pricing_engine.clear()
+        self.park = self.booked_slot.floor.park
+        self.url = reverse('park-layout', args=[self.park.pk])
+        ParkingSlotRules.objects.create(
+            parking_slot=self.free_slot,
+            date_start_rule=parse_iso_datetime('2030-01-01T00:00:00.000Z'),
+            date_end_rule=parse_iso_datetime('2030-01-02T00:00:00.000Z'),
+            price=25.0
+        )
+
+    def get_layout(self, at='2030-01-01T13:00:00.000Z'):
+        pricing_engine.clear()
+        # park + details, floors, slots, slot prices, rules
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {'at': at})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_layout(self):
+        data = self.get_layout()
+        self.assertEqual(data['park_id'], self.park.pk)
+        self.assertEqual(data['park_details']['address'], 'Test Address')
+        self.assertEqual(len(data['floors']), 1)
+        slots = {slot['parking_slot_id']: slot for slot in data['floors'][0]['slots']}
+        self.assertTrue(slots[self.booked_slot.pk]['occupied'])
+        self.assertFalse(slots[self.free_slot.pk]['occupied'])
+        self.assertEqual(slots[self.booked_slot.pk]['current_price'], 10.0)
+        self.assertEqual(slots[self.free_slot.pk]['current_price'], 25.0)
+
+    def test_layout_at_other_instant(self):
+        data = self.get_layout('2030-01-02T13:00:00.000Z')
+        slots = data['floors'][0]['slots']
+        self.assertFalse(any(slot['occupied'] for slot in slots))
+        self.assertEqual([slot['current_price'] for slot in slots], [10.0, 10.0])
+
+    def test_layout_query_count_does_not_grow(self):
+        for number in range(2, 6):
+            floor = Floor.objects.create(park=self.park, floor_number=number)
+            for slot_number in range(10):
+                ParkingSlot.objects.create(floor=floor, slot_number=slot_number, has_charger=False)
+        data = self.get_layout()
+        self.assertEqual([floor['floor_number'] for floor in data['floors']], [1, 2, 3, 4, 5])
+        self.assertEqual(sum(len(floor['slots']) for floor in data['floors']), 42)
+
+    def test_layout_errors(self):
+        self.assertEqual(self.client.get(reverse('park-layout', args=[999])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.url, {'at': '2030-01-01'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class KeysetPaginationAPITest(BookedSlotsFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        floor = self.free_slot.floor
+        for number in range(3, 8):
+            ParkingSlot.objects.create(floor=floor, slot_number=number, has_charger=False)
+
+    def walk(self, url, params):
+        ids, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [slot['parking_slot_id'] for slot in response.data['results']]
+            pages += 1
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_list_pages_by_primary_key(self):
+        ids, pages = self.walk(reverse('parkingslot-list-create'), {'page_size': 3})
+        self.assertEqual(ids, list(ParkingSlot.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual(pages, 3)
+
+    def test_page_does_not_shift_on_delete(self):
+        url = reverse('parkingslot-list-create')
+        response = self.client.get(url, {'page_size': 3})
+        first_page = [slot['parking_slot_id'] for slot in response.data['results']]
+        ParkingSlot.objects.filter(pk=first_page[0]).delete()
+        response = self.client.get(response.data['next'])
+        self.assertTrue(all(slot['parking_slot_id'] > first_page[-1] for slot in response.data['results']))
+
+    def test_available_and_search_are_paginated(self):
+        ids, pages = self.walk(reverse('parkingslot-list-available'), {'page_size': 2})
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(pages, 4)
+        ids, pages = self.walk(reverse('parkingslot-search'), {
+            'start': '2030-01-01T13:00:00.000Z',
+            'end': '2030-01-01T15:00:00.000Z',
+            'page_size': 2
+        })
+        self.assertNotIn(self.booked_slot.pk, ids)
+        self.assertEqual(len(ids), 6)
+
+    def test_bookings_page_in_start_order(self):
+        for day in (5, 3, 4):
+            Booking.objects.create(
+                parking_slot=self.free_slot,
+                user=self.user,
+                booking_start_date=parse_iso_datetime(f'2030-01-0{day}T12:00:00.000Z'),
+                booking_end_date=parse_iso_datetime(f'2030-01-0{day}T14:00:00.000Z'),
+                price=10.0
+            )
+        response = self.client.get(reverse('booking-list'), {'page_size': 2})
+        starts = [booking['booking_start_date'] for booking in response.data['results']]
+        response = self.client.get(response.data['next'])
+        starts += [booking['booking_start_date'] for booking in response.data['results']]
+        self.assertEqual(len(starts), 4)
+        self.assertEqual(starts, sorted(starts))
+
+    def test_booking_pages_read_an_index(self):
+        # Pages are read in index order, not sorted from a full scan
+        start = parse_iso_datetime('2030-01-03T12:00:00.000Z')
+        bookings = Booking.objects.order_by('booking_start_date', 'pk')
+        for page in (bookings, bookings.filter(Q(booking_start_date__gt=start) | Q(booking_start_date=start, pk__gt=1))):
+            plan = page[:10].explain()
+            self.assertIn('booking_start_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
 class BookingParkingSlotRulesAPITest(TestCase):
     def setUp(self):
+        booking_index.clear()
         self.park_owner = ParkOwner.objects.create(
             first_name="John", 
             last_name="Doe", 
@@ -523,6 +920,26 @@ class BookingParkingSlotRulesAPITest(TestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
                 
+    def test_create_conflicting_booking(self):
+        url = reverse('booking-list')
+        data = {
+            'user': self.user.pk,
+            'parking_slot': self.parking_slot.pk,
+            'booking_start_date': "2023-01-03T12:00:00.000Z",
+            'booking_end_date': "2023-01-03T14:00:00.000Z",
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data['booking_start_date'] = "2023-01-03T13:00:00.000Z"
+        data['booking_end_date'] = "2023-01-03T15:00:00.000Z"
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data['booking_start_date'] = "2023-01-03T14:00:00.000Z"
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                
     def test_create_missing_args_booking(self):
         url = reverse('booking-list')
         data = {
@@ -758,6 +1175,7 @@ class LoginAPITest(TestCase):
             email  = "owner@example.com",
             password = "password123"
         )
+        login_cache.clear()
         
     def test_login_with_valid_credentials(self):
         data = {
@@ -788,6 +1206,69 @@ class LoginAPITest(TestCase):
             'password': "securepassword"
         }
         response = self.client.post(self.url, data, format='json', content_type='application/json')
+
+    def login(self, email, password):
+        return self.client.post(self.url, {'email': email, 'password': password}, content_type='application/json')
+
+    def test_login_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login(self.valid_email, 'wrongpassword')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertNumQueries(1):
+            response = self.login("owner@example.com", "password123")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], "John")
+        self.assertNotIn('password', response.data)
+
+    def test_passwords_are_hashed(self):
+        credentials = Credentials.objects.get(email=self.valid_email)
+        self.assertNotEqual(credentials.password, self.valid_password)
+        self.assertTrue(check_password(self.valid_password, credentials.password))
+        credentials.save()
+        self.assertTrue(check_password(self.valid_password, Credentials.objects.get(pk=credentials.pk).password))
+
+    def test_client_cannot_choose_the_hash(self):
+        # A hash sent by a client is a password like any other
+        chosen = make_password('secret', salt='chosensalt', hasher='pbkdf2_sha256')
+        response = self.client.post(reverse('credentials-list-create'), {'email': 'new@example.com', 'password': chosen}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stored = Credentials.objects.get(email='new@example.com').password
+        self.assertNotEqual(stored, chosen)
+        self.assertTrue(check_password(chosen, stored))
+
+        owner = ParkOwner.objects.get(email='owner@example.com')
+        url = reverse('park-owner-detail', args=[owner.pk])
+        data = {'first_name': 'John', 'last_name': 'Doe', 'email': 'owner@example.com', 'password': chosen}
+        self.assertEqual(self.client.put(url, data, content_type='application/json').status_code, status.HTTP_200_OK)
+        self.assertTrue(check_password(chosen, ParkOwner.objects.get(pk=owner.pk).password))
+
+    def test_repeated_login_skips_hasher(self):
+        with mock.patch('ParkingApp.login.check_password', wraps=check_password) as checked:
+            self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_200_OK)
+            self.assertEqual(checked.call_count, 1)
+            self.assertEqual(self.login(self.valid_email, 'wrongpassword').status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(checked.call_count, 2)
+
+    def test_password_change_invalidates_cache(self):
+        self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_200_OK)
+        credentials = Credentials.objects.get(email=self.valid_email)
+        credentials.password = 'changedpassword'
+        credentials.save()
+        self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login(self.valid_email, 'changedpassword').status_code, status.HTTP_200_OK)
+
+    def test_plain_text_password_is_upgraded(self):
+        Credentials.objects.filter(email=self.valid_email).update(password=self.valid_password)
+        self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_200_OK)
+        stored = Credentials.objects.get(email=self.valid_email).password
+        self.assertTrue(stored.startswith('pbkdf2_sha256$'))
+
+    def test_hash_cost_change_rehashes(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=1100):
+            self.assertEqual(self.login(self.valid_email, self.valid_password).status_code, status.HTTP_200_OK)
+        stored = Credentials.objects.get(email=self.valid_email).password
+        self.assertEqual(stored.split('$')[1], '1100')
         
     
 
@@ -7,10 +7,12 @@ from .views import (
     ParkOwnerListCreateView, ParkOwnerDetailView,
     UsersListCreateView, UsersDetailView,
     CredentialsListCreateView, CredentialsDetailView,
-    ParkListCreateView, ParkDetailView,
+    ParkListCreateView, ParkDetailView, ParkProvisionView,
     ParkDetailsListCreateView, ParkDetailsDetailView, ParkingSlotRulesByPkOnlyView,
     FloorListCreateView, FloorDetailView,
-    ParkingSlotListCreateView, ParkingSlotDetailView, ParkingSlotAvailableListView, LoginView
+    ParkingSlotListCreateView, ParkingSlotDetailView, ParkingSlotAvailableListView, LoginView,
+    ParkingSlotSearchView, SlotEventStreamView, ParkNearbyView, ParkLayoutView, ParkOccupancyView, TokenRevokeView, PriceQuoteView, BookingBulkCreateView, BookingExportView, EntityCacheStatsView,
+    AsyncParkingSlotAvailableListView, AsyncParkLayoutView, AsyncBookingDetailView, AsyncParkingSlotRulesByPkOnlyView
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -25,6 +27,7 @@ router.register(r'bookings', BookingViewSet, basename='booking')
 urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
     path('login/', LoginView.as_view(), name='login'),
     path('park-owner/', ParkOwnerListCreateView.as_view(), name='park-owner-list-create'),
     path('park-owner/<int:pk>/', ParkOwnerDetailView.as_view(), name='park-owner-detail'),
@@ -34,6 +37,10 @@ urlpatterns = [
     path('credentials/<int:pk>/', CredentialsDetailView.as_view(), name='credentials-detail'),
     path('park/', ParkListCreateView.as_view(), name='park-list-create'),
     path('park/<int:pk>/', ParkDetailView.as_view(), name='park-detail'),
+    path('park/provision/', ParkProvisionView.as_view(), name='park-provision'),
+    path('park/<int:pk>/occupancy/', ParkOccupancyView.as_view(), name='park-occupancy'),
+    path('park/<int:pk>/layout/', ParkLayoutView.as_view(), name='park-layout'),
+    path('parks/nearby/', ParkNearbyView.as_view(), name='park-nearby'),
     path('park-details/', ParkDetailsListCreateView.as_view(), name='park-details-list-create'),
     path('park-details/<int:pk>/', ParkDetailsDetailView.as_view(), name='park-details-detail'),
     path('floors/', FloorListCreateView.as_view(), name='floor-list-create'),
@@ -41,9 +48,20 @@ urlpatterns = [
     path('parking-slots/', ParkingSlotListCreateView.as_view(), name='parkingslot-list-create'),
     path('parking-slots/<int:pk>/', ParkingSlotDetailView.as_view(), name='parkingslot-detail'),
     path('parking-slots/available/', ParkingSlotAvailableListView.as_view(), name='parkingslot-list-available'),
+    path('parking-slots/stream/', SlotEventStreamView.as_view(), name='parkingslot-stream'),
+    path('parking-slots/search/', ParkingSlotSearchView.as_view(), name='parkingslot-search'),
     path('parking-slot-rules/', ParkingSlotRulesListCreateView.as_view(), name='parkingslotrules-list-create'),
     path('parking-slot-rules/<int:pk>/', ParkingSlotRulesUpdateView.as_view(), name='parkingslotrules-update'),
     path('parking-slot-rules/by-pk/<int:pk>/', ParkingSlotRulesByPkOnlyView.as_view(), name='parkingslotrules-detail-by-pk'),
+    path('price-quote/', PriceQuoteView.as_view(), name='price-quote'),
     path('bookings/', BookingViewSet.as_view(), name='booking-list'),
+    path('bookings/bulk/', BookingBulkCreateView.as_view(), name='booking-bulk-create'),
+    path('bookings/export/', BookingExportView.as_view(), name='booking-export'),
     path('bookings/<int:pk>/', BookingViewSet.as_view(), name='booking-detail'),
+    path('cache/stats/', EntityCacheStatsView.as_view(), name='cache-stats'),
+    # Async versions of the read endpoints above, for ASGI servers
+    path('async/parking-slots/available/', AsyncParkingSlotAvailableListView.as_view(), name='async-parkingslot-list-available'),
+    path('async/park/<int:pk>/layout/', AsyncParkLayoutView.as_view(), name='async-park-layout'),
+    path('async/bookings/<int:pk>/', AsyncBookingDetailView.as_view(), name='async-booking-detail'),
+    path('async/parking-slot-rules/by-pk/<int:pk>/', AsyncParkingSlotRulesByPkOnlyView.as_view(), name='async-parkingslotrules-detail-by-pk'),
 ]
@@ -1,2 +1,31 @@
 from datetime import datetime
 
+from django.utils import timezone
+
+ISO_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+ISO_DATE_ERROR = 'Invalid date format. Please use ISO format (e.g., 2023-01-01T00:00:00.000Z).'
+
+
+def parse_iso_datetime(value):
+    # Same format the booking and rule endpoints accept. The parsed value is
+    # made aware in the default time zone, which is what Django does with the
+    # naive datetimes those endpoints save.
+    parsed = datetime.strptime(value, ISO_DATE_FORMAT)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 't', 'true', 'yes', 'on')
+
+
+def request_param(request, name, default=None):
+    # GET parameters normally come in the query string, but some clients send
+    # them as a JSON body, so fall back to request.data.
+    value = request.query_params.get(name, None)
+    if value is None and hasattr(request.data, 'get'):
+        value = request.data.get(name, None)
+    return default if value is None else value
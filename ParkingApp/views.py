@@ -1,17 +1,44 @@
 # views.py
+import json
+import time
+from collections import Counter
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.conf import settings
+from rest_framework.exceptions import APIException
 from rest_framework.parsers import JSONParser
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from rest_framework import status
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
 from django.utils import timezone
 from rest_framework import generics
 from datetime import datetime
 from rest_framework import viewsets
-from .models import ParkOwner, Users, Credentials, Park, ParkDetails, Floor, ParkingSlot, ParkingSlotRules, Booking
-from .serializers import ParkOwnerSerializer, UsersSerializer, CredentialsSerializer, ParkSerializer, ParkDetailsSerializer, FloorSerializer, ParkingSlotSerializer, ParkingSlotRulesSerializer, BookingSerializer
+from .models import ParkOwner, Users, Credentials, Park, ParkDetails, Floor, ParkingSlot, ParkingSlotRules, Booking, BookingHistory
+from .serializers import ParkOwnerSerializer, UsersSerializer, CredentialsSerializer, ParkSerializer, ParkDetailsSerializer, FloorSerializer, ParkingSlotSerializer, ParkingSlotRulesSerializer, BookingSerializer, AvailableParkingSlotSerializer, ParkLayoutSerializer
+from .availability import available_slots, overlapping_bookings_q
+from .locking import retry_on_lock, slot_write_lock
+from .pagination import BookingKeysetPagination, KeysetPagination
+from .intervals import booking_index, to_timestamp
+from .bitmaps import occupancy_bitmaps
+from . import geo
+from .pricing import pricing_engine
+from . import events, export, metrics, occupancy, provisioning, routers
+from .bulk import create_bookings
+from .caching import CachedObjectMixin, ConditionalGetMixin, entity_cache, if_none_match, table_etag
+from .fastpath import FastJSONRenderer, FastListMixin, fast_serializer
+from .login import authenticate
+from .authentication import revoked_tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import UntypedToken
+from .utils import ISO_DATE_ERROR, parse_iso_datetime, parse_bool, request_param
 
 class LoginView(generics.CreateAPIView):
     serializer_class = CredentialsSerializer  # Assuming you have a serializer for Credentials model
@@ -23,22 +50,32 @@ class LoginView(generics.CreateAPIView):
         if not email or not password:
             return Response({'error': 'Both email and password are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            credentials = Credentials.objects.get(email=email, password=password)
-            serializer = CredentialsSerializer(credentials)
+        # One indexed query over both account types, then the password check
+        account = authenticate(email, password)
+        if isinstance(account, Credentials):
+            serializer = CredentialsSerializer(account)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except Credentials.DoesNotExist:
-            pass
-
-        try:
-            park_owner = ParkOwner.objects.get(email=email, password=password)
-            serializer = ParkOwnerSerializer(park_owner)
+        if isinstance(account, ParkOwner):
+            serializer = ParkOwnerSerializer(account)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except ParkOwner.DoesNotExist:
-            pass
 
         return Response({'error': 'Bad credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+class TokenRevokeView(generics.GenericAPIView):
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        raw_token = request.data.get('token', None)
+        if not raw_token:
+            return Response({'error': 'token is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            token = UntypedToken(raw_token)
+        except TokenError:
+            return Response({'error': 'Invalid token.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        revoked_tokens.revoke(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class ParkOwnerListCreateView(generics.ListCreateAPIView):
     queryset = ParkOwner.objects.all()
     serializer_class = ParkOwnerSerializer
@@ -63,73 +100,271 @@ class CredentialsDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Credentials.objects.all()
     serializer_class = CredentialsSerializer
 
-class ParkListCreateView(generics.ListCreateAPIView):
+class ParkListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Park.objects.all()
     serializer_class = ParkSerializer
 
-class ParkDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ParkDetailView(ConditionalGetMixin, CachedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Park.objects.all()
     serializer_class = ParkSerializer
 
-class ParkDetailsListCreateView(generics.ListCreateAPIView):
+def park_layout_queryset(at):
+    # park + details, floors, slots with their occupancy at the instant at:
+    # three queries whatever the size of the park
+    busy = Booking.objects.filter(overlapping_bookings_q(at, at), parking_slot=OuterRef('pk'))
+    slots = ParkingSlot.objects.annotate(occupied=Exists(busy)).order_by('slot_number', 'pk')
+    return Park.objects.select_related('park_details').prefetch_related(
+        Prefetch('floor_set', queryset=Floor.objects.order_by('floor_number', 'pk')),
+        Prefetch('floor_set__parkingslot_set', queryset=slots),
+    )
+
+def set_layout_prices(park, at):
+    # Active rule prices come from the compiled timelines (at most two
+    # queries for the whole park, none when they are already cached)
+    slots = [slot for floor in park.floor_set.all() for slot in floor.parkingslot_set.all()]
+    timelines = pricing_engine.timelines([slot.pk for slot in slots])
+    moment = to_timestamp(at)
+    for slot in slots:
+        timeline = timelines.get(slot.pk)
+        slot.current_price = timeline.rate_at(moment) if timeline else float(slot.standard_price)
+
+class ParkLayoutView(generics.RetrieveAPIView):
+    serializer_class = ParkLayoutSerializer
+
+    def get_queryset(self):
+        return park_layout_queryset(self.at)
+
+    def retrieve(self, request, *args, **kwargs):
+        at_str = request_param(request, 'at')
+        try:
+            self.at = parse_iso_datetime(at_str) if at_str else timezone.now()
+        except ValueError:
+            return Response({'error': ISO_DATE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        park = self.get_object()
+        set_layout_prices(park, self.at)
+        serializer = self.get_serializer(park)
+        return Response(serializer.data)
+
+class ParkOccupancyView(generics.GenericAPIView):
+    queryset = Park.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        # Materialized counters, see occupancy.py. A poll is one read-only
+        # query unless the counters are older than OCCUPANCY_MAX_LAG seconds.
+        rows = occupancy.current(kwargs['pk'])
+        if not rows:
+            raise Http404('No Park matches the given query.')
+
+        def counters(row):
+            return {
+                'total': row.total,
+                'free': row.free,
+                'free_with_charger': row.free_with_charger,
+                'booked': row.booked,
+            }
+
+        park_row, floor_rows = rows[0], rows[1:]
+        return Response({
+            'park': park_row.park_id,
+            'as_of': park_row.as_of,
+            **counters(park_row),
+            'floors': [{'floor': row.floor_id, **counters(row)} for row in floor_rows],
+        })
+
+class ParkDetailsListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = ParkDetails.objects.all()
     serializer_class = ParkDetailsSerializer
 
-class ParkDetailsDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ParkDetailsDetailView(ConditionalGetMixin, CachedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ParkDetails.objects.all()
     serializer_class = ParkDetailsSerializer
 
-class FloorListCreateView(generics.ListCreateAPIView):
+class ParkNearbyView(generics.ListAPIView):
+    queryset = ParkDetails.objects.all()
+    serializer_class = ParkDetailsSerializer
+    default_radius_km = 5
+    default_limit = 20
+    max_limit = 100
+
+    def list(self, request, *args, **kwargs):
+        try:
+            latitude = float(request_param(request, 'lat'))
+            longitude = float(request_param(request, 'lon'))
+            radius = float(request_param(request, 'radius', self.default_radius_km))
+            limit = int(request_param(request, 'limit', self.default_limit))
+        except (TypeError, ValueError):
+            return Response({'error': 'lat and lon are required; radius (km) and limit must be numbers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius <= 0 or limit <= 0:
+            return Response({'error': 'Coordinates, radius or limit out of range.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Prefilter on the geohash cells covering the bounding box
+        box = geo.bounding_box(latitude, longitude, radius)
+        cells = Q()
+        for prefix in geo.covering_prefixes(*box):
+            cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+        candidates = self.get_queryset().filter(cells).select_related('park')
+
+        # Exact box check and haversine rank over the candidates only
+        ranked = []
+        for details in candidates:
+            park_latitude, park_longitude = float(details.latitude), float(details.longitude)
+            if not geo.in_box(park_latitude, park_longitude, box):
+                continue
+            distance = geo.haversine_km(latitude, longitude, park_latitude, park_longitude)
+            if distance <= radius:
+                ranked.append((distance, details.pk, details))
+        ranked.sort(key=lambda item: item[:2])
+        ranked = ranked[:min(limit, self.max_limit)]
+
+        parks = {details.pk: getattr(details, 'park', None) for _, _, details in ranked}
+
+        free_slots = None
+        if parse_bool(request_param(request, 'with_free_slots', False)):
+            park_ids = [park.pk for park in parks.values() if park is not None]
+            counts = available_slots(queryset=ParkingSlot.objects.filter(floor__park__in=park_ids))
+            counts = counts.values('floor__park').annotate(free=Count('pk')).order_by()
+            free_slots = {row['floor__park']: row['free'] for row in counts}
+
+        results = []
+        for distance, _, details in ranked:
+            park = parks[details.pk]
+            item = self.get_serializer(details).data
+            item['park'] = park.pk if park is not None else None
+            item['distance_km'] = round(distance, 3)
+            if free_slots is not None:
+                item['free_slots'] = free_slots.get(item['park'], 0)
+            results.append(item)
+
+        return Response(results)
+
+class FloorListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Floor.objects.all()
     serializer_class = FloorSerializer
 
-class FloorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FloorDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Floor.objects.all()
     serializer_class = FloorSerializer
     
-class ParkingSlotListCreateView(generics.ListCreateAPIView):
+class ParkingSlotListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = ParkingSlot.objects.all()
     serializer_class = ParkingSlotSerializer
 
-class ParkingSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ParkingSlotDetailView(ConditionalGetMixin, CachedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ParkingSlot.objects.all()
     serializer_class = ParkingSlotSerializer
 
-class ParkingSlotAvailableListView(generics.ListAPIView):
+def available_slots_query(request, queryset):
+    # Slots of queryset free for the optional start/end window (default now)
+    # and has_charger filter of the request. Returns (queryset, None), or
+    # (None, error) for a 400.
+    start_str = request_param(request, 'start')
+    end_str = request_param(request, 'end')
+
+    try:
+        start = parse_iso_datetime(start_str) if start_str else timezone.now()
+        end = parse_iso_datetime(end_str) if end_str else start
+    except ValueError:
+        return None, ISO_DATE_ERROR
+
+    if end < start:
+        return None, 'end must not be before start.'
+
+    has_charger = request_param(request, 'has_charger')
+    if has_charger is not None:
+        queryset = queryset.filter(has_charger=parse_bool(has_charger))
+
+    # Read-only anti-join against Booking, nothing is written to ParkingSlot
+    return available_slots(start, end, queryset), None
+
+class ParkingSlotAvailableListView(FastListMixin, generics.ListAPIView):
     queryset = ParkingSlot.objects.all()
-    serializer_class = ParkingSlotSerializer
+    serializer_class = AvailableParkingSlotSerializer
 
     def list(self, request, *args, **kwargs):
-        # Get the current date and time
-        current_datetime = timezone.now()
+        queryset, error = available_slots_query(request, self.get_queryset())
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        return self.fast_list_response(queryset)
+    
+class ParkingSlotSearchView(FastListMixin, generics.ListAPIView):
+    queryset = ParkingSlot.objects.all()
+    serializer_class = AvailableParkingSlotSerializer
+
+    def list(self, request, *args, **kwargs):
+        start_str = request_param(request, 'start')
+        end_str = request_param(request, 'end')
+
+        if not start_str or not end_str:
+            return Response({'error': 'Both start and end are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check for active bookings
-        active_bookings = Booking.objects.filter(
-            Q(booking_start_date__lte=current_datetime, booking_end_date__gt=current_datetime) |
-            Q(booking_start_date__gte=current_datetime, booking_end_date__lt=current_datetime)
-        )
+        try:
+            start = parse_iso_datetime(start_str)
+            end = parse_iso_datetime(end_str)
+        except ValueError:
+            return Response({'error': ISO_DATE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get parking slots with active bookings and set physical_available to False
-        parking_slots_with_active_bookings = ParkingSlot.objects.filter(pk__in=active_bookings.values('parking_slot'))
-        parking_slots_with_active_bookings.update(physical_available=False)
+        if end < start:
+            return Response({'error': 'end must not be before start.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
 
-        # Get parking slots without active bookings and set physical_available to True
-        parking_slots_without_active_bookings = ParkingSlot.objects.exclude(pk__in=parking_slots_with_active_bookings)
-        parking_slots_without_active_bookings.update(physical_available=True)
+        park_id = request_param(request, 'park')
+        if park_id is not None:
+            queryset = queryset.filter(floor__park=park_id)
 
-        queryset = ParkingSlot.objects.filter(physical_available=True)
+        floor_id = request_param(request, 'floor')
+        if floor_id is not None:
+            queryset = queryset.filter(floor=floor_id)
 
-        has_charger = request.data.get('has_charger', None)
+        has_charger = request_param(request, 'has_charger')
         if has_charger is not None:
-            queryset = queryset.filter(has_charger=has_charger)
+            queryset = queryset.filter(has_charger=parse_bool(has_charger))
 
-        # Serialize the queryset into a list of dictionaries
-        serializer = ParkingSlotSerializer(queryset, many=True)
-        serialized_data = serializer.data
+        # Filter on the occupancy bitmaps instead of querying Booking, then
+        # read only the requested page of slot rows
+        slot_ids = list(queryset.values_list('pk', flat=True))
+        free = occupancy_bitmaps.free_slot_ids(slot_ids, start, end)
 
-        return Response(serialized_data)
+        return self.fast_list_response(queryset.filter(pk__in=free))
     
-class ParkingSlotRulesListCreateView(generics.ListCreateAPIView):
+class SlotEventStreamView(View):
+    # Server-sent events; needs an ASGI server (see Parking/asgi.py) so idle
+    # streams only cost a queue and a suspended coroutine each
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            topics = [events.park_topic(value) for value in request.GET.getlist('park')]
+            topics += [events.floor_topic(value) for value in request.GET.getlist('floor')]
+        except ValueError:
+            return JsonResponse({'error': 'park and floor must be ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not topics:
+            return JsonResponse({'error': 'At least one park or floor is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(self.stream(topics), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, topics):
+        heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+        # Streams are closed after a while and the browser reconnects, which
+        # also reaps streams whose client went away without us noticing
+        deadline = time.monotonic() + getattr(settings, 'EVENT_STREAM_MAX_SECONDS', 600)
+        with events.event_bus.subscribe(topics) as subscription:
+            yield f'retry: {heartbeat * 1000}\n\n'
+            sequence = 0
+            while time.monotonic() < deadline:
+                event = await subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                sequence += 1
+                yield f'id: {sequence}\nevent: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+class ParkingSlotRulesListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = ParkingSlotRules.objects.all()
     serializer_class = ParkingSlotRulesSerializer
 
@@ -229,7 +464,7 @@ class ParkingSlotRulesUpdateView(generics.RetrieveUpdateDestroyAPIView):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class ParkingSlotRulesByPkOnlyView(generics.RetrieveAPIView):
+class ParkingSlotRulesByPkOnlyView(ConditionalGetMixin, CachedObjectMixin, generics.RetrieveAPIView):
     queryset = ParkingSlotRules.objects.all()
     serializer_class = ParkingSlotRulesSerializer
 
@@ -238,16 +473,82 @@ class ParkingSlotRulesByPkOnlyView(generics.RetrieveAPIView):
             instance = self.get_object()
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
-        except self.DoesNotExist:
+        except Http404:
             return Response(
                 {"error": "No matching rule found for the specified primary key."},
                 status=status.HTTP_404_NOT_FOUND
             )
     
-class BookingViewSet(generics.ListCreateAPIView, generics.RetrieveUpdateDestroyAPIView):
+class PriceQuoteView(generics.GenericAPIView):
+    queryset = ParkingSlot.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        parking_slot_id = request_param(request, 'parking_slot')
+        start_str = request_param(request, 'start')
+        end_str = request_param(request, 'end')
+
+        if not parking_slot_id or not start_str or not end_str:
+            return Response({'error': 'Incomplete data provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            parking_slot_id = int(parking_slot_id)
+        except ValueError:
+            return Response({'error': 'parking_slot must be an id.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = parse_iso_datetime(start_str)
+            end = parse_iso_datetime(end_str)
+        except ValueError:
+            return Response({'error': ISO_DATE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        if end < start:
+            return Response({'error': 'end must not be before start.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            price = pricing_engine.quote(parking_slot_id, start, end)
+        except ParkingSlot.DoesNotExist:
+            raise Http404('No ParkingSlot matches the given query.')
+
+        return Response({
+            'parking_slot': parking_slot_id,
+            'start': start_str,
+            'end': end_str,
+            'price': price,
+        })
+
+def _conflicts(slot_id, start, end, exclude=None):
+    # Bookings of the slot overlapping [start, end) in the database
+    conflicting = Booking.objects.filter(
+        overlapping_bookings_q(timezone.make_aware(start), timezone.make_aware(end)), parking_slot=slot_id,
+    )
+    if exclude is not None:
+        conflicting = conflicting.exclude(pk=exclude)
+    return conflicting.exists()
+
+def _known_conflict(slot_id, start, end, exclude=None):
+    # A miss in the in-memory interval index is the fast path. A hit may be a
+    # booking another worker has since cancelled or moved (the index lags up to
+    # BOOKING_INDEX_TTL seconds), so it is confirmed in the database, and a
+    # stale index is dropped for the slot.
+    if not booking_index.overlaps(slot_id, start, end, exclude=exclude):
+        return False
+    if _conflicts(slot_id, start, end, exclude):
+        return True
+    booking_index.invalidate([slot_id])
+    return False
+
+class BookingViewSet(FastListMixin, generics.ListCreateAPIView, generics.RetrieveUpdateDestroyAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
+    pagination_class = BookingKeysetPagination
+
+    def get_queryset(self):
+        # ?include_archived=true also reads the bookings moved to
+        # BookingArchive, through the read-only BookingHistory view
+        if self.request.method in SAFE_METHODS and parse_bool(request_param(self.request, 'include_archived', False)):
+            return BookingHistory.objects.all()
+        return super().get_queryset()
     
+    @retry_on_lock
     def create(self, request, *args, **kwargs):
         user_id = request.data.get('user', None)
         parking_slot_id = request.data.get('parking_slot', None)
@@ -264,36 +565,17 @@ class BookingViewSet(generics.ListCreateAPIView, generics.RetrieveUpdateDestroyA
         except ValueError:
             return Response({'error': 'Invalid date format. Please use ISO format (e.g., 2023-01-01T00:00:00.000Z).'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check for conflicting rules
-        conflicting_rules = ParkingSlotRules.objects.filter(
-            parking_slot=parking_slot_id,
-            date_start_rule__lt=booking_end_date,
-            date_end_rule__gt=booking_start_date,
-        ).first()
-
-        if conflicting_rules:
-            # Use the price from the conflicting rule
-            price = conflicting_rules.price
-        else:
-            # No conflicting rules, use the standard price from ParkingSlot
-            parking_slot = get_object_or_404(ParkingSlot, pk=parking_slot_id)
-            price = parking_slot.standard_price
-
-        # Check for conflicting bookings
-        conflicting_bookings = Booking.objects.filter(
-            parking_slot=parking_slot_id,
-            booking_start_date__lt=booking_end_date,
-            booking_end_date__gt=booking_start_date,
-        ).exclude(
-            Q(booking_start_date__gte=booking_end_date) | Q(booking_end_date__lte=booking_start_date)
-        )
+        # Price the booking from the slot's compiled rule timeline
+        try:
+            price = pricing_engine.quote(int(parking_slot_id), booking_start_date, booking_end_date)
+        except ParkingSlot.DoesNotExist:
+            raise Http404('No ParkingSlot matches the given query.')
 
-        if conflicting_bookings.exists():
+        # Reject known conflicts before validating and locking
+        if _known_conflict(int(parking_slot_id), booking_start_date, booking_end_date):
             return Response({'error': 'Conflicts with existing bookings for the specified period.'}, status=status.HTTP_400_BAD_REQUEST)
 
         # If no conflicts, create the booking
-        parking_slot = get_object_or_404(ParkingSlot, pk=parking_slot_id)
-
         data = {
             'user': user_id,
             'parking_slot': parking_slot_id,
@@ -301,21 +583,22 @@ class BookingViewSet(generics.ListCreateAPIView, generics.RetrieveUpdateDestroyA
             'booking_end_date': booking_end_date,
             'price': price,
         }
-        
-        print(data)
 
         serializer = BookingSerializer(data=data)
 
         if serializer.is_valid():
-            # Mark the parking slot as unavailable for the specified period
-            # parking_slot.physical_available = False
-            # parking_slot.save()
+            # Confirm against the database and insert while holding the slot's
+            # write lock, so two concurrent requests can't both pass the check
+            with slot_write_lock([int(parking_slot_id)]):
+                if _conflicts(int(parking_slot_id), booking_start_date, booking_end_date):
+                    return Response({'error': 'Conflicts with existing bookings for the specified period.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            serializer.save()
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
+    @retry_on_lock
     def update(self, request, *args, **kwargs):
         user_id = request.data.get('user', None)
         new_start_date_str = request.data.get('new_start_date', None)
@@ -333,44 +616,220 @@ class BookingViewSet(generics.ListCreateAPIView, generics.RetrieveUpdateDestroyA
             return Response({'error': 'Invalid date format. Please use ISO format (e.g., 2023-01-01T00:00:00.000Z).'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Check for conflicts with new start and end date
-        conflicting_bookings = Booking.objects.filter(
-            user=user_id,
-            parking_slot=new_parking_slot_id,
-            booking_start_date__lt=new_end_date,
-            booking_end_date__gt=new_start_date,
-        ).exclude(
-            Q(booking_start_date__gte=new_end_date) | Q(booking_end_date__lte=new_start_date)
-)
-
-        if conflicting_bookings.exists():
+        # Get the existing booking for the user
+        existing_booking = Booking.objects.get(user=user_id)
+
+        # Check for conflicts with new start and end date, ignoring the booking being moved
+        if _known_conflict(int(new_parking_slot_id), new_start_date, new_end_date, exclude=existing_booking.pk):
             return Response({'error': 'Conflicts with existing bookings for the specified period.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Get the existing booking for the user
-        existing_booking = Booking.objects.get(user=user_id)
-        parking_slot = ParkingSlot.objects.get(pk=new_parking_slot_id)
+        parking_slot = entity_cache.get(ParkingSlot, new_parking_slot_id)
 
         if existing_booking:
             # Update the existing booking with the new dates and parking slot
             existing_booking.booking_start_date = new_start_date
             existing_booking.booking_end_date = new_end_date
             existing_booking.parking_slot = parking_slot
-            
-            parking_slot_rule = ParkingSlotRules.objects.filter(
-                parking_slot=new_parking_slot_id,
-                date_start_rule__lte=new_end_date,
-                date_end_rule__gte=new_start_date,
-            ).first()
-            
-            if parking_slot_rule:
-                # Use the price from the parking slot rule
-                existing_booking.price = parking_slot_rule.price
-
-            existing_booking.save()
+            existing_booking.price = pricing_engine.quote(parking_slot.pk, new_start_date, new_end_date)
+
+            with slot_write_lock([parking_slot.pk]):
+                if _conflicts(parking_slot.pk, new_start_date, new_end_date, exclude=existing_booking.pk):
+                    return Response({'error': 'Conflicts with existing bookings for the specified period.'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+                existing_booking.save()
 
             serializer = BookingSerializer(existing_booking)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response({'error': 'No active booking found for the specified user.'},
-                            status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    @retry_on_lock
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+class BookingBulkCreateView(generics.GenericAPIView):
+    queryset = Booking.objects.all()
+    serializer_class = BookingSerializer
+    max_batch_size = 500
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('bookings', None)
+
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of bookings.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > self.max_batch_size:
+            return Response({'error': f'At most {self.max_batch_size} bookings per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = create_bookings(items)
+        created = sum(1 for result in results if result['status'] == status.HTTP_201_CREATED)
+
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({'created': created, 'failed': len(results) - created, 'results': results},
+                        status=response_status)
+
+class BookingExportView(View):
+    # A plain Django view: DRF would treat ?format= as a renderer choice, and
+    # the rows never go through a serializer or renderer anyway
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+    def get(self, request, *args, **kwargs):
+        output = request.GET.get('format', 'ndjson')
+        if output not in export.FORMATS:
+            return JsonResponse({'error': 'format must be ndjson or csv.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            park = request.GET.get('park', None)
+            parking_slot = request.GET.get('parking_slot', None)
+            park = int(park) if park else None
+            parking_slot = int(parking_slot) if parking_slot else None
+        except ValueError:
+            return JsonResponse({'error': 'park and parking_slot must be ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = request.GET.get('start', None)
+            end = request.GET.get('end', None)
+            start = parse_iso_datetime(start) if start else None
+            end = parse_iso_datetime(end) if end else None
+        except ValueError:
+            return JsonResponse({'error': ISO_DATE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        include_archived = parse_bool(request.GET.get('include_archived', False))
+        rows = export.booking_rows(park=park, parking_slot=parking_slot, start=start, end=end, include_archived=include_archived)
+        response = StreamingHttpResponse(export.stream(rows, output), content_type=self.content_types[output])
+        response['Content-Disposition'] = f'attachment; filename="bookings.{output}"'
+        return response
+
+class ParkProvisionView(generics.GenericAPIView):
+    queryset = Park.objects.all()
+    serializer_class = ParkSerializer
+    max_slots = 10000
+
+    def post(self, request, *args, **kwargs):
+        # The whole park from one layout, see provisioning.py
+        try:
+            park, floor_objs, slot_objs = provisioning.provision_layout(request.data, self.max_slots)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        slot_counts = Counter(slot.floor_id for slot in slot_objs)
+        return Response({
+            **ParkSerializer(park).data,
+            'floors': [
+                {'floor': floor.pk, 'floor_number': floor.floor_number, 'slots': slot_counts[floor.pk]}
+                for floor in floor_objs
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+class EntityCacheStatsView(generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        # Hit/miss counters of this worker's entity_cache
+        return Response(entity_cache.stats())
+
+class MetricsView(View):
+    # Prometheus scrape target, plain text rather than DRF's JSON
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request, *args, **kwargs):
+        body = metrics.render_prometheus(metrics.metrics.collect())
+        return HttpResponse(body, content_type=self.content_type)
+
+# Async versions of the hot read endpoints, mounted under async/. Under an
+# ASGI server (see Parking/asgi.py) they run on the event loop and only borrow
+# a thread for each query, so a slow request doesn't hold a worker thread;
+# under WSGI use the views above. Responses are the same bytes as theirs.
+
+def _json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status_code, headers=headers)
+
+def _drf_request(request):
+    # query_params, and request.data for clients sending the parameters as
+    # a JSON body, as request_param expects
+    return Request(request, parsers=[JSONParser()])
+
+class _AsyncView(View):
+    # The exceptions DRF raises on the way (a bad cursor, a malformed JSON
+    # body) get the responses APIView gives the sync views
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            response = api_settings.EXCEPTION_HANDLER(exc, {'view': self, 'args': args, 'kwargs': kwargs, 'request': request})
+            if response is None:
+                raise
+            headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+            return _json_response(response.data, response.status_code, headers)
+
+class AsyncParkingSlotAvailableListView(_AsyncView):
+    async def get(self, request, *args, **kwargs):
+        request = _drf_request(request)
+        queryset, error = available_slots_query(request, ParkingSlot.objects.all())
+        if error:
+            return _json_response({'error': error}, status.HTTP_400_BAD_REQUEST)
+
+        serializer = fast_serializer(AvailableParkingSlotSerializer)
+        paginator = KeysetPagination()
+        rows = serializer.rows(queryset, paginator.ordering)
+        page = await paginator.apaginate_queryset(rows, request)
+        if page is None:
+            return _json_response(serializer.many([row async for row in rows]))
+        return _json_response(paginator.get_paginated_response(serializer.many(page)).data)
+
+class AsyncParkLayoutView(_AsyncView):
+    async def get(self, request, pk, *args, **kwargs):
+        at_str = request_param(_drf_request(request), 'at')
+        try:
+            at = parse_iso_datetime(at_str) if at_str else timezone.now()
+        except ValueError:
+            return _json_response({'error': ISO_DATE_ERROR}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            park = await park_layout_queryset(at).aget(pk=pk)
+        except Park.DoesNotExist:
+            return _json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        # The timelines are cached per process and only sometimes query
+        await sync_to_async(set_layout_prices)(park, at)
+        return _json_response(ParkLayoutSerializer(park).data)
+
+class AsyncBookingDetailView(_AsyncView):
+    # One booking by id; ?include_archived=true also finds archived ones
+    async def get(self, request, pk, *args, **kwargs):
+        include_archived = parse_bool(request_param(_drf_request(request), 'include_archived', False))
+        model = BookingHistory if include_archived else Booking
+        serializer = fast_serializer(BookingSerializer)
+        try:
+            row = await serializer.rows(model.objects.all()).aget(pk=pk)
+        except model.DoesNotExist:
+            return _json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        return _json_response(serializer.many([row])[0])
+
+class AsyncParkingSlotRulesByPkOnlyView(_AsyncView):
+    # Conditional GET like ParkingSlotRulesByPkOnlyView. The rule is read with
+    # the async ORM rather than through entity_cache, whose backends block.
+    async def get(self, request, pk, *args, **kwargs):
+        routers.use_primary()
+        etag = await sync_to_async(table_etag)((ParkingSlotRules,), request)
+        candidates = if_none_match(request)
+        if etag in candidates:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        serializer = fast_serializer(ParkingSlotRulesSerializer)
+        try:
+            row = await serializer.rows(ParkingSlotRules.objects.all()).aget(pk=pk)
+        except ParkingSlotRules.DoesNotExist:
+            return _json_response(
+                {"error": "No matching rule found for the specified primary key."}, status.HTTP_404_NOT_FOUND,
+            )
+        if '*' in candidates:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return _json_response(serializer.many([row])[0], headers={'ETag': etag})
@@ -0,0 +1,224 @@
+"""Concurrent connection capacity of the read endpoints, ASGI against WSGI.
+
+Both applications run in-process on a seeded SQLite file:
+Parking.wsgi.application on a pool of --threads worker threads, the way a
+threaded WSGI server (gunicorn gthread, mod_wsgi) serves it, and
+Parking.asgi.application on a single event loop, the way uvicorn serves it.
+For each --connections count, that many clients send requests back to back
+for --seconds to a mix of available slots, park layout, booking lookup and
+rule lookup: the sync views under WSGI, their async/ versions under ASGI.
+There is no sync single-booking view, so the WSGI side serves the async one
+through async_to_sync there.
+
+--query-latency sleeps in every query, standing in for a database across the
+network: a WSGI thread is held for all of it, the event loop is not. Each
+request under ASGI costs more CPU, though (Django moves every sync middleware
+hook and query onto a thread and back), so ASGI only serves more when
+requests wait longer than they compute. Reports requests/sec, latency
+percentiles (queueing included) and status codes per query latency, server
+and connection count as JSON, with the git revision.
+
+    python -m benchmarks.asgi_vs_wsgi
+    python -m benchmarks.asgi_vs_wsgi --connections 16,256 --threads 8 --query-latency 5,100
+"""
+import argparse
+import asyncio
+import io
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from .common import ISO_FORMAT, git_revision, ms, percentiles, report, setup_django
+
+
+class QueryLatency:
+    # Database execute wrapper sleeping before every query
+    def __init__(self, seconds=0):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.seconds:
+            time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+
+class Targets:
+    """Random requests of the mix, as (path, query string) for either server."""
+
+    def __init__(self, rng, start, days):
+        from ParkingApp.models import Booking, Park, ParkingSlotRules
+
+        self.rng = rng
+        self.start = start
+        self.days = days
+        self.park_ids = list(Park.objects.values_list('pk', flat=True))
+        self.booking_ids = list(Booking.objects.values_list('pk', flat=True))
+        self.rule_ids = list(ParkingSlotRules.objects.values_list('pk', flat=True))
+
+    def moment(self):
+        value = self.start + timedelta(days=self.rng.uniform(0, self.days))
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    def request(self, server):
+        prefix = '/ParkingApp/async/' if server == 'asgi' else '/ParkingApp/'
+        kind = self.rng.randrange(4)
+        if kind == 0:
+            begin = self.moment()
+            end = begin + timedelta(hours=self.rng.randint(1, 4))
+            query = {'start': begin.strftime(ISO_FORMAT), 'end': end.strftime(ISO_FORMAT), 'page_size': 100}
+            return prefix + 'parking-slots/available/', urlencode(query)
+        if kind == 1:
+            park_id = self.rng.choice(self.park_ids)
+            return prefix + f'park/{park_id}/layout/', urlencode({'at': self.moment().strftime(ISO_FORMAT)})
+        if kind == 2:
+            return f'/ParkingApp/async/bookings/{self.rng.choice(self.booking_ids)}/', ''
+        return prefix + f'parking-slot-rules/by-pk/{self.rng.choice(self.rule_ids)}/', ''
+
+
+def wsgi_call(application, path, query_string):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    status = []
+    body = application(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in body:
+            pass
+    finally:
+        # Sends request_finished, which closes the thread's connection
+        body.close()
+    return status[0]
+
+
+async def asgi_call(application, path, query_string):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects
+        await asyncio.Future()
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+async def load(server, connections, seconds, targets, threads):
+    """connections closed-loop clients against one server for seconds."""
+    if server == 'wsgi':
+        from Parking.wsgi import application
+
+        pool = ThreadPoolExecutor(max_workers=threads)
+        loop = asyncio.get_running_loop()
+
+        async def call(path, query_string):
+            return await loop.run_in_executor(pool, wsgi_call, application, path, query_string)
+    else:
+        from Parking.asgi import application
+
+        pool = None
+
+        async def call(path, query_string):
+            return await asgi_call(application, path, query_string)
+
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        while time.perf_counter() < deadline:
+            path, query_string = targets.request(server)
+            start = time.perf_counter()
+            statuses[await call(path, query_string)] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    if pool is not None:
+        pool.shutdown()
+
+    stats = percentiles(latencies)
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'latency_ms': {key: ms(value) for key, value in stats.items()},
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', default='1,16,64,256', help='comma separated concurrent client counts')
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--seconds', type=float, default=3, help='per run')
+    parser.add_argument('--query-latency', default='0,50', help='comma separated milliseconds added to every query')
+    parser.add_argument('--owners', type=int, default=5, help='parks to generate')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+    levels = [int(value) for value in args.connections.split(',')]
+    query_latencies = [float(value) for value in args.query_latency.split(',')]
+
+    database = setup_django()
+    # Views taking naive datetimes and the occasional 404 are expected here
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    from datetime import datetime, time as day_start
+
+    from django.db.backends.signals import connection_created
+    from django.utils import timezone
+
+    from ParkingApp import seeding
+
+    days = 14
+    dataset = seeding.generate(owners=args.owners, floors=2, slots=20, users=200, rules=2, bookings=5, days=days, seed=args.seed)
+    start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=days // 2), day_start()))
+    targets = Targets(random.Random(args.seed), start, days)
+
+    latency = QueryLatency()
+    connection_created.connect(lambda sender, connection, **kwargs: connection.execute_wrappers.append(latency), weak=False)
+
+    async def run():
+        results = []
+        for query_latency in query_latencies:
+            latency.seconds = query_latency / 1000
+            for connections in levels:
+                level = {'query_latency_ms': query_latency, 'connections': connections}
+                for server in ('wsgi', 'asgi'):
+                    level[server] = await load(server, connections, args.seconds, targets, args.threads)
+                results.append(level)
+        return results
+
+    report({
+        'benchmark': 'asgi_vs_wsgi',
+        'revision': git_revision(),
+        'database': str(database),
+        'wsgi_threads': args.threads,
+        'dataset': dataset,
+        'results': asyncio.run(run()),
+    })
+
+
+if __name__ == '__main__':
+    main()
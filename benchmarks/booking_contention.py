@@ -0,0 +1,134 @@
+"""Concurrent booking creation benchmark.
+
+Many threads POST to BookingViewSet.create at once, either spread over many
+slots or all fighting over a few hot slots. After every run the Booking table
+is checked for overlapping bookings on the same slot, which must be zero.
+Reports bookings/sec and latency per thread count as JSON.
+
+    python -m benchmarks.booking_contention --threads 1,2,4,8,16
+    python -m benchmarks.booking_contention --transaction-mode DEFERRED
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .common import ISO_FORMAT, ms, percentiles, report, seed_slots, setup_django
+
+DOUBLE_BOOKINGS_SQL = '''
+    SELECT COUNT(*) FROM Booking a JOIN Booking b
+      ON a.parking_slot_id = b.parking_slot_id
+     AND a.booking_id < b.booking_id
+     AND a.booking_start_date < b.booking_end_date
+     AND a.booking_end_date > b.booking_start_date
+'''
+
+
+def run(threads, attempts, slot_ids, user_id, seed):
+    from django.db import OperationalError, connection, connections
+    from rest_framework.test import APIRequestFactory
+
+    from ParkingApp.intervals import booking_index
+    from ParkingApp.models import Booking
+    from ParkingApp.views import BookingViewSet
+
+    Booking.objects.all().delete()
+    booking_index.clear()
+
+    view = BookingViewSet.as_view()
+    factory = APIRequestFactory()
+    base = datetime(2030, 1, 1)
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    totals = {'created': 0, 'rejected': 0, 'errors': 0}
+    latencies = []
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        local = {'created': 0, 'rejected': 0, 'errors': 0}
+        samples = []
+        barrier.wait()
+        for _ in range(attempts):
+            start = base + timedelta(hours=rng.randrange(24 * 7))
+            end = start + timedelta(hours=rng.randint(1, 3))
+            request = factory.post('/ParkingApp/bookings/', {
+                'user': user_id,
+                'parking_slot': rng.choice(slot_ids),
+                'booking_start_date': start.strftime(ISO_FORMAT),
+                'booking_end_date': end.strftime(ISO_FORMAT),
+            }, format='json')
+            began = time.perf_counter()
+            try:
+                response = view(request)
+            except OperationalError:
+                local['errors'] += 1
+            else:
+                local['created' if response.status_code == 201 else 'rejected'] += 1
+            samples.append(time.perf_counter() - began)
+        connections.close_all()
+        with lock:
+            for key, value in local.items():
+                totals[key] += value
+            latencies.extend(samples)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    began = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    with connection.cursor() as cursor:
+        cursor.execute(DOUBLE_BOOKINGS_SQL)
+        double_bookings = cursor.fetchone()[0]
+
+    stats = percentiles(latencies)
+    return {
+        'threads': threads,
+        'attempts': threads * attempts,
+        **totals,
+        'double_bookings': double_bookings,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(threads * attempts / elapsed, 1),
+        'bookings_per_sec': round(totals['created'] / elapsed, 1),
+        'latency_ms': {key: ms(value) for key, value in stats.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', default='1,2,4,8,16', help='comma separated thread counts')
+    parser.add_argument('--attempts', type=int, default=200, help='booking attempts per thread')
+    parser.add_argument('--slots', type=int, default=200, help='slots for the spread scenario')
+    parser.add_argument('--hot-slots', type=int, default=2, help='slots for the hot scenario')
+    parser.add_argument('--transaction-mode', default=None, help='override the SQLite transaction_mode')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    options = {'transaction_mode': args.transaction_mode} if args.transaction_mode else {}
+    database = setup_django(**options)
+    slot_ids, user_ids = seed_slots(max(args.slots, args.hot_slots))
+
+    from django.conf import settings
+
+    scenarios = {'spread': slot_ids[:args.slots], 'hot': slot_ids[:args.hot_slots]}
+    results = []
+    for name, slots in scenarios.items():
+        for threads in (int(value) for value in args.threads.split(',')):
+            result = run(threads, args.attempts, slots, user_ids[0], args.seed)
+            results.append({'scenario': name, 'slots': len(slots), **result})
+
+    report({
+        'benchmark': 'booking_contention',
+        'database': str(database),
+        'transaction_mode': settings.DATABASES['default']['OPTIONS'].get('transaction_mode'),
+        'results': results,
+    })
+    if any(result['double_bookings'] for result in results):
+        raise SystemExit('double bookings detected')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Shared setup for the benchmark scripts.
+
+Every benchmark runs in-process against its own throwaway SQLite file, so it
+never touches db.sqlite3. Run them from the repository root, for example::
+
+    python -m benchmarks.booking_contention
+"""
+import copy
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+def setup_django(database=None, profile=None, **options):
+    """Point the default database at ``database`` (a temp file by default),
+    configured as DATABASE_PROFILES[profile] when given, apply ``options`` to
+    its OPTIONS, then set up Django and migrate."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Parking.settings')
+    from django.conf import settings
+
+    if profile is not None:
+        settings.DATABASES['default'] = copy.deepcopy(settings.DATABASE_PROFILES[profile])
+
+    if database is None:
+        database = Path(tempfile.mkdtemp(prefix='parking-bench-')) / 'bench.sqlite3'
+    settings.DATABASES['default']['NAME'] = str(database)
+    settings.DATABASES['default'].setdefault('OPTIONS', {}).update(options)
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+    return database
+
+
+def seed_slots(slots, floors=1, users=1):
+    """Create one park with ``slots`` slots spread over ``floors`` floors and
+    ``users`` users. Returns (slot ids, user ids)."""
+    from ParkingApp.models import Credentials, Floor, Park, ParkDetails, ParkingSlot, ParkOwner, Users
+
+    owner = ParkOwner.objects.create(first_name='Bench', last_name='Owner', email='owner@bench.local', password='bench')
+    details = ParkDetails.objects.create(address='Bench', latitude=44.4268, longitude=26.1025)
+    park = Park.objects.create(park_owner=owner, park_details=details, total_spots=slots, no_floors=floors)
+    floor_objs = Floor.objects.bulk_create(Floor(park=park, floor_number=n) for n in range(floors))
+    slot_objs = ParkingSlot.objects.bulk_create(
+        ParkingSlot(floor=floor_objs[n % floors], slot_number=n, has_charger=n % 4 == 0)
+        for n in range(slots)
+    )
+    credentials = Credentials.objects.bulk_create(
+        Credentials(email=f'user{n}@bench.local', password='bench') for n in range(users)
+    )
+    user_objs = Users.objects.bulk_create(
+        Users(credentials=c, first_name='Bench', last_name=str(n), number_plate=f'B{n}', vehicle_type='Car', verified=True)
+        for n, c in enumerate(credentials)
+    )
+    return [slot.pk for slot in slot_objs], [user.pk for user in user_objs]
+
+
+def git_revision():
+    """Short hash of the checked out commit, with a + when the tree has local
+    changes, or None outside a git checkout."""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('+' if dirty.strip() else '')
+
+
+def percentiles(samples):
+    if not samples:
+        return {'p50': None, 'p95': None, 'p99': None}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'mean': statistics.fmean(ordered)}
+
+
+def ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def report(results, stream=sys.stdout):
+    json.dump(results, stream, indent=2, default=str)
+    stream.write('\n')
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,181 @@
+"""Concurrent reads and writes under each database profile.
+
+Every profile runs in its own process against its own SQLite file seeded
+with ParkingApp.seeding. Reader threads request available slots and the
+bookings list while writer threads create bookings, for a fixed time. After
+each request the connection is handled as at the end of a real request
+(closed unless CONN_MAX_AGE keeps it). Reports reads/sec, writes/sec,
+latency percentiles and "database is locked" failures per profile as JSON.
+
+    python -m benchmarks.db_profiles
+    python -m benchmarks.db_profiles --readers 8 --writers 4 --seconds 20
+"""
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from datetime import timedelta
+
+from .common import ISO_FORMAT, ROOT, git_revision, ms, percentiles, report, setup_django
+
+
+def run_profile(profile, readers, writers, seconds, seed):
+    database = setup_django(profile=profile)
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    warnings.filterwarnings('ignore', r'DateTimeField .* received a naive datetime', RuntimeWarning)
+
+    from django.conf import settings
+    from django.db import OperationalError, close_old_connections, connection
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory
+
+    from ParkingApp import seeding
+    from ParkingApp.locking import is_lock_error
+    from ParkingApp.models import ParkingSlot, Users
+    from ParkingApp.views import BookingViewSet, ParkingSlotAvailableListView
+
+    seeding.generate(owners=5, floors=2, slots=50, users=200, seed=seed)
+    slot_ids = list(ParkingSlot.objects.values_list('pk', flat=True))
+    user_ids = list(Users.objects.values_list('pk', flat=True))
+    with connection.cursor() as cursor:
+        journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+    close_old_connections()
+    connection.close()
+
+    factory = APIRequestFactory(HTTP_HOST='localhost')
+    available = ParkingSlotAvailableListView.as_view()
+    bookings = BookingViewSet.as_view()
+    now = timezone.now()
+    barrier = threading.Barrier(readers + writers)
+    lock = threading.Lock()
+    samples = {'read': [], 'write': []}
+    outcomes = {'read': {'ok': 0, 'rejected': 0, 'locked': 0}, 'write': {'ok': 0, 'rejected': 0, 'locked': 0}}
+    failures = []
+
+    def read_request(rng):
+        if rng.random() < 0.7:
+            start = now + timedelta(hours=rng.randrange(24 * 14))
+            params = {
+                'start': start.strftime(ISO_FORMAT),
+                'end': (start + timedelta(hours=2)).strftime(ISO_FORMAT),
+                'page_size': 100,
+            }
+            return available, factory.get('/ParkingApp/parking-slots/available/', params)
+        return bookings, factory.get('/ParkingApp/bookings/', {'page_size': 100})
+
+    def write_request(rng):
+        start = now + timedelta(days=30, hours=rng.randrange(24 * 60))
+        return bookings, factory.post('/ParkingApp/bookings/', {
+            'user': rng.choice(user_ids),
+            'parking_slot': rng.choice(slot_ids),
+            'booking_start_date': start.strftime(ISO_FORMAT),
+            'booking_end_date': (start + timedelta(hours=rng.randint(1, 3))).strftime(ISO_FORMAT),
+        }, format='json')
+
+    def worker(kind, number):
+        try:
+            run_worker(kind, number)
+        except BaseException as error:
+            failures.append(error)
+            raise
+
+    def run_worker(kind, number):
+        rng = random.Random(seed * 1000 + number)
+        make = read_request if kind == 'read' else write_request
+        local = []
+        counts = {'ok': 0, 'rejected': 0, 'locked': 0}
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            view, request = make(rng)
+            began = time.perf_counter()
+            try:
+                response = view(request)
+                response.render()
+            except OperationalError as error:
+                if not is_lock_error(error):
+                    raise
+                counts['locked'] += 1
+            else:
+                counts['ok' if response.status_code < 400 else 'rejected'] += 1
+            local.append(time.perf_counter() - began)
+            # What the request handler does once the response is sent
+            close_old_connections()
+        connection.close()
+        with lock:
+            samples[kind].extend(local)
+            for key, value in counts.items():
+                outcomes[kind][key] += value
+
+    threads = [threading.Thread(target=worker, args=('read', n)) for n in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', readers + n)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+
+    def summary(kind):
+        stats = percentiles(samples[kind])
+        return {
+            **outcomes[kind],
+            'per_sec': round(len(samples[kind]) / seconds, 1),
+            'latency_ms': {key: ms(value) for key, value in stats.items()},
+        }
+
+    default = settings.DATABASES['default']
+    return {
+        'profile': profile,
+        'database': str(database),
+        'journal_mode': journal_mode,
+        'conn_max_age': default.get('CONN_MAX_AGE', 0),
+        'reads': summary('read'),
+        'writes': summary('write'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='development,production', help='comma separated DATABASE_PROFILES')
+    parser.add_argument('--readers', type=int, default=8, help='reader threads')
+    parser.add_argument('--writers', type=int, default=4, help='writer threads')
+    parser.add_argument('--seconds', type=float, default=10, help='run time per profile')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--profile', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        # One profile, in the child process started below
+        json.dump(run_profile(args.profile, args.readers, args.writers, args.seconds, args.seed), sys.stdout)
+        return
+
+    results = []
+    for profile in args.profiles.split(','):
+        # A fresh process per profile: connections and settings are per process
+        child = subprocess.run([
+            sys.executable, '-m', 'benchmarks.db_profiles', '--profile', profile,
+            '--readers', str(args.readers), '--writers', str(args.writers),
+            '--seconds', str(args.seconds), '--seed', str(args.seed),
+        ], cwd=ROOT, capture_output=True, text=True)
+        if child.returncode:
+            raise SystemExit(f'profile {profile} failed:\n{child.stderr}')
+        results.append(json.loads(child.stdout))
+
+    report({
+        'benchmark': 'db_profiles',
+        'revision': git_revision(),
+        'readers': args.readers,
+        'writers': args.writers,
+        'seconds': args.seconds,
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Endpoint benchmark suite over generated data.
+
+Seeds a database with ParkingApp.seeding (the seed_data command) and sends
+requests in-process, through the whole middleware stack, to the hot
+endpoints: available slots, booking create and update, rule create, login
+and the list views. Reports requests/sec, p50/p95/p99 latency, queries per
+request and status codes per endpoint as JSON, with the git revision, so
+runs can be compared across commits.
+
+    python -m benchmarks.endpoints
+    python -m benchmarks.endpoints --owners 50 --requests 500 --only available_slots,bookings_list
+"""
+import argparse
+import logging
+import random
+import warnings
+from collections import Counter
+from datetime import timedelta
+
+from .common import Timer, git_revision, ms, percentiles, report, setup_django
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+class QueryCounter:
+    # Database execute wrapper, counts the queries of one request
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class Endpoints:
+    """The scenarios, each a generator of (method, url, data) requests."""
+
+    def __init__(self, client, rng, start, days, login_accounts, bench_users):
+        from ParkingApp.models import Credentials, ParkingSlot
+
+        self.client = client
+        self.rng = rng
+        self.start = start
+        self.days = days
+        self.slot_ids = list(ParkingSlot.objects.values_list('pk', flat=True))
+        self.emails = list(Credentials.objects.order_by('pk').values_list('email', flat=True)[:login_accounts])
+        # BookingViewSet.update moves "the" booking of a user, so create and
+        # update use fresh users with one booking each
+        self.bench_users = bench_users
+        self.booked = []
+
+    def window(self, earliest=0, hours=(1, 4)):
+        begin = self.start + timedelta(days=self.rng.uniform(earliest, self.days), hours=self.rng.randrange(24))
+        begin = begin.replace(minute=0, second=0, microsecond=0)
+        end = begin + timedelta(hours=self.rng.randint(*hours))
+        return begin.strftime(ISO_FORMAT), end.strftime(ISO_FORMAT)
+
+    def available_slots(self, count):
+        for _ in range(count):
+            start, end = self.window()
+            yield 'get', '/ParkingApp/parking-slots/available/', {'start': start, 'end': end, 'page_size': 100}
+
+    def booking_create(self, count):
+        for user_id in self.bench_users[:count]:
+            start, end = self.window(earliest=self.days / 2)
+            slot_id = self.rng.choice(self.slot_ids)
+            self.booked.append(user_id)
+            yield 'post', '/ParkingApp/bookings/', {
+                'user': user_id, 'parking_slot': slot_id, 'booking_start_date': start, 'booking_end_date': end,
+            }
+
+    def booking_update(self, count):
+        from ParkingApp.models import Booking
+
+        users = list(Booking.objects.filter(user__in=self.booked).values_list('user', 'pk'))[:count]
+        for user_id, booking_id in users:
+            start, end = self.window(earliest=self.days / 2)
+            yield 'put', f'/ParkingApp/bookings/{booking_id}/', {
+                'user': user_id, 'new_parking_slot': self.rng.choice(self.slot_ids),
+                'new_start_date': start, 'new_end_date': end,
+            }
+
+    def rule_create(self, count):
+        for _ in range(count):
+            # Past the seeded rules, so most don't conflict
+            start, end = self.window(earliest=self.days, hours=(2, 12))
+            yield 'post', '/ParkingApp/parking-slot-rules/', {
+                'parking_slot': self.rng.choice(self.slot_ids), 'date_start_rule': start, 'date_end_rule': end, 'price': 20.0,
+            }
+
+    def login(self, count):
+        from ParkingApp.seeding import DEFAULT_PASSWORD
+
+        for _ in range(count):
+            yield 'post', '/ParkingApp/login/', {'email': self.rng.choice(self.emails), 'password': DEFAULT_PASSWORD}
+
+    def list_view(self, path):
+        # Walks the pages in order, starting over at the end
+        def requests(count):
+            url, params = path, {'page_size': 100}
+            for _ in range(count):
+                yield 'get', url, params
+                following = self.client.last_response.json().get('next')
+                url, params = (following, None) if following else (path, {'page_size': 100})
+        return requests
+
+
+LIST_VIEWS = {
+    'parks_list': '/ParkingApp/park/',
+    'park_details_list': '/ParkingApp/park-details/',
+    'floors_list': '/ParkingApp/floors/',
+    'parking_slots_list': '/ParkingApp/parking-slots/',
+    'parking_slot_rules_list': '/ParkingApp/parking-slot-rules/',
+    'bookings_list': '/ParkingApp/bookings/',
+}
+
+
+class BenchClient:
+    def __init__(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.last_response = None
+
+    def send(self, method, url, data):
+        if method == 'get':
+            response = self.client.get(url, data)
+        else:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.last_response = response
+        return response
+
+
+def run(name, client, requests):
+    from django.db import connection
+
+    latencies = []
+    queries = []
+    statuses = Counter()
+    with Timer() as total:
+        for method, url, data in requests:
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter), Timer() as timer:
+                response = client.send(method, url, data)
+            latencies.append(timer.elapsed)
+            queries.append(counter.queries)
+            statuses[response.status_code] += 1
+
+    stats = percentiles(latencies)
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / total.elapsed, 1) if latencies else None,
+        'latency_ms': {key: ms(value) for key, value in stats.items()},
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries, default=None),
+        },
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--owners', type=int, default=20, help='parks to generate')
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--slots', type=int, default=50, help='slots per floor')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rules', type=int, default=4, help='rules per slot')
+    parser.add_argument('--bookings', type=int, default=20, help='bookings per slot')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--login-accounts', type=int, default=10, help='accounts the login requests rotate over')
+    parser.add_argument('--only', help='comma separated endpoints to run')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    database = setup_django()
+    # Rejected bookings and the views' naive datetimes are expected here,
+    # keep stderr readable
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore', r'DateTimeField .* received a naive datetime', RuntimeWarning)
+
+    from datetime import datetime, time
+
+    from django.utils import timezone
+
+    from ParkingApp import seeding
+
+    with Timer() as seeding_timer:
+        dataset = seeding.generate(
+            owners=args.owners, floors=args.floors, slots=args.slots, users=args.users, rules=args.rules,
+            bookings=args.bookings, days=args.days, seed=args.seed,
+        )
+        rng = random.Random(args.seed)
+        bench_users = [user.pk for user in seeding.create_users(args.requests, rng, prefix='bench')]
+
+    client = BenchClient()
+    start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=args.days // 2), time()))
+    endpoints = Endpoints(client, rng, start, args.days, args.login_accounts, bench_users)
+    scenarios = {
+        'available_slots': endpoints.available_slots,
+        'booking_create': endpoints.booking_create,
+        'booking_update': endpoints.booking_update,
+        'rule_create': endpoints.rule_create,
+        'login': endpoints.login,
+        **{name: endpoints.list_view(path) for name, path in LIST_VIEWS.items()},
+    }
+    chosen = set(args.only.split(',')) if args.only else set(scenarios)
+    unknown = chosen - set(scenarios)
+    # Always in the order above, whatever --only's order: booking_update
+    # needs the bookings booking_create made
+    selected = [name for name in scenarios if name in chosen]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if 'booking_update' in selected and 'booking_create' not in selected:
+        parser.error('booking_update moves the bookings made by booking_create, run both')
+
+    results = []
+    for name in selected:
+        results.append(run(name, client, scenarios[name](args.requests)))
+
+    report({
+        'benchmark': 'endpoints',
+        'revision': git_revision(),
+        'database': str(database),
+        'seed': args.seed,
+        'dataset': dataset,
+        'seconds_to_seed': round(seeding_timer.elapsed, 2),
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
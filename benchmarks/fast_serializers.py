@@ -0,0 +1,93 @@
+"""Fast-path serializer benchmark.
+
+Serializes and renders pages of parking slots and bookings twice: through the
+ModelSerializer and JSONRenderer, and through FastSerializer and
+FastJSONRenderer, as the list endpoints do. Checks that both produce the same
+bytes and reports the time per page as JSON.
+
+    python -m benchmarks.fast_serializers --page-sizes 100,1000,10000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from .common import Timer, ms, percentiles, report, seed_slots, setup_django
+
+
+def seed_bookings(count, slot_ids, user_id):
+    from django.utils import timezone
+
+    from ParkingApp.models import Booking
+
+    base = timezone.make_aware(datetime(2030, 1, 1))
+    Booking.objects.bulk_create((
+        Booking(
+            parking_slot_id=slot_ids[n % len(slot_ids)],
+            user_id=user_id,
+            booking_start_date=base + timedelta(hours=n),
+            booking_end_date=base + timedelta(hours=n + 2),
+            price=round(7.5 + n % 13 * 0.25, 2),
+        )
+        for n in range(count)
+    ), batch_size=5000)
+
+
+def measure(serializer_class, queryset, repeat):
+    from rest_framework.renderers import JSONRenderer
+
+    from ParkingApp.fastpath import FastJSONRenderer, fast_serializer
+
+    fast = fast_serializer(serializer_class)
+    samples = {'drf': [], 'fast': []}
+    for _ in range(repeat):
+        with Timer() as timer:
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        samples['drf'].append(timer.elapsed)
+        with Timer() as timer:
+            rendered = FastJSONRenderer().render(fast.many(fast.rows(queryset)))
+        samples['fast'].append(timer.elapsed)
+    if rendered != expected:
+        raise SystemExit(f'{serializer_class.__name__}: fast path output differs')
+
+    stats = {path: percentiles(values) for path, values in samples.items()}
+    return {
+        'bytes': len(rendered),
+        **{f'{path}_ms': {key: ms(value) for key, value in stats[path].items()} for path in stats},
+        'speedup_p50': round(stats['drf']['p50'] / stats['fast']['p50'], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-sizes', default='100,1000,10000', help='comma separated rows per page')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per page size')
+    args = parser.parse_args(argv)
+
+    page_sizes = [int(value) for value in args.page_sizes.split(',')]
+    database = setup_django()
+    slot_ids, user_ids = seed_slots(max(page_sizes), floors=4)
+    seed_bookings(max(page_sizes), slot_ids, user_ids[0])
+
+    from ParkingApp import fastpath
+    from ParkingApp.models import Booking, ParkingSlot
+    from ParkingApp.serializers import BookingSerializer, ParkingSlotSerializer
+
+    cases = {
+        'parking_slots': (ParkingSlotSerializer, ParkingSlot.objects.order_by('pk')),
+        'bookings': (BookingSerializer, Booking.objects.order_by('pk')),
+    }
+    results = []
+    for name, (serializer_class, queryset) in cases.items():
+        for page_size in page_sizes:
+            result = measure(serializer_class, queryset[:page_size], args.repeat)
+            results.append({'endpoint': name, 'page_size': page_size, **result})
+
+    report({
+        'benchmark': 'fast_serializers',
+        'database': str(database),
+        'orjson': fastpath.orjson is not None,
+        'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Range-overlap query plans before and after the composite indexes.
+
+Seeds a database with --bookings bookings (1M by default) and --rules pricing
+rules, rolled back to the migration before the overlap indexes. The hot
+overlap queries are timed and their EXPLAIN QUERY PLAN captured, then the
+indexes are built by migrating forward and everything is measured again.
+Reports plans, SQL latency and the index build time as JSON.
+
+    python -m benchmarks.overlap_indexes
+    python -m benchmarks.overlap_indexes --bookings 100000 --queries 200
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from .common import Timer, ms, percentiles, report, seed_slots, setup_django
+
+BEFORE_MIGRATION = '0006_parkdetails_geohash'
+# Only the overlap indexes, so index_build_seconds times nothing else
+AFTER_MIGRATION = '0007_overlap_indexes'
+BASE = datetime(2029, 1, 1, tzinfo=timezone.utc)
+DB_FORMAT = '%Y-%m-%d %H:%M:%S'
+BATCH_SIZE = 20000
+
+
+def _insert(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def seed_history(slot_ids, user_ids, bookings, rules, rng):
+    """Give every slot a back-to-back booking history and a set of daily
+    pricing rules. Rows go in with executemany; bulk_create is an order of
+    magnitude slower at this size. Returns the end of the booked period."""
+    from django.db import connection, transaction
+
+    from ParkingApp.models import Booking, ParkingSlotRules
+
+    per_slot = max(1, bookings // len(slot_ids))
+    rules_per_slot = max(1, rules // len(slot_ids))
+    horizon = BASE
+
+    def booking_rows():
+        nonlocal horizon
+        for slot_id in slot_ids:
+            moment = BASE
+            for _ in range(per_slot):
+                moment += timedelta(hours=rng.randint(0, 4))
+                end = moment + timedelta(hours=rng.randint(1, 3))
+                yield (slot_id, rng.choice(user_ids), moment.strftime(DB_FORMAT), end.strftime(DB_FORMAT), 10.0)
+                moment = end
+            horizon = max(horizon, moment)
+
+    def rule_rows():
+        for slot_id in slot_ids:
+            for day in range(rules_per_slot):
+                start = BASE + timedelta(days=day, hours=8)
+                end = start + timedelta(hours=10)
+                yield (slot_id, start.strftime(DB_FORMAT), end.strftime(DB_FORMAT), 15.0)
+
+    booking_table = Booking._meta.db_table
+    rules_table = ParkingSlotRules._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        _insert(cursor, (
+            f'INSERT INTO "{booking_table}" (parking_slot_id, user_id, booking_start_date, booking_end_date, price) '
+            'VALUES (%s, %s, %s, %s, %s)'
+        ), booking_rows())
+        _insert(cursor, (
+            f'INSERT INTO "{rules_table}" (parking_slot_id, date_start_rule, date_end_rule, price) '
+            'VALUES (%s, %s, %s, %s)'
+        ), rule_rows())
+    return horizon
+
+
+def query_kinds(floor_ids):
+    from ParkingApp.availability import available_slots, overlapping_bookings_q
+    from ParkingApp.models import Booking, ParkingSlot, ParkingSlotRules
+
+    # Each returns (queryset, whether the app runs it as .exists())
+    def booking_conflict(slot_id, start, end):
+        return Booking.objects.filter(overlapping_bookings_q(start, end), parking_slot=slot_id), True
+
+    def booking_at_instant(slot_id, start, end):
+        return Booking.objects.filter(overlapping_bookings_q(start, start), parking_slot=slot_id), True
+
+    def rule_conflict(slot_id, start, end):
+        return ParkingSlotRules.objects.filter(
+            parking_slot=slot_id, date_start_rule__lt=end, date_end_rule__gt=start
+        )[:1], False
+
+    def available_on_floor(slot_id, start, end):
+        floor_id = floor_ids[slot_id % len(floor_ids)]
+        return available_slots(start, end, ParkingSlot.objects.filter(floor_id=floor_id)).values_list('pk', flat=True), False
+
+    return {
+        'booking_conflict': booking_conflict,
+        'booking_at_instant': booking_at_instant,
+        'rule_conflict': rule_conflict,
+        'available_on_floor': available_on_floor,
+    }
+
+
+def compile_sql(queryset, exists):
+    query = queryset.query.exists() if exists else queryset.query
+    return query.get_compiler(queryset.db).as_sql()
+
+
+def windows(slot_ids, horizon, queries, scenario, rng):
+    # uniform: anywhere in the booked history; upcoming: the last week of it,
+    # like new bookings made against a slot with a long past
+    span_hours = max(1, int((horizon - BASE).total_seconds() // 3600))
+    result = []
+    for _ in range(queries):
+        if scenario == 'upcoming':
+            offset = span_hours - rng.randrange(min(span_hours, 24 * 7))
+        else:
+            offset = rng.randrange(span_hours)
+        start = BASE + timedelta(hours=offset)
+        result.append((rng.choice(slot_ids), start, start + timedelta(hours=rng.randint(1, 3))))
+    return result
+
+
+def measure(kinds, slot_ids, horizon, queries, seed):
+    # Only the SQL is timed, the ORM compiles each query beforehand, so the
+    # numbers show what the indexes change and nothing else
+    from django.db import connection
+
+    results = {}
+    with connection.cursor() as cursor:
+        for scenario in ('uniform', 'upcoming'):
+            sample = windows(slot_ids, horizon, queries, scenario, random.Random(seed))
+            for name, build in kinds.items():
+                compiled = [compile_sql(*build(*window)) for window in sample]
+                samples = []
+                for sql, params in compiled:
+                    with Timer() as timer:
+                        cursor.execute(sql, params)
+                        cursor.fetchall()
+                    samples.append(timer.elapsed)
+                cursor.execute('EXPLAIN QUERY PLAN ' + compiled[0][0], compiled[0][1])
+                stats = percentiles(samples)
+                results[f'{name}/{scenario}'] = {
+                    'plan': [row[-1] for row in cursor.fetchall()],
+                    'latency_ms': {key: ms(value) for key, value in stats.items()},
+                }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=1_000_000)
+    parser.add_argument('--rules', type=int, default=100_000)
+    parser.add_argument('--slots', type=int, default=500)
+    parser.add_argument('--floors', type=int, default=5)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=500, help='timed queries per kind and phase')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    database = setup_django()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    from ParkingApp.models import ParkingSlot
+
+    call_command('migrate', 'ParkingApp', BEFORE_MIGRATION, verbosity=0)
+    slot_ids, user_ids = seed_slots(args.slots, floors=args.floors, users=args.users)
+    floor_ids = sorted(set(ParkingSlot.objects.values_list('floor_id', flat=True)))
+    with Timer() as seeding:
+        horizon = seed_history(slot_ids, user_ids, args.bookings, args.rules, random.Random(args.seed))
+
+    kinds = query_kinds(floor_ids)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    before = measure(kinds, slot_ids, horizon, args.queries, args.seed)
+
+    with Timer() as building:
+        call_command('migrate', 'ParkingApp', AFTER_MIGRATION, verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    after = measure(kinds, slot_ids, horizon, args.queries, args.seed)
+
+    report({
+        'benchmark': 'overlap_indexes',
+        'database': str(database),
+        'bookings': args.slots * max(1, args.bookings // args.slots),
+        'rules': args.slots * max(1, args.rules // args.slots),
+        'slots': args.slots,
+        'seed_seconds': round(seeding.elapsed, 3),
+        'index_build_seconds': round(building.elapsed, 3),
+        'results': {
+            name: {
+                'before': before[name],
+                'after': after[name],
+                'speedup': round(before[name]['latency_ms']['p50'] / max(after[name]['latency_ms']['p50'], 1e-6), 1),
+            }
+            for name in before
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()